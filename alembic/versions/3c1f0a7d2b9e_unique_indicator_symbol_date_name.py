@@ -0,0 +1,40 @@
+"""unique constraint on indicators (symbol_id, date, name)
+
+Revision ID: 3c1f0a7d2b9e
+Revises: 9567d8da39cb
+Create Date: 2026-10-17 09:12:41.208113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f0a7d2b9e'
+down_revision: Union[str, Sequence[str], None] = '9567d8da39cb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # o upsert em lote de indicadores usa ON CONFLICT (symbol_id, date, name):
+    # remove duplicatas antigas (mantém a mais recente) antes de criar a constraint
+    op.execute(
+        """
+        DELETE FROM indicators a
+        USING indicators b
+        WHERE a.symbol_id = b.symbol_id
+          AND a.date = b.date
+          AND a.name = b.name
+          AND a.id < b.id
+        """
+    )
+    op.create_unique_constraint('uq_indicator_symbol_date_name', 'indicators', ['symbol_id', 'date', 'name'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_indicator_symbol_date_name', 'indicators', type_='unique')
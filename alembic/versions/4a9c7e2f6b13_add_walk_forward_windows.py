@@ -0,0 +1,44 @@
+"""add walk_forward_windows
+
+Revision ID: 4a9c7e2f6b13
+Revises: e8a3d6f0b1c2
+Create Date: 2026-10-17 14:21:37.640518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a9c7e2f6b13'
+down_revision: Union[str, Sequence[str], None] = 'e8a3d6f0b1c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('walk_forward_windows',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('backtest_id', sa.Integer(), nullable=False),
+    sa.Column('idx', sa.Integer(), nullable=False),
+    sa.Column('train_start', sa.Date(), nullable=False),
+    sa.Column('train_end', sa.Date(), nullable=False),
+    sa.Column('test_start', sa.Date(), nullable=False),
+    sa.Column('test_end', sa.Date(), nullable=False),
+    sa.Column('params', sa.JSON(), nullable=True),
+    sa.Column('train_metrics', sa.JSON(), nullable=True),
+    sa.Column('test_metrics', sa.JSON(), nullable=True),
+    sa.ForeignKeyConstraint(['backtest_id'], ['backtests.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('backtest_id', 'idx', name='uq_wf_window_per_backtest')
+    )
+    op.create_index(op.f('ix_walk_forward_windows_backtest_id'), 'walk_forward_windows', ['backtest_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_walk_forward_windows_backtest_id'), table_name='walk_forward_windows')
+    op.drop_table('walk_forward_windows')
@@ -0,0 +1,30 @@
+"""add backtests.error for async jobs
+
+Revision ID: 7d4e2b1c9a05
+Revises: 3c1f0a7d2b9e
+Create Date: 2026-10-17 10:02:17.530912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d4e2b1c9a05'
+down_revision: Union[str, Sequence[str], None] = '3c1f0a7d2b9e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('backtests', sa.Column('error', sa.String(length=500), nullable=True))
+    op.create_index(op.f('ix_backtests_status'), 'backtests', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_backtests_status'), table_name='backtests')
+    op.drop_column('backtests', 'error')
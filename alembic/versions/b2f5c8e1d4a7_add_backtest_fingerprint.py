@@ -0,0 +1,30 @@
+"""add backtests.fingerprint for run deduplication
+
+Revision ID: b2f5c8e1d4a7
+Revises: 7d4e2b1c9a05
+Create Date: 2026-10-17 11:40:05.118274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2f5c8e1d4a7'
+down_revision: Union[str, Sequence[str], None] = '7d4e2b1c9a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('backtests', sa.Column('fingerprint', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_backtests_fingerprint'), 'backtests', ['fingerprint'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_backtests_fingerprint'), table_name='backtests')
+    op.drop_column('backtests', 'fingerprint')
@@ -0,0 +1,30 @@
+"""add backtests.timings and backtests.profile
+
+Revision ID: c5d1a9e7f3b8
+Revises: 4a9c7e2f6b13
+Create Date: 2026-10-17 15:02:41.604117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d1a9e7f3b8'
+down_revision: Union[str, Sequence[str], None] = '4a9c7e2f6b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('backtests', sa.Column('timings', sa.JSON(), nullable=True))
+    op.add_column('backtests', sa.Column('profile', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('backtests', 'profile')
+    op.drop_column('backtests', 'timings')
@@ -0,0 +1,32 @@
+"""add trades.ticker for portfolio backtests
+
+Revision ID: e8a3d6f0b1c2
+Revises: b2f5c8e1d4a7
+Create Date: 2026-10-17 13:05:44.902113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a3d6f0b1c2'
+down_revision: Union[str, Sequence[str], None] = 'b2f5c8e1d4a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('trades', sa.Column('ticker', sa.String(length=32), nullable=True))
+    # backtests de um ativo só: o ticker do trade é o do backtest
+    op.execute(
+        "UPDATE trades SET ticker = (SELECT backtests.ticker FROM backtests WHERE backtests.id = trades.backtest_id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('trades', 'ticker')
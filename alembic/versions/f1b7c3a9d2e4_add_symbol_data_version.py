@@ -0,0 +1,28 @@
+"""add symbols.data_version
+
+Revision ID: f1b7c3a9d2e4
+Revises: c5d1a9e7f3b8
+Create Date: 2026-10-17 18:21:09.337415
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b7c3a9d2e4'
+down_revision: Union[str, Sequence[str], None] = 'c5d1a9e7f3b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('symbols', sa.Column('data_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('symbols', 'data_version')
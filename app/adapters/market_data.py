@@ -1,9 +1,32 @@
+import json
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+
 import pandas as pd
 import yfinance as yf
 
+OHLCV_COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+# barras intraday: "ts" é o início da barra, em UTC sem fuso (datetime64[ns])
+INTRADAY_COLUMNS = ["ts", "open", "high", "low", "close", "volume"]
+
+# janela máxima por chamada do yfinance em cada intervalo (o histórico
+# disponível também é limitado: ~30 dias em 1m, 60 dias até 30m, 730 dias em 1h)
+YF_INTRADAY_CHUNK_DAYS = {"1m": 7, "2m": 59, "5m": 59, "15m": 59, "30m": 59, "60m": 729, "1h": 729}
+
+try:  # parquet é opcional: sem pyarrow o cache/arquivos locais usam CSV
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+
+def _empty_ohlcv() -> pd.DataFrame:
+    return pd.DataFrame(columns=OHLCV_COLUMNS)
+
 def _normalize_yf_df(df: pd.DataFrame, ticker: str) -> pd.DataFrame:
     if df is None or df.empty:
-        return pd.DataFrame(columns=["date","open","high","low","close","volume"])
+        return _empty_ohlcv()
 
     if isinstance(df.columns, pd.MultiIndex):
         try:
@@ -26,3 +49,231 @@ def _normalize_yf_df(df: pd.DataFrame, ticker: str) -> pd.DataFrame:
 def fetch_ohlcv_yf(ticker: str, start: str, end: str) -> pd.DataFrame:
     raw = yf.download(ticker, start=start, end=end, auto_adjust=False, progress=False, group_by="column")
     return _normalize_yf_df(raw, ticker)
+
+
+def _empty_intraday() -> pd.DataFrame:
+    return pd.DataFrame({c: pd.Series(dtype="datetime64[ns]" if c == "ts" else float) for c in INTRADAY_COLUMNS})
+
+def _to_utc_naive(ts) -> pd.Series:
+    ts = pd.to_datetime(ts)
+    if getattr(ts.dt, "tz", None) is not None:
+        ts = ts.dt.tz_convert("UTC").dt.tz_localize(None)
+    return ts.astype("datetime64[ns]")
+
+def _normalize_intraday(df: pd.DataFrame) -> pd.DataFrame:
+    """Colunas INTRADAY_COLUMNS, ts em UTC sem fuso, ordenado e sem timestamps repetidos."""
+    if df is None or df.empty:
+        return _empty_intraday()
+    df = df.rename(columns=str.lower)
+    ts_col = next(c for c in ("ts", "datetime", "date", "timestamp") if c in df.columns)
+    out = pd.DataFrame({"ts": _to_utc_naive(df[ts_col])})
+    for c in INTRADAY_COLUMNS[1:]:
+        out[c] = pd.to_numeric(df[c], errors="coerce").astype(float).to_numpy()
+    return out.drop_duplicates(subset="ts", keep="last").sort_values("ts").reset_index(drop=True)
+
+def fetch_intraday_yf(ticker: str, start: str, end: str, interval: str) -> pd.DataFrame:
+    """Barras intraday do yfinance em [start, end), em blocos do tamanho aceito pelo intervalo."""
+    chunk = pd.Timedelta(days=YF_INTRADAY_CHUNK_DAYS[interval])
+    parts = []
+    a, end_ts = pd.Timestamp(start), pd.Timestamp(end)
+    while a < end_ts:
+        b = min(a + chunk, end_ts)
+        raw = yf.download(ticker, start=a.date().isoformat(), end=b.date().isoformat(), interval=interval,
+                          auto_adjust=False, progress=False, group_by="column")
+        if raw is not None and not raw.empty:
+            if isinstance(raw.columns, pd.MultiIndex):
+                try:
+                    raw = raw.xs(ticker, axis=1, level=1, drop_level=True)
+                except Exception:
+                    raw.columns = raw.columns.get_level_values(0)
+            parts.append(raw.reset_index())
+        a = b
+    parts = [p for p in parts if not p.empty]
+    return _normalize_intraday(pd.concat(parts, ignore_index=True)) if parts else _empty_intraday()
+
+
+# --- Adapters -------------------------------------------------------------
+# Todos devolvem o mesmo formato de fetch_ohlcv_yf: colunas OHLCV_COLUMNS,
+# "date" como datetime.date, intervalo [start, end) (end exclusivo, como no yfinance).
+# fetch_intraday devolve INTRADAY_COLUMNS ("ts" em UTC sem fuso), mesmo intervalo.
+
+class UnsupportedDataError(ValueError):
+    """A fonte configurada não fornece o dado pedido (ex.: barras intraday)."""
+
+
+class MarketDataAdapter(ABC):
+    """Interface mínima de fonte de cotações: fetch é obrigatório, intraday é opcional."""
+    @abstractmethod
+    def fetch(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        ...
+
+    def fetch_intraday(self, ticker: str, start: str, end: str, interval: str) -> pd.DataFrame:
+        raise UnsupportedDataError(f"{type(self).__name__} não fornece barras intraday")
+
+
+class YFinanceAdapter(MarketDataAdapter):
+    def fetch(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        return fetch_ohlcv_yf(ticker, start, end)
+
+    def fetch_intraday(self, ticker: str, start: str, end: str, interval: str) -> pd.DataFrame:
+        return fetch_intraday_yf(ticker, start, end, interval)
+
+
+def _file_stem(ticker: str) -> str:
+    # "^BVSP" / "BRK/B" -> nomes de arquivo seguros
+    return "".join(c if c.isalnum() or c in "._-" else "_" for c in ticker)
+
+def _read_ohlcv_file(path: Path) -> pd.DataFrame:
+    if path.suffix == ".parquet":
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path, float_precision="round_trip")
+    df = df.rename(columns=str.lower)
+    df["date"] = pd.to_datetime(df["date"]).dt.date
+    for c in OHLCV_COLUMNS[1:]:
+        df[c] = pd.to_numeric(df[c], errors="coerce").astype(float)
+    return df[OHLCV_COLUMNS]
+
+def _write_ohlcv_file(df: pd.DataFrame, path: Path) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    out = df.assign(date=pd.to_datetime(df["date"]))
+    if path.suffix == ".parquet":
+        out.to_parquet(tmp, index=False)
+    else:
+        out.to_csv(tmp, index=False)
+    os.replace(tmp, path)  # troca atômica: leitores nunca veem arquivo pela metade
+
+def _slice(df: pd.DataFrame, start: str, end: str) -> pd.DataFrame:
+    d = pd.to_datetime(df["date"])
+    return df[(d >= pd.Timestamp(start)) & (d < pd.Timestamp(end))].reset_index(drop=True)
+
+
+class FileAdapter(MarketDataAdapter):
+    """
+    Lê OHLCV de um diretório local: <root>/<TICKER>.parquet ou <root>/<TICKER>.csv
+    (colunas date, open, high, low, close, volume). Sem rede.
+    Intraday: <root>/<interval>/<TICKER>.parquet|.csv com coluna ts (ou datetime).
+    """
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def fetch(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        for ext in (".parquet", ".csv"):
+            path = self.root / f"{_file_stem(ticker)}{ext}"
+            if path.exists():
+                return _slice(_read_ohlcv_file(path), start, end)
+        return _empty_ohlcv()
+
+    def fetch_intraday(self, ticker: str, start: str, end: str, interval: str) -> pd.DataFrame:
+        for ext in (".parquet", ".csv"):
+            path = self.root / interval / f"{_file_stem(ticker)}{ext}"
+            if path.exists():
+                df = _normalize_intraday(pd.read_parquet(path) if ext == ".parquet" else pd.read_csv(path))
+                return df[(df["ts"] >= pd.Timestamp(start)) & (df["ts"] < pd.Timestamp(end))].reset_index(drop=True)
+        return _empty_intraday()
+
+
+class CachedAdapter(MarketDataAdapter):
+    """
+    Cache em disco por ticker sobre outro adapter.
+
+    Guarda as barras em <cache_dir>/<TICKER>.parquet (ou .csv sem pyarrow) e os
+    intervalos já consultados em <TICKER>.ranges.json. Uma consulta que se
+    sobrepõe ao que já está em cache só busca os trechos faltantes na fonte.
+    """
+    def __init__(self, inner: MarketDataAdapter, cache_dir: str | Path):
+        self.inner = inner
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ext = ".parquet" if HAS_PARQUET else ".csv"
+
+    def _paths(self, ticker: str) -> tuple[Path, Path]:
+        stem = _file_stem(ticker)
+        return self.cache_dir / f"{stem}{self.ext}", self.cache_dir / f"{stem}.ranges.json"
+
+    @staticmethod
+    def _missing(ranges: list[list[str]], start: pd.Timestamp, end: pd.Timestamp) -> list[tuple]:
+        """Trechos de [start, end) não cobertos por `ranges` (ordenados, sem sobreposição)."""
+        gaps, cur = [], start
+        for a, b in ranges:
+            a, b = pd.Timestamp(a), pd.Timestamp(b)
+            if b <= cur:
+                continue
+            if a >= end:
+                break
+            if a > cur:
+                gaps.append((cur, a))
+            cur = max(cur, b)
+        if cur < end:
+            gaps.append((cur, end))
+        return gaps
+
+    @staticmethod
+    def _merge(ranges: list[list[str]], new: list[tuple]) -> list[list[str]]:
+        spans = sorted([(pd.Timestamp(a), pd.Timestamp(b)) for a, b in ranges] + list(new))
+        out: list[list[pd.Timestamp]] = []
+        for a, b in spans:
+            if out and a <= out[-1][1]:
+                out[-1][1] = max(out[-1][1], b)
+            else:
+                out.append([a, b])
+        return [[a.date().isoformat(), b.date().isoformat()] for a, b in out]
+
+    def fetch(self, ticker: str, start: str, end: str) -> pd.DataFrame:
+        data_path, ranges_path = self._paths(ticker)
+        ranges = json.loads(ranges_path.read_text()) if ranges_path.exists() else []
+        cached = _read_ohlcv_file(data_path) if data_path.exists() and ranges else _empty_ohlcv()
+
+        gaps = self._missing(ranges, pd.Timestamp(start), pd.Timestamp(end))
+        if gaps:
+            parts = [cached] + [
+                self.inner.fetch(ticker, a.date().isoformat(), b.date().isoformat()) for a, b in gaps
+            ]
+            parts = [p for p in parts if not p.empty]
+            if parts:
+                cached = (
+                    pd.concat(parts, ignore_index=True)
+                    .drop_duplicates(subset="date", keep="last")
+                    .sort_values("date")
+                    .reset_index(drop=True)
+                )
+                _write_ohlcv_file(cached, data_path)
+            # só o passado é definitivo: o pregão de hoje/futuro volta a ser consultado
+            today = pd.Timestamp.today().normalize()
+            done = [(a, min(b, today)) for a, b in gaps if a < today]
+            ranges_path.write_text(json.dumps(self._merge(ranges, done)))
+
+        return _slice(cached, start, end)
+
+    def fetch_intraday(self, ticker: str, start: str, end: str, interval: str) -> pd.DataFrame:
+        # sem cache aqui: as barras intraday já ficam gravadas no IntradayStore
+        return self.inner.fetch_intraday(ticker, start, end, interval)
+
+
+def get_adapter() -> MarketDataAdapter:
+    """
+    Adapter configurado por ambiente:
+      MARKET_DATA_ADAPTER=yfinance|file (padrão yfinance)
+      MARKET_DATA_DIR=<dir>             diretório do adapter "file"
+      MARKET_DATA_CACHE_DIR=<dir>       se definido, envolve o adapter com CachedAdapter
+    """
+    kind = os.getenv("MARKET_DATA_ADAPTER", "yfinance").lower()
+    if kind == "file":
+        adapter: MarketDataAdapter = FileAdapter(os.getenv("MARKET_DATA_DIR", "data/ohlcv"))
+    elif kind == "yfinance":
+        adapter = YFinanceAdapter()
+    else:
+        raise ValueError(f"MARKET_DATA_ADAPTER inválido: {kind}")
+
+    cache_dir = os.getenv("MARKET_DATA_CACHE_DIR")
+    if cache_dir:
+        adapter = CachedAdapter(adapter, cache_dir)
+    return adapter
+
+def fetch_ohlcv(ticker: str, start: str, end: str) -> pd.DataFrame:
+    """Ponto de entrada usado pelos serviços: busca pelo adapter configurado."""
+    return get_adapter().fetch(ticker, start, end)
+
+def fetch_intraday(ticker: str, start: str, end: str, interval: str) -> pd.DataFrame:
+    """Barras intraday pelo adapter configurado."""
+    return get_adapter().fetch_intraday(ticker, start, end, interval)
@@ -1,13 +1,26 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from app.api.routes_health import router as health_router
 from app.api.routes_data import router as data_router
 from app.api.routes_backtests import router as bt_router
+from app.api.routes_metrics import router as metrics_router, MetricsMiddleware
+from app.core import offload
+from app.services.job_service import job_queue
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    offload.shutdown()
+    job_queue.shutdown()
 
-app = FastAPI(title="Trading API", version="0.2.0")
+app = FastAPI(title="Trading API", version="0.2.0", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(health_router)
 app.include_router(data_router)
 app.include_router(bt_router)
+app.include_router(metrics_router)
 
 @app.get("/")
 async def root():
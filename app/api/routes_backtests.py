@@ -1,11 +1,25 @@
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from typing import Optional
+from datetime import date
 from sqlalchemy import select, and_
-from app.schemas.backtests import RunBacktestRequest, RunBacktestResponse  # <- tire ResultsResponse daqui
-from app.services.backtest_service import run_backtest
-from app.services.backtest_results_service import get_backtest_results
-from app.db.session import get_session_local
+from app.schemas.backtests import (
+    RunBacktestRequest, RunBacktestResponse, SweepRequest, SweepResponse,
+    JobSubmitResponse, JobStatusResponse, PortfolioBacktestRequest, PortfolioBacktestResponse,
+    WalkForwardRequest, WalkForwardResponse,
+)  # <- tire ResultsResponse daqui
+from app.services.backtest_service import run_backtest, run_portfolio_backtest, delete_backtest
+from app.services.results_cache import results_cache, make_etag, etag_matches
+from app.services.export_service import export_results
+from app.services.job_service import job_queue, get_job_status, QueueFull
+from app.services.sweep_service import run_sweep
+from app.services.walkforward_service import run_walk_forward, get_windows
+from app.services.backtest_results_service import (
+    backtest_results, backtest_version, stream_backtest_results, timing_stats, TIMING_STATS_LIMIT,
+)
+from app.db.session import run_read
+from app.core.offload import run_cpu
+from starlette.concurrency import run_in_threadpool
 from app.db.models import Backtest
 import math
 
@@ -41,8 +55,9 @@ def _clean(o):
 # ----------------------------------------
 
 @router.post("/run", response_model=RunBacktestResponse)
-def run(body: RunBacktestRequest):
-    res = run_backtest(
+async def run(body: RunBacktestRequest):
+    res = await run_cpu(
+        run_backtest,
         ticker=body.ticker,
         start=body.start_date,
         end=body.end_date,
@@ -55,48 +70,304 @@ def run(body: RunBacktestRequest):
         risk_perc=body.risk_perc,
         strategy_type=body.strategy_type,
         strategy_params=body.strategy_params,
+        engine=body.engine,
+        force=body.force,
+        profile=body.profile,
+        interval=body.interval,
+        timeframe=body.timeframe,
+        offload=True,  # orquestração no pool bt-run, cálculo no pool de processos
     )
     if "error" in res:
         raise HTTPException(status_code=400, detail=res["error"])
     return RunBacktestResponse(**res)
 
-@router.get("/{bt_id}/results")
-def results(bt_id: int):
-    data = get_backtest_results(bt_id)
+@router.post("/portfolio", response_model=PortfolioBacktestResponse)
+async def run_portfolio(body: PortfolioBacktestRequest):
+    res = await run_cpu(
+        run_portfolio_backtest,
+        tickers=body.tickers,
+        start=body.start_date,
+        end=body.end_date,
+        initial_cash=body.initial_cash,
+        commission=body.commission,
+        sma_fast=body.sma_fast,
+        sma_slow=body.sma_slow,
+        atr_window=body.atr_window,
+        atr_k=body.atr_k,
+        risk_perc=body.risk_perc,
+        strategy_type=body.strategy_type,
+        strategy_params=body.strategy_params,
+        force=body.force,
+        offload=True,
+    )
+    if "error" in res:
+        raise HTTPException(status_code=400, detail=res["error"])
+    return JSONResponse(content=_clean(PortfolioBacktestResponse(**res).model_dump()))
+
+@router.post("/sweep", response_model=SweepResponse)
+def sweep(body: SweepRequest):
+    res = run_sweep(
+        ticker=body.ticker,
+        start=body.start_date,
+        end=body.end_date,
+        strategy_type=body.strategy_type,
+        grid=body.grid,
+        initial_cash=body.initial_cash,
+        commission=body.commission,
+        defaults={
+            "sma_fast": body.sma_fast,
+            "sma_slow": body.sma_slow,
+            "atr_window": body.atr_window,
+            "atr_k": body.atr_k,
+            "risk_perc": body.risk_perc,
+        },
+        strategy_params=body.strategy_params,
+        mode=body.mode,
+        n_samples=body.n_samples,
+        seed=body.seed,
+        max_workers=body.max_workers,
+        persist_details=body.persist_details,
+        sort_by=body.sort_by,
+        engine=body.engine,
+        force=body.force,
+    )
+    if "error" in res:
+        raise HTTPException(status_code=400, detail=res["error"])
+    return JSONResponse(content=_clean(SweepResponse(**res).model_dump()))
+
+@router.post("/jobs", response_model=JobSubmitResponse, status_code=202)
+def submit_job(body: RunBacktestRequest):
+    """Enfileira o backtest e responde na hora; acompanhe por GET /backtests/{id}/status."""
+    if body.interval not in (None, "1d") or body.timeframe not in (None, "1d"):
+        raise HTTPException(status_code=400, detail="jobs rodam só com barras diárias; use /backtests/run")
+    try:
+        bt_id = job_queue.submit(
+            ticker=body.ticker,
+            start=body.start_date,
+            end=body.end_date,
+            initial_cash=body.initial_cash,
+            commission=body.commission,
+            params={
+                "sma_fast": body.sma_fast,
+                "sma_slow": body.sma_slow,
+                "atr_window": body.atr_window,
+                "atr_k": body.atr_k,
+                "risk_perc": body.risk_perc,
+            } | (body.strategy_params or {}),
+            strategy_type=body.strategy_type,
+            engine=body.engine,
+        )
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return JobSubmitResponse(backtest_id=bt_id, status="queued")
+
+@router.get("/jobs/stats")
+def jobs_stats():
+    return job_queue.stats()
+
+@router.get("/{bt_id}/status", response_model=JobStatusResponse)
+def job_status(bt_id: int):
+    data = get_job_status(bt_id)
     if not data:
         raise HTTPException(status_code=404, detail="Backtest não encontrado")
     return JSONResponse(content=_clean(data))
 
+@router.get("/cache/stats")
+def results_cache_stats():
+    return results_cache.stats()
+
+@router.get("/timings/stats")
+def timings_stats(
+    strategy_type: Optional[str] = Query(None),
+    engine: Optional[str] = Query(None),
+    limit: int = Query(TIMING_STATS_LIMIT, ge=1, le=10000),
+):
+    """p50/p95 por fase do run_backtest nos últimos `limit` backtests finalizados."""
+    return JSONResponse(content=_clean(timing_stats(strategy_type, engine, limit)))
+
+@router.post("/walkforward", response_model=WalkForwardResponse)
+def walk_forward(body: WalkForwardRequest):
+    res = run_walk_forward(
+        ticker=body.ticker,
+        start=body.start_date,
+        end=body.end_date,
+        strategy_type=body.strategy_type,
+        grid=body.grid,
+        train_bars=body.train_bars,
+        test_bars=body.test_bars,
+        anchored=body.anchored,
+        objective=body.objective,
+        initial_cash=body.initial_cash,
+        commission=body.commission,
+        defaults={
+            "sma_fast": body.sma_fast,
+            "sma_slow": body.sma_slow,
+            "atr_window": body.atr_window,
+            "atr_k": body.atr_k,
+            "risk_perc": body.risk_perc,
+        },
+        strategy_params=body.strategy_params,
+        engine=body.engine,
+        max_workers=body.max_workers,
+        force=body.force,
+    )
+    if "error" in res:
+        raise HTTPException(status_code=400, detail=res["error"])
+    return JSONResponse(content=_clean(WalkForwardResponse(**res).model_dump()))
+
+@router.get("/{bt_id}/windows")
+def walk_forward_windows(bt_id: int):
+    """Janelas treino/teste de um backtest walk-forward (vazio para os demais)."""
+    return JSONResponse(content=_clean(get_windows(bt_id)))
+
+async def _off_loop(fn, *args):
+    """Operações do results_cache: com a camada de disco fazem I/O e vão para uma thread."""
+    if results_cache.disk_dir:
+        return await run_in_threadpool(fn, *args)
+    return fn(*args)
+
+@router.get("/{bt_id}/results")
+async def results(bt_id: int, request: Request):
+    """
+    Resultados completos em JSON. Backtests finalizados são servidos do
+    results_cache (bytes já serializados) se a versão da linha no banco
+    (backtest_version, uma consulta pela PK) ainda é a da entrada; o ETag
+    permite 304 a quem repetir a consulta. Num miss, a leitura usa o engine
+    async (run_read) e a serialização roda numa thread.
+    """
+    row = await run_read(backtest_version, bt_id)
+    if row is None:
+        await _off_loop(results_cache.invalidate, bt_id)
+        raise HTTPException(status_code=404, detail="Backtest não encontrado")
+    status, version = row
+    cached = None
+    if status == "finished":
+        # memória no event loop; a camada de disco lê arquivo, então vai para uma thread
+        cached = results_cache.get_memory(bt_id, version)
+        if cached is None:
+            cached = await _off_loop(results_cache.get_disk, bt_id, version)
+    if cached is not None:
+        etag, body = cached
+    else:
+        data = await run_read(backtest_results, bt_id)
+        if not data:
+            raise HTTPException(status_code=404, detail="Backtest não encontrado")
+        body = await run_in_threadpool(lambda: JSONResponse(content=_clean(data)).body)
+        if data["status"] == "finished":
+            etag, body = await _off_loop(results_cache.put, bt_id, body, version)
+        else:
+            etag = make_etag(body)
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.delete("/{bt_id}", status_code=204)
+def delete(bt_id: int):
+    if not delete_backtest(bt_id):
+        raise HTTPException(status_code=404, detail="Backtest não encontrado")
+    return Response(status_code=204)
+
+@router.get("/{bt_id}/results/stream")
+def results_stream(
+    bt_id: int,
+    sections: str = Query("trades,daily", description="trades, daily ou ambos, separados por vírgula"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    fields: Optional[str] = Query(None, description="ex.: date,equity"),
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+):
+    """Resultados em NDJSON (uma linha por trade/dia), lidos do banco em lotes."""
+    res = stream_backtest_results(
+        bt_id,
+        sections=[s.strip() for s in sections.split(",") if s.strip()],
+        start=start,
+        end=end,
+        fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+        limit=limit,
+        offset=offset,
+    )
+    if res is None:
+        raise HTTPException(status_code=404, detail="Backtest não encontrado")
+    if isinstance(res, dict):
+        raise HTTPException(status_code=400, detail=res["error"])
+    return StreamingResponse(res, media_type="application/x-ndjson")
+
+def _export_response(bt_ids: list[int], table: str, format: str, start, end) -> Response:
+    res = export_results(bt_ids, table=table, fmt=format, start=start, end=end)
+    if "error" in res:
+        raise HTTPException(status_code=400, detail=res["error"])
+    return Response(
+        content=res["content"],
+        media_type=res["media_type"],
+        headers={
+            "Content-Disposition": f'attachment; filename="{res["filename"]}"',
+            "X-Row-Count": str(res["rows"]),
+        },
+    )
+
+@router.get("/export")
+def export_many(
+    ids: str = Query(..., description="ids separados por vírgula, ex.: 10,11,12"),
+    table: str = Query("daily", description="daily, trades ou backtests"),
+    format: str = Query("parquet", description="arrow, parquet ou csv"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+):
+    """Vários backtests num único arquivo (coluna backtest_id), ex.: todos os ids de uma sweep."""
+    try:
+        bt_ids = [int(x) for x in ids.split(",") if x.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids inválidos")
+    return _export_response(bt_ids, table, format, start, end)
+
+@router.get("/{bt_id}/export")
+def export_one(
+    bt_id: int,
+    table: str = Query("daily", description="daily, trades ou backtests"),
+    format: str = Query("parquet", description="arrow, parquet ou csv"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+):
+    return _export_response([bt_id], table, format, start, end)
+
+def _list_backtests(db, ticker, strategy_type, status, limit, offset) -> list[dict]:
+    conds = []
+    if ticker:
+        conds.append(Backtest.ticker == ticker)
+    if strategy_type:
+        conds.append(Backtest.strategy_type == strategy_type)
+    if status:
+        conds.append(Backtest.status == status)
+
+    stmt = select(Backtest)
+    if conds:
+        stmt = stmt.where(and_(*conds))
+    stmt = stmt.order_by(Backtest.created_at.desc()).limit(limit).offset(offset)
+
+    rows = db.execute(stmt).scalars().all()
+    out = []
+    for r in rows:
+        out.append(_clean({
+            "id": r.id,
+            "ticker": r.ticker,
+            "strategy_type": r.strategy_type,
+            "status": r.status,
+            "start_date": r.start_date,
+            "end_date": r.end_date,
+            "created_at": r.created_at,
+            "metrics": r.metrics or {},
+        }))
+    return out
+
 @router.get("", response_model=list[dict])
-def list_backtests(
+async def list_backtests(
     ticker: Optional[str] = None,
     strategy_type: Optional[str] = None,
+    status: Optional[str] = None,
     limit: int = Query(20, ge=1, le=200),
     offset: int = Query(0, ge=0),
 ):
-    SessionLocal = get_session_local()
-    with SessionLocal() as db:
-        conds = []
-        if ticker:
-            conds.append(Backtest.ticker == ticker)
-        if strategy_type:
-            conds.append(Backtest.strategy_type == strategy_type)
-
-        stmt = select(Backtest)
-        if conds:
-            stmt = stmt.where(and_(*conds))
-        stmt = stmt.order_by(Backtest.created_at.desc()).limit(limit).offset(offset)
-
-        rows = db.execute(stmt).scalars().all()
-        out = []
-        for r in rows:
-            out.append(_clean({
-                "id": r.id,
-                "ticker": r.ticker,
-                "strategy_type": r.strategy_type,
-                "start_date": r.start_date,
-                "end_date": r.end_date,
-                "created_at": r.created_at,
-                "metrics": r.metrics or {},
-            }))
-        return out
+    return await run_read(_list_backtests, ticker, strategy_type, status, limit, offset)
@@ -1,16 +1,106 @@
-from fastapi import APIRouter
-from app.schemas.data import UpdateDataRequest, UpdateDataResponse
-from app.services.data_service import update_prices_and_indicators
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from app.schemas.data import (
+    UpdateDataRequest, UpdateDataResponse, BatchUpdateRequest, BatchUpdateResponse,
+    IntradayUpdateRequest, IntradayUpdateResponse,
+    MaterializeIndicatorsRequest, MaterializeIndicatorsResponse, IndicatorMatrixResponse,
+)
+from app.services.data_service import (
+    update_prices_and_indicators, update_many, update_intraday, materialize_indicators, get_indicator_matrix,
+)
+from app.services.indicator_catalog import indicator_catalog
+from app.services.price_cache import price_cache
+from app.services import price_mirror as price_mirror_mod
+from app.services.intraday_store import intraday_store
 
 router = APIRouter(prefix="/data", tags=["data"])
 
 @router.post("/update", response_model=UpdateDataResponse)
 def update_data(body: UpdateDataRequest):
-    res = update_prices_and_indicators(
-        ticker=body.ticker,
-        start=str(body.start),
-        end=str(body.end),
-        sma_windows=(body.sma_fast, body.sma_slow),
-        atr_window=body.atr_window
-    )
+    try:
+        res = update_prices_and_indicators(
+            ticker=body.ticker,
+            start=str(body.start),
+            end=str(body.end),
+            sma_windows=(body.sma_fast, body.sma_slow),
+            atr_window=body.atr_window,
+            incremental=body.incremental,
+            indicators=body.indicators,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return UpdateDataResponse(**res)
+
+@router.post("/update/batch", response_model=BatchUpdateResponse)
+def update_data_batch(body: BatchUpdateRequest):
+    try:
+        res = update_many(
+            tickers=body.tickers,
+            start=str(body.start),
+            end=str(body.end),
+            sma_windows=(body.sma_fast, body.sma_slow),
+            atr_window=body.atr_window,
+            incremental=body.incremental,
+            max_workers=body.max_workers,
+            indicators=body.indicators,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return BatchUpdateResponse(**res)
+
+@router.get("/cache/stats")
+def cache_stats():
+    """Contadores do cache de preços usado pelos backtests (dimensionamento)."""
+    return price_cache.stats()
+
+@router.get("/mirror/stats")
+def mirror_stats():
+    """Símbolos, bytes e leituras do espelho mmap de cotações (vazio se PRICE_MIRROR_DIR não está configurado)."""
+    mirror = price_mirror_mod.price_mirror
+    return mirror.stats() if mirror is not None else {}
+
+@router.post("/intraday/update", response_model=IntradayUpdateResponse)
+def update_intraday_data(body: IntradayUpdateRequest):
+    try:
+        res = update_intraday(body.ticker, str(body.start), str(body.end), body.interval)
+    except ValueError as e:  # inclui UnsupportedDataError (adapter sem intraday)
+        raise HTTPException(status_code=400, detail=str(e))
+    return IntradayUpdateResponse(**res)
+
+@router.get("/intraday/stats")
+def intraday_stats():
+    """Barras, bytes e meses gravados por intervalo e ticker."""
+    return intraday_store.stats()
+
+@router.get("/catalog")
+def get_catalog():
+    """Catálogo de indicadores materializados na ingestão (INDICATOR_CATALOG), já expandido."""
+    try:
+        return indicator_catalog.describe()
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=f"catálogo inválido: {e}")
+
+@router.post("/indicators/materialize", response_model=MaterializeIndicatorsResponse)
+def materialize(body: MaterializeIndicatorsRequest):
+    """Recalcula sobre o histórico gravado os indicadores pedidos (ou os do catálogo) e grava em lote."""
+    try:
+        res = materialize_indicators(body.ticker, body.names)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return MaterializeIndicatorsResponse(**res)
+
+@router.get("/indicators/{ticker}", response_model=IndicatorMatrixResponse)
+def indicator_matrix(
+    ticker: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    names: Optional[str] = Query(None, description="nomes separados por vírgula, ex.: sma_10,sma_20,rsi_14"),
+):
+    """Indicadores gravados como matriz data x nome (uma consulta)."""
+    wanted = [n.strip() for n in names.split(",") if n.strip()] if names else None
+    res = get_indicator_matrix(ticker.strip(), start, end, wanted)
+    if res is None:
+        raise HTTPException(status_code=404, detail="Ticker não encontrado")
+    return res
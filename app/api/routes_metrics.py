@@ -0,0 +1,51 @@
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from app.core.metrics import REGISTRY, CONTENT_TYPE, HTTP_REQUEST_SECONDS, HTTP_IN_FLIGHT
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """Métricas do processo no formato texto do Prometheus."""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mede cada requisição HTTP até o último pedaço do corpo
+    (respostas em streaming contam inteiras). O label `route` é o template da
+    rota (/backtests/{bt_id}/results), não o caminho, para não explodir a
+    cardinalidade; caminhos sem rota ficam como "<unmatched>".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - t0,
+                method=scope["method"],
+                route=getattr(route, "path", "<unmatched>"),
+                status=str(status["code"]),
+            )
@@ -62,38 +62,56 @@ class TradeCollector(bt.Analyzer):
         except Exception:
             px = None
         if px is None:
-            px = float(self.strategy.data.close[0])
+            px = float(trade.data.close[0])
 
         # quantidade: soma absoluta dos eventos; se 0, force 1
         qty = self._sum_abs_sizes(trade)
         if qty == 0:
             qty = 1
 
-        self._rows.append({
+        row = {
             "date": dt,
             "side": side_exit,
             "price": px,
             "size": int(qty),
             "pnl": float(trade.pnlcomm),
-        })
+        }
+        if trade.data._name:  # modo carteira: feeds nomeados pelo ticker
+            row["ticker"] = trade.data._name
+        self._rows.append(row)
 
     def get_analysis(self):
         return self._rows
 
 
 class EquityDailyCollector(bt.Analyzer):
-    """Série diária de posição, caixa e equity."""
+    """
+    Série diária de posição, caixa e equity. Com um feed, position é o size da
+    posição; com vários (carteira), somar ações de tickers diferentes não tem
+    sentido, então position é o número de tickers com posição aberta e o equity
+    é o total. Posições por ticker ficam nos trades.
+    Com barras intraday fica a última barra de cada dia.
+    """
     def start(self):
         self._rows = []
 
     def next(self):
-        dt = bt.num2date(self.strategy.datas[0].datetime[0]).date().isoformat()
-        self._rows.append({
+        datas = self.strategy.datas
+        dt = bt.num2date(datas[0].datetime[0]).date().isoformat()
+        if len(datas) == 1:
+            position = int(self.strategy.getposition(datas[0]).size)
+        else:
+            position = sum(1 for d in datas if self.strategy.getposition(d).size)
+        row = {
             "date": dt,
-            "position": int(self.strategy.position.size),
+            "position": position,
             "cash": float(self.strategy.broker.getcash()),
             "equity": float(self.strategy.broker.getvalue()),
-        })
+        }
+        if self._rows and self._rows[-1]["date"] == dt:
+            self._rows[-1] = row
+        else:
+            self._rows.append(row)
 
     def get_analysis(self):
         return self._rows
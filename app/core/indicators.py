@@ -1,16 +1,304 @@
+# app/core/indicators.py
+"""
+Indicadores técnicos em NumPy, O(n) e sem DataFrames intermediários.
+
+Cada função aceita um array ou uma pd.Series e devolve o mesmo tipo (a Series
+mantém o índice). As médias móveis saem de somas acumuladas (uma passada,
+independente da janela); máximos/mínimos móveis usam blocos de prefixo/sufixo
+(van Herk/Gil-Werman); as médias recursivas (EMA, ATR de Wilder, RSI) usam o
+ewm(adjust=False) do pandas como kernel, semeado pela média simples das
+primeiras `window` barras, como o Backtrader.
+
+Convenções, iguais ao rolling(min_periods=window) do pandas: o primeiro valor
+sai na barra `window - 1` (ou `window` para o que depende da barra anterior)
+e janelas com NaN dão NaN.
+
+Nomes de indicadores ("sma_20", "rsi_14", "bb_upper_20"...) são resolvidos por
+compute(); ver KINDS. "atr_N" é a média simples do true range (o que sempre foi
+gravado na tabela indicators); a do Backtrader é "wilder_atr_N".
+"""
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
 import pandas as pd
 
-def sma(series: pd.Series, window: int) -> pd.Series:
-    return series.rolling(window=window, min_periods=window).mean()
-
-def atr(df: pd.DataFrame, window: int = 14) -> pd.Series:
-    high = df['high']
-    low = df['low']
-    close = df['close']
-    prev_close = close.shift(1)
-    tr = pd.concat([
-        (high - low),
-        (high - prev_close).abs(),
-        (low - prev_close).abs()
-    ], axis=1).max(axis=1)
-    return tr.rolling(window=window, min_periods=window).mean()
+BOLLINGER_K = 2.0
+
+
+def _arr(x) -> np.ndarray:
+    return np.asarray(x, dtype=float)
+
+
+def _like(out: np.ndarray, x, name: str | None = None):
+    if isinstance(x, pd.Series):
+        return pd.Series(out, index=x.index, name=name)
+    return out
+
+
+def _hlc(df) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return _arr(df["high"]), _arr(df["low"]), _arr(df["close"])
+
+
+# --- kernels (arrays)
+
+def _window_sums(x: np.ndarray, windows: Iterable[int]) -> np.ndarray:
+    """
+    Soma de cada janela terminada em i (NaN se a janela tem NaN), para várias
+    janelas a partir de uma única soma acumulada: linhas = janelas, colunas =
+    barras. A série é centrada no primeiro valor válido para a soma acumulada
+    não perder precisão em históricos longos.
+    """
+    windows = list(windows)
+    n = len(x)
+    nan = np.isnan(x)
+    valid = np.flatnonzero(~nan)
+    lead = valid[0] if len(valid) else n
+    ref = x[lead] if len(valid) else 0.0
+    c = np.zeros(n + 1)
+    # NaN só no início (ex.: retorno da primeira barra) dispensa a contagem por janela
+    gaps = bool(nan[lead:].any())
+    np.cumsum(np.where(nan, 0.0, x - ref) if gaps or lead else x - ref, out=c[1:])
+    if gaps:
+        k = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(nan, out=k[1:])
+    sums = np.full((len(windows), n), np.nan)
+    for j, w in enumerate(windows):
+        if w < 1:
+            raise ValueError(f"janela inválida: {w}")
+        first = lead + w - 1
+        if first >= n:
+            continue
+        sums[j, first:] = c[first + 1:] - c[first + 1 - w:n + 1 - w] + ref * w
+        if gaps:
+            sums[j, first:][(k[first + 1:] - k[first + 1 - w:n + 1 - w]) > 0] = np.nan
+    return sums
+
+
+def _rolling_means(x: np.ndarray, windows: Iterable[int]) -> np.ndarray:
+    windows = list(windows)
+    return _window_sums(x, windows) / np.asarray(windows, dtype=float)[:, None]
+
+
+def _rolling_std(x: np.ndarray, window: int, ddof: int) -> np.ndarray:
+    """
+    Desvio-padrão móvel por (S2 - S1^2 / w) com as somas de x e x^2 centradas na
+    média da série. Mesma fórmula do bt.ind.StdDev; erro relativo da ordem de
+    1e-8 quando o desvio é muito menor que a distância do preço à média.
+    """
+    valid = x[~np.isnan(x)]
+    xc = x - (valid.mean() if len(valid) else 0.0)
+    s1 = _window_sums(xc, [window])[0]
+    s2 = _window_sums(xc * xc, [window])[0]
+    return np.sqrt(np.maximum((s2 - s1 * s1 / window) / (window - ddof), 0.0))
+
+
+def _rolling_extreme(x: np.ndarray, window: int, ufunc) -> np.ndarray:
+    """Máximo/mínimo móvel em O(n): blocos de `window` com acumulado à esquerda e à direita."""
+    n = len(x)
+    out = np.full(n, np.nan)
+    if window > n:
+        return out
+    m = -(-n // window) * window
+    pad = np.full(m, np.nan)
+    pad[:n] = x
+    blocks = pad.reshape(-1, window)
+    prefix = ufunc.accumulate(blocks, axis=1).ravel()
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    out[window - 1:] = ufunc(suffix[:n - window + 1], prefix[window - 1:n])
+    return out
+
+
+def _smooth(x: np.ndarray, alpha: float, window: int) -> np.ndarray:
+    """
+    y[i] = y[i-1] * (1 - alpha) + x[i] * alpha, semeada com a média das `window`
+    primeiras barras válidas (bt.ind.ExponentialSmoothing / SmoothedMovingAverage).
+    """
+    n = len(x)
+    out = np.full(n, np.nan)
+    valid = np.flatnonzero(~np.isnan(x))
+    if not len(valid):
+        return out
+    s = valid[0] + window - 1
+    if s >= n:
+        return out
+    seeded = x.copy()
+    seeded[:s] = np.nan
+    seeded[s] = x[valid[0]:s + 1].mean()
+    out[s:] = pd.Series(seeded[s:]).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    return out
+
+
+def _true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray, first: float) -> np.ndarray:
+    tr = np.empty(len(close))
+    if len(close):
+        tr[0] = first
+        prev = close[:-1]
+        tr[1:] = np.maximum(high[1:], prev) - np.minimum(low[1:], prev)
+    return tr
+
+
+# --- indicadores
+
+def sma(x, window: int):
+    return _like(_rolling_means(_arr(x), [window])[0], x)
+
+
+def sma_many(x, windows: Iterable[int]):
+    """SMA de várias janelas numa passada (uma soma acumulada). Array (janelas x barras) ou DataFrame sma_N."""
+    windows = list(windows)
+    out = _rolling_means(_arr(x), windows)
+    if isinstance(x, pd.Series):
+        return pd.DataFrame(out.T, index=x.index, columns=[f"sma_{w}" for w in windows])
+    return out
+
+
+def ema(x, window: int):
+    """bt.ind.EMA: alpha = 2 / (window + 1), semeada pela SMA das primeiras `window` barras."""
+    return _like(_smooth(_arr(x), 2.0 / (window + 1), window), x)
+
+
+def atr(df, window: int = 14):
+    """
+    Média simples do true range (o ATR gravado em indicators). Na primeira barra,
+    sem fechamento anterior, o true range é high - low.
+    """
+    high, low, close = _hlc(df)
+    tr = _true_range(high, low, close, high[0] - low[0] if len(close) else np.nan)
+    return _like(_rolling_means(tr, [window])[0], df["close"])
+
+
+def wilder_atr(df, window: int = 14):
+    """bt.ind.ATR: média suavizada (alpha = 1/window) do true range, a partir da segunda barra."""
+    high, low, close = _hlc(df)
+    tr = _true_range(high, low, close, np.nan)
+    return _like(_smooth(tr, 1.0 / window, window), df["close"])
+
+
+def donchian_high(high, window: int):
+    """bt.ind.Highest: máxima das últimas `window` barras (incluindo a atual)."""
+    return _like(_rolling_extreme(_arr(high), window, np.maximum), high)
+
+
+def donchian_low(low, window: int):
+    """bt.ind.Lowest: mínima das últimas `window` barras (incluindo a atual)."""
+    return _like(_rolling_extreme(_arr(low), window, np.minimum), low)
+
+
+def momentum(close, window: int):
+    """Retorno em `window` barras: close / close[-window] - 1 (o sinal da MomentumTF)."""
+    c = _arr(close)
+    out = np.full(len(c), np.nan)
+    if window < len(c):
+        out[window:] = c[window:] / c[:-window] - 1.0
+    return _like(out, close)
+
+
+def volatility(close, window: int):
+    """Desvio-padrão amostral (ddof=1) dos retornos simples das últimas `window` barras, sem anualizar."""
+    c = _arr(close)
+    r = np.full(len(c), np.nan)
+    r[1:] = c[1:] / c[:-1] - 1.0
+    return _like(_rolling_std(r, window, ddof=1), close)
+
+
+def rsi(close, window: int = 14):
+    """bt.ind.RSI (Wilder): médias suavizadas de altas e baixas; 100 quando não há baixas."""
+    c = _arr(close)
+    d = np.full(len(c), np.nan)
+    d[1:] = np.diff(c)
+    up = _smooth(np.clip(d, 0.0, None), 1.0 / window, window)  # clip mantém o NaN da primeira barra
+    down = _smooth(np.clip(-d, 0.0, None), 1.0 / window, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.where(down == 0, 100.0, 100.0 - 100.0 / (1.0 + up / down))
+    out[np.isnan(up) | np.isnan(down)] = np.nan
+    return _like(out, close)
+
+
+def bollinger(close, window: int = 20, k: float = BOLLINGER_K):
+    """bt.ind.BollingerBands: (média, superior, inferior) com desvio-padrão populacional (ddof=0)."""
+    c = _arr(close)
+    mid = _rolling_means(c, [window])[0]
+    dev = k * _rolling_std(c, window, ddof=0)
+    return tuple(_like(v, close) for v in (mid, mid + dev, mid - dev))
+
+
+# --- catálogo por nome: "<tipo>_<janela>"
+
+KINDS = {
+    "sma": "média móvel simples do close",
+    "ema": "média móvel exponencial do close",
+    "atr": "média simples do true range",
+    "wilder_atr": "ATR de Wilder (bt.ind.ATR)",
+    "donchian_high": "máxima das últimas N barras",
+    "donchian_low": "mínima das últimas N barras",
+    "mom": "retorno em N barras",
+    "vol": "desvio-padrão dos retornos em N barras",
+    "rsi": "RSI de Wilder",
+    "bb_upper": f"banda de Bollinger superior ({BOLLINGER_K:g} desvios)",
+    "bb_lower": f"banda de Bollinger inferior ({BOLLINGER_K:g} desvios)",
+}
+
+# indicadores recursivos: dependem de todo o histórico anterior, não só de uma janela
+_RECURSIVE = {"ema", "wilder_atr", "rsi"}
+
+
+def parse_name(name: str) -> tuple[str, int]:
+    """"bb_upper_20" -> ("bb_upper", 20). ValueError para tipo ou janela inválidos."""
+    kind, _, w = name.rpartition("_")
+    if kind not in KINDS or not w.isdigit() or int(w) < 1:
+        raise ValueError(f"indicador inválido: {name} (use <tipo>_<janela>, tipos: {', '.join(KINDS)})")
+    return kind, int(w)
+
+
+def warmup(name: str) -> int | None:
+    """
+    Barras anteriores necessárias para recalcular o indicador igual ao histórico
+    completo; None para os recursivos (precisam do histórico inteiro).
+    """
+    kind, w = parse_name(name)
+    if kind in _RECURSIVE:
+        return None
+    return w + 1 if kind in ("atr", "mom", "vol") else w
+
+
+def compute(df: pd.DataFrame, names: Iterable[str]) -> pd.DataFrame:
+    """
+    Calcula os indicadores pedidos por nome sobre um OHLCV indexado por data.
+    Todas as SMAs (e as médias das bandas) saem da mesma soma acumulada.
+    """
+    names = list(dict.fromkeys(names))
+    parsed = {n: parse_name(n) for n in names}
+    close = _arr(df["close"])
+    out: dict[str, np.ndarray] = {}
+
+    sma_w = sorted({w for k, w in parsed.values() if k == "sma"})
+    if sma_w:
+        for w, v in zip(sma_w, _rolling_means(close, sma_w)):
+            out[f"sma_{w}"] = v
+    bands: dict[int, tuple] = {}
+    for name, (kind, w) in parsed.items():
+        if kind == "sma":
+            continue
+        if kind in ("bb_upper", "bb_lower"):
+            if w not in bands:
+                bands[w] = bollinger(close, w)
+            out[name] = bands[w][1 if kind == "bb_upper" else 2]
+        elif kind == "ema":
+            out[name] = ema(close, w)
+        elif kind == "atr":
+            out[name] = _arr(atr(df, w))
+        elif kind == "wilder_atr":
+            out[name] = _arr(wilder_atr(df, w))
+        elif kind == "donchian_high":
+            out[name] = donchian_high(_arr(df["high"]), w)
+        elif kind == "donchian_low":
+            out[name] = donchian_low(_arr(df["low"]), w)
+        elif kind == "mom":
+            out[name] = momentum(close, w)
+        elif kind == "vol":
+            out[name] = volatility(close, w)
+        elif kind == "rsi":
+            out[name] = rsi(close, w)
+    return pd.DataFrame({n: out[n] for n in names}, index=df.index)
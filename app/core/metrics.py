@@ -0,0 +1,267 @@
+# app/core/metrics.py
+"""
+Métricas em processo no formato texto do Prometheus (0.0.4), sem dependência
+externa: contadores, gauges e histogramas com labels, expostos em GET /metrics.
+
+Os valores são por processo: com vários workers do uvicorn, cada um responde
+pelos seus (o Prometheus soma as séries de cada alvo).
+"""
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# segundos; cobre de requisições simples (ms) a backtests longos (minutos)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+# espera por conexão do pool: normalmente µs; segundos indicam pool saturado
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    if math.isnan(v):
+        return "NaN"
+    v = float(v)
+    return str(int(v)) if v.is_integer() and abs(v) < 1e15 else repr(v)
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric(ABC):
+    """Base de Counter/Gauge/Histogram: cada tipo gera as próprias linhas em _samples()."""
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels esperados {self.labelnames}, recebidos {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        ...
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+        return "\n".join(lines) + "\n"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, doc, labelnames=()):
+        super().__init__(name, doc, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if amount < 0:
+            raise ValueError("contador só aumenta")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, doc, labelnames=()):
+        super().__init__(name, doc, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], float], **labels) -> None:
+        """Valor lido na hora da coleta (ex.: tamanho atual do pool)."""
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = fn
+
+    def value(self, **labels) -> float:
+        key = self._key(labels)
+        with self._lock:
+            fn = self._functions.get(key)
+            v = self._values.get(key, 0.0)
+        return float(fn()) if fn else v
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, fn in functions.items():
+            try:
+                values[key] = float(fn())
+            except Exception:
+                values[key] = math.nan
+        return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labelnames=(), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        # por série: [contagem por bucket (não cumulativa) + estouro, soma, total]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            s = self._series.get(self._key(labels))
+            return s[2] if s else 0
+
+    def _samples(self):
+        with self._lock:
+            series = sorted((k, (list(s[0]), s[1], s[2])) for k, s in self._series.items())
+        out = []
+        for key, (counts, total, n) in series:
+            acc = 0
+            for b, c in zip((*self.buckets, math.inf), counts):
+                acc += c
+                le = 'le="%s"' % _fmt(b)
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {acc}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(total)}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"métrica já registrada: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(m.render() for m in metrics)
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# --- Métricas da aplicação ---
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP (até o fim do corpo da resposta).",
+    ("method", "route", "status"),
+))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "Requisições HTTP em andamento.",
+))
+
+DB_POOL_CHECKOUT_WAIT = REGISTRY.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Espera para obter uma conexão do pool do SQLAlchemy.",
+    ("db",), buckets=POOL_WAIT_BUCKETS,
+))
+DB_POOL_IN_USE = REGISTRY.register(Gauge(
+    "db_pool_connections_in_use", "Conexões do pool emprestadas (checkout sem checkin).", ("db",),
+))
+DB_POOL_SIZE = REGISTRY.register(Gauge(
+    "db_pool_size", "Tamanho configurado do pool (QueuePool).", ("db",),
+))
+DB_POOL_OVERFLOW = REGISTRY.register(Gauge(
+    "db_pool_overflow", "Conexões abertas além de pool_size (QueuePool; negativo = slots ainda livres).", ("db",),
+))
+DB_POOL_CHECKOUTS = REGISTRY.register(Counter(
+    "db_pool_checkouts_total", "Conexões emprestadas pelo pool.", ("db",),
+))
+
+INGEST_ROWS = REGISTRY.register(Counter(
+    "ingest_rows_total", "Linhas gravadas pelos upserts de ingestão.", ("table",),
+))
+INGEST_SECONDS = REGISTRY.register(Histogram(
+    "ingest_duration_seconds", "Duração de cada chamada de upsert de ingestão.", ("table",),
+))
+INGEST_ROWS_PER_SECOND = REGISTRY.register(Gauge(
+    "ingest_last_rows_per_second", "Vazão (linhas/s) do upsert mais recente.", ("table",),
+))
+
+BACKTEST_SECONDS = REGISTRY.register(Histogram(
+    "backtest_duration_seconds", "Duração total de um backtest (carga, execução e gravação).",
+    ("kind", "strategy_type", "engine"),
+))
+BACKTEST_PHASE_SECONDS = REGISTRY.register(Histogram(
+    "backtest_phase_duration_seconds", "Duração de cada fase do backtest (ver PhaseTimer).",
+    ("kind", "phase"),
+))
+
+
+def observe_ingest(table: str, rows: int, seconds: float) -> None:
+    INGEST_ROWS.inc(rows, table=table)
+    INGEST_SECONDS.observe(seconds, table=table)
+    if seconds > 0:
+        INGEST_ROWS_PER_SECOND.set(rows / seconds, table=table)
+
+
+# fases agregadas do PhaseTimer; os analyzer_<nome> ficam só no backtest gravado
+_BACKTEST_PHASES = ("load", "setup", "engine", "analyzers", "collect", "persist")
+
+
+def observe_backtest(kind: str, strategy_type: str, engine: str, timings: Dict[str, float]) -> None:
+    """kind: run, portfolio ou job. `timings` no formato do PhaseTimer ({fase}_s, total_s)."""
+    if "total_s" in timings:
+        BACKTEST_SECONDS.observe(timings["total_s"], kind=kind, strategy_type=strategy_type, engine=engine)
+    for phase in _BACKTEST_PHASES:
+        v = timings.get(f"{phase}_s")
+        if v is not None:
+            BACKTEST_PHASE_SECONDS.observe(v, kind=kind, phase=phase)
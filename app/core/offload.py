@@ -0,0 +1,74 @@
+# app/core/offload.py
+"""
+Pools dedicados ao trabalho pesado de CPU disparado pelas rotas (run_backtest,
+run_portfolio_backtest).
+
+As rotas síncronas do FastAPI rodam no threadpool do Starlette (40 threads
+por padrão), o mesmo que atende as leituras sem engine async. Backtests
+síncronos em rajada ocupavam essas threads e as leituras ficavam na fila.
+Agora a rota async entrega o backtest a um pool de threads próprio e limitado
+(run_cpu), onde ficam a leitura dos preços e a gravação (banco e caches do
+processo), e o Backtrader em si vai para um pool de processos (compute), como
+na fila de jobs: numa thread ele segura o GIL e atrasa o event loop e as
+leituras async tanto quanto antes. Quem decide é a rota (offload=True em
+run_backtest/run_portfolio_backtest); scripts e benchmarks que chamam os
+serviços direto calculam na própria thread, sem subir o pool.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+# backtests síncronos (/run, /portfolio) executando ao mesmo tempo; os demais aguardam na fila do pool
+BACKTEST_RUN_THREADS = int(os.getenv("BACKTEST_RUN_THREADS", "4"))
+# 0 = o cálculo roda na própria thread do pool (útil para depurar)
+BACKTEST_RUN_PROCESSES = os.getenv("BACKTEST_RUN_PROCESSES", "1") != "0"
+
+_pool: ThreadPoolExecutor | None = None
+_procs: ProcessPoolExecutor | None = None
+_lock = threading.Lock()
+
+
+def cpu_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, BACKTEST_RUN_THREADS), thread_name_prefix="bt-run")
+        return _pool
+
+
+async def run_cpu(fn, *args, **kwargs):
+    """Executa fn(*args, **kwargs) no pool de CPU sem bloquear o event loop."""
+    return await asyncio.get_running_loop().run_in_executor(cpu_pool(), partial(fn, *args, **kwargs))
+
+
+def compute(fn, *args, **kwargs):
+    """
+    Executa fn(*args, **kwargs) no pool de processos e espera o resultado
+    (chamado de dentro de uma thread de run_cpu). fn e argumentos precisam ser
+    serializáveis; com BACKTEST_RUN_PROCESSES=0 roda direto na thread atual.
+    """
+    global _procs
+    if not BACKTEST_RUN_PROCESSES:
+        return fn(*args, **kwargs)
+    with _lock:
+        if _procs is None:
+            _procs = ProcessPoolExecutor(max_workers=max(1, BACKTEST_RUN_THREADS))
+    return _procs.submit(fn, *args, **kwargs).result()
+
+
+def shutdown() -> None:
+    """
+    Encerra os pools (lifespan da app). O uvicorn repassa o SIGTERM ao sair,
+    então o atexit do concurrent.futures não roda e os processos ficariam órfãos.
+    """
+    global _pool, _procs
+    with _lock:
+        pool, procs, _pool, _procs = _pool, _procs, None, None
+    if procs is not None:
+        procs.shutdown(wait=True, cancel_futures=True)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,76 @@
+# app/core/profiling.py
+"""
+Instrumentação dos backtests: tempo por fase, tempo por analyzer do
+Backtrader e captura opcional com cProfile.
+"""
+from __future__ import annotations
+
+import cProfile
+import io
+import pstats
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+import backtrader as bt
+
+PROFILE_TOP_N = 40  # funções no relatório do cProfile (ordenado por tempo acumulado)
+
+# hooks que o Cerebro chama em cada analyzer (os filhos, ex. o TimeReturn do
+# SharpeRatio_A, rodam dentro do hook do pai e entram na conta dele)
+_ANALYZER_HOOKS = ("_start", "_prenext", "_nextstart", "_next", "_notify_order", "_notify_trade",
+                   "_notify_cashvalue", "_notify_fund", "_stop")
+
+
+class PhaseTimer:
+    """Acumula segundos por fase: with timer.phase("load"): ... -> timer.timings["load_s"]."""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    def add(self, name: str, seconds: float) -> None:
+        key = f"{name}_s"
+        self.timings[key] = self.timings.get(key, 0.0) + seconds
+
+    def finish(self) -> Dict[str, float]:
+        self.timings["total_s"] = time.perf_counter() - self._t0
+        return self.timings
+
+
+def timed_analyzer(cls: type, acc: Dict[str, float], name: str) -> type:
+    """Subclasse do analyzer que soma em acc[name] o tempo gasto nos hooks do Cerebro."""
+    def wrap(hook: str):
+        base = getattr(cls, hook)
+
+        def timed(self, *args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return base(self, *args, **kwargs)
+            finally:
+                acc[name] = acc.get(name, 0.0) + (time.perf_counter() - t0)
+        return timed
+
+    return type(f"Timed{cls.__name__}", (cls,), {h: wrap(h) for h in _ANALYZER_HOOKS if hasattr(bt.Analyzer, h)})
+
+
+@contextmanager
+def profiled(out: dict, top_n: int = PROFILE_TOP_N):
+    """Roda o bloco sob cProfile e grava o relatório (texto do pstats) em out["profile"]."""
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        buf = io.StringIO()
+        pstats.Stats(prof, stream=buf).strip_dirs().sort_stats("cumulative").print_stats(top_n)
+        out["profile"] = buf.getvalue()
@@ -1,4 +1,6 @@
 
+import math
+
 import backtrader as bt
 
 """
@@ -18,12 +20,47 @@ Três estratégias trend following para o case:
    - Entra quando o retorno de lookback excede um limiar (threshold).
    - Sai quando momentum <= 0 (zeragem simples).
    - Tamanho = floor( equity * risk_perc / (atr_k * ATR) ).
+
+Quando o feed traz séries já gravadas na tabela indicators (linhas extras
+"sma_N" / "wilder_atr_N" do PandasDataBT), as estratégias usam essas linhas em
+vez de recalcular SMA/ATR dentro do Backtrader. O "atr_N" gravado (média
+simples do true range) não é o bt.ind.ATR e nunca substitui o ATR da estratégia.
+
+Com vários feeds (modo carteira), cada estratégia opera cada ativo de forma
+independente, com o tamanho calculado sobre o equity total do broker.
 """
 
 
+def stored_indicator_names(strategy_type: str, sma_fast: int, sma_slow: int, atr_window: int) -> tuple[str, ...]:
+    """Séries gravadas que a estratégia lê do feed (_sma_line/_atr_line); _load_df só carrega essas."""
+    names = (f"wilder_atr_{atr_window}",)
+    if strategy_type == "sma_cross":
+        names = (f"sma_{sma_fast}", f"sma_{sma_slow}") + names
+    return names
+
+
+def _stored_line(data, name: str):
+    """Linha pré-calculada do feed (ex.: "sma_20"), ou None se o feed não a tiver."""
+    if name in data.lines.getlinealiases():
+        return getattr(data.lines, name)
+    return None
+
+
+def _atr_line(data, period: int):
+    line = _stored_line(data, f"wilder_atr_{period}")
+    return line if line is not None else bt.ind.ATR(data, period=period)
+
+
+def _sma_line(data, period: int):
+    line = _stored_line(data, f"sma_{period}")
+    return line if line is not None else bt.ind.SMA(data.close, period=period)
+
+
 def _position_size_by_risk(strategy: bt.Strategy, atr_value: float, atr_k: float, risk_perc: float) -> int:
     """Calcula o tamanho da posição pelo risco (% do equity) e distância de stop (k * ATR)."""
     equity = float(strategy.broker.getvalue())
+    if not math.isfinite(atr_value):  # série gravada ainda sem valor (aquecimento)
+        return 0
     atr = max(1e-6, float(atr_value))
     stop_distance = atr_k * atr
     if stop_distance <= 0:
@@ -42,21 +79,21 @@ class SmaCrossRiskATR(bt.Strategy):
     )
 
     def __init__(self):
-        close = self.datas[0].close
-        self.sma_fast = bt.ind.SMA(close, period=self.p.sma_fast)
-        self.sma_slow = bt.ind.SMA(close, period=self.p.sma_slow)
-        self.crossover = bt.ind.CrossOver(self.sma_fast, self.sma_slow)
-        self.atr = getattr(self.datas[0], "atr", bt.ind.ATR(self.data, period=self.p.atr_window))
+        self.crossover, self.atr = {}, {}
+        for d in self.datas:
+            self.crossover[d] = bt.ind.CrossOver(_sma_line(d, self.p.sma_fast), _sma_line(d, self.p.sma_slow))
+            self.atr[d] = _atr_line(d, self.p.atr_window)
 
     def next(self):
-        size = _position_size_by_risk(self, self.atr[0], self.p.atr_k, self.p.risk_perc)
+        for d in self.datas:
+            size = _position_size_by_risk(self, self.atr[d][0], self.p.atr_k, self.p.risk_perc)
 
-        if not self.position:
-            if self.crossover > 0 and size > 0:
-                self.buy(size=size)
-        else:
-            if self.crossover < 0:
-                self.close()
+            if not self.getposition(d):
+                if self.crossover[d][0] > 0 and size > 0:
+                    self.buy(data=d, size=size)
+            else:
+                if self.crossover[d][0] < 0:
+                    self.close(data=d)
 
 
 class DonchianBreakout(bt.Strategy):
@@ -69,19 +106,22 @@ class DonchianBreakout(bt.Strategy):
     )
 
     def __init__(self):
-        self.dc_high = bt.ind.Highest(self.data.high, period=self.p.n_high)
-        self.dc_low = bt.ind.Lowest(self.data.low, period=self.p.n_low)
-        self.atr = getattr(self.datas[0], "atr", bt.ind.ATR(self.data, period=self.p.atr_window))
+        self.dc_high, self.dc_low, self.atr = {}, {}, {}
+        for d in self.datas:
+            self.dc_high[d] = bt.ind.Highest(d.high, period=self.p.n_high)
+            self.dc_low[d] = bt.ind.Lowest(d.low, period=self.p.n_low)
+            self.atr[d] = _atr_line(d, self.p.atr_window)
 
     def next(self):
-        size = _position_size_by_risk(self, self.atr[0], self.p.atr_k, self.p.risk_perc)
+        for d in self.datas:
+            size = _position_size_by_risk(self, self.atr[d][0], self.p.atr_k, self.p.risk_perc)
 
-        if not self.position:
-            if self.data.close[0] > self.dc_high[0] and size > 0:
-                self.buy(size=size)
-        else:
-            if self.data.close[0] < self.dc_low[0]:
-                self.close()
+            if not self.getposition(d):
+                if d.close[0] > self.dc_high[d][0] and size > 0:
+                    self.buy(data=d, size=size)
+            else:
+                if d.close[0] < self.dc_low[d][0]:
+                    self.close(data=d)
 
 
 class MomentumTF(bt.Strategy):
@@ -94,16 +134,19 @@ class MomentumTF(bt.Strategy):
     )
 
     def __init__(self):
-        self.mom = (self.data.close / self.data.close(-self.p.lookback)) - 1.0
-        self.atr = getattr(self.datas[0], "atr", bt.ind.ATR(self.data, period=self.p.atr_window))
+        self.mom, self.atr = {}, {}
+        for d in self.datas:
+            self.mom[d] = (d.close / d.close(-self.p.lookback)) - 1.0
+            self.atr[d] = _atr_line(d, self.p.atr_window)
 
     def next(self):
-        size = _position_size_by_risk(self, self.atr[0], self.p.atr_k, self.p.risk_perc)
-        mom_today = float(self.mom[0]) if self.mom[0] is not None else float("nan")
-
-        if not self.position:
-            if mom_today > self.p.threshold and size > 0:
-                self.buy(size=size)
-        else:
-            if mom_today <= 0:
-                self.close()
+        for d in self.datas:
+            size = _position_size_by_risk(self, self.atr[d][0], self.p.atr_k, self.p.risk_perc)
+            mom_today = float(self.mom[d][0]) if self.mom[d][0] is not None else float("nan")
+
+            if not self.getposition(d):
+                if mom_today > self.p.threshold and size > 0:
+                    self.buy(data=d, size=size)
+            else:
+                if mom_today <= 0:
+                    self.close(data=d)
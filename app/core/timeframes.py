@@ -0,0 +1,48 @@
+# app/core/timeframes.py
+"""
+Intervalos de barra aceitos (nomes do yfinance), conversão para o Backtrader e
+reamostragem OHLCV para intervalos maiores.
+
+As barras intraday são rotuladas pelo início (10:05 cobre [10:05, 10:10)),
+como o yfinance entrega; a reamostragem mantém a mesma convenção.
+"""
+from __future__ import annotations
+
+import backtrader as bt
+import pandas as pd
+
+# nome -> minutos por barra ("1d" = barra diária)
+INTERVALS = {"1m": 1, "2m": 2, "5m": 5, "15m": 15, "30m": 30, "60m": 60, "1h": 60, "1d": 1440}
+DAILY = "1d"
+
+
+def check_interval(interval: str) -> str:
+    if interval not in INTERVALS:
+        raise ValueError(f"interval inválido: {interval} (use {', '.join(INTERVALS)})")
+    return interval
+
+
+def bt_timeframe(interval: str) -> tuple[int, int]:
+    """(TimeFrame, compression) do Backtrader para o intervalo: 5m -> (Minutes, 5), 1d -> (Days, 1)."""
+    minutes = INTERVALS[check_interval(interval)]
+    if interval == DAILY:
+        return bt.TimeFrame.Days, 1
+    return bt.TimeFrame.Minutes, minutes
+
+
+def can_resample(source: str, target: str) -> bool:
+    """target é múltiplo inteiro de source (1m -> 5m, 5m -> 1h, qualquer intraday -> 1d)."""
+    s, t = INTERVALS[check_interval(source)], INTERVALS[check_interval(target)]
+    return t == s or (t > s and (target == DAILY or t % s == 0))
+
+
+def resample_ohlcv(df: pd.DataFrame, target: str) -> pd.DataFrame:
+    """
+    Agrega barras indexadas por timestamp no intervalo `target`: open primeiro,
+    high máximo, low mínimo, close último, volume soma. Intervalos sem negócio
+    (noite, fim de semana) não geram barra. Na diária o índice fica à meia-noite.
+    """
+    rule = "1D" if target == DAILY else f"{INTERVALS[check_interval(target)]}min"
+    agg = {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+    out = df[list(agg)].resample(rule, label="left", closed="left").agg(agg)
+    return out[out["close"].notna()]
@@ -0,0 +1,273 @@
+# app/core/vectorized.py
+"""
+Motor vetorizado (NumPy) para as três estratégias de app/core/strategies.py.
+
+Reproduz a semântica do Backtrader usada em run_backtest:
+  - sinais avaliados no fechamento da barra t (só a partir do minperiod da estratégia);
+  - ordens a mercado executadas na abertura de t+1;
+  - tamanho = _position_size_by_risk sobre o equity em t;
+  - checagem de caixa na submissão (preço de criação = close[t]) e na execução;
+  - comissão percentual sobre o valor negociado;
+  - métricas equivalentes a DrawDown, TradeAnalyzer e SharpeRatio_A (anual).
+
+Os indicadores e sinais são calculados em arrays; o laço só percorre as
+entradas/saídas (uma iteração por trade), não cada barra. Colunas "sma_N" /
+"wilder_atr_N" já presentes no DataFrame (indicadores gravados, ver _load_df)
+são usadas no lugar do cálculo, como fazem as estratégias do Backtrader.
+
+Diferenças conhecidas em relação ao Backtrader:
+  - uma compra aprovada na submissão mas sem caixa na abertura seguinte é
+    descartada (o Backtrader a mantém pendente para as próximas barras);
+  - os trades trazem preço/quantidade reais da saída (o TradeCollector, sem
+    tradehistory, cai para close da barra e quantidade 1).
+"""
+from __future__ import annotations
+
+import math
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.core.indicators import wilder_atr
+
+RISK_FREE_RATE = 0.01  # mesmo padrão do SharpeRatio do Backtrader (anual)
+
+
+# --- Indicadores (mesmas definições do Backtrader) ---
+
+def _rolling(x: np.ndarray, window: int, fn) -> np.ndarray:
+    out = np.full(x.shape, np.nan)
+    if window <= len(x):
+        out[window - 1:] = fn(sliding_window_view(x, window), axis=1)
+    return out
+
+def _sma(x: np.ndarray, window: int) -> np.ndarray:
+    return _rolling(x, window, np.mean)
+
+def _wilder_atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int) -> np.ndarray:
+    """bt.ind.ATR: média suavizada (alpha=1/window) do true range, semeada pela média simples."""
+    return wilder_atr({"high": high, "low": low, "close": close}, window)
+
+def _crossover(fast: np.ndarray, slow: np.ndarray, start: int) -> np.ndarray:
+    """bt.ind.CrossOver: +1/-1 usando a última diferença não-nula da barra anterior."""
+    n = len(fast)
+    out = np.zeros(n)
+    if start >= n:
+        return out
+    diff = fast - slow
+    # nzd: diferença, repetindo a anterior quando zero (semeada em start - 1);
+    # NaN (série gravada ainda sem valor) conta como diferença, como no Backtrader
+    pos = np.arange(n)
+    keep = (diff != 0) | (pos == start - 1)
+    last = np.maximum.accumulate(np.where(keep, pos, -1))
+    nzd = np.where(last >= 0, diff[np.maximum(last, 0)], np.nan)
+    prev = np.full(n, np.nan)
+    prev[1:] = nzd[:-1]
+    up = (prev < 0) & (fast > slow)
+    down = (prev > 0) & (fast < slow)
+    out[start:] = up[start:].astype(float) - down[start:].astype(float)
+    return out
+
+
+def _stored_or(df: pd.DataFrame, name: str, compute, minp: int) -> tuple[np.ndarray, int]:
+    """Coluna gravada (minperiod 1, como uma linha do feed) ou o indicador calculado."""
+    if name in df.columns:
+        return df[name].to_numpy(float), 1
+    return compute(), minp
+
+
+# --- Sinais por estratégia ---
+
+def min_period(columns, strategy_type: str, sma_fast: int, sma_slow: int, atr_window: int,
+               sp: Dict[str, Any]) -> int:
+    """
+    Minperiod da estratégia (barras até o primeiro next()), igual ao do Backtrader.
+    Indicadores presentes em `columns` (gravados) contam como linhas do feed: minperiod 1.
+    """
+    def mp(name: str, n: int) -> int:
+        return 1 if name in columns else n
+
+    atr_minp = mp(f"wilder_atr_{atr_window}", atr_window + 1)
+    if strategy_type == "sma_cross":
+        return max(max(mp(f"sma_{sma_fast}", sma_fast), mp(f"sma_{sma_slow}", sma_slow)) + 1, atr_minp)
+    if strategy_type == "donchian_breakout":
+        return max(int(sp.get("n_high", 20)), int(sp.get("n_low", 10)), atr_minp)
+    if strategy_type == "momentum":
+        return max(int(sp.get("lookback", 60)) + 1, atr_minp)
+    raise ValueError("strategy_type inválido")
+
+
+def _signals(df: pd.DataFrame, strategy_type: str, sma_fast: int, sma_slow: int, atr_window: int,
+             sp: Dict[str, Any]) -> tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """Retorna (entrada, saída, atr, minperiod) em arrays do tamanho do DataFrame."""
+    high = df["high"].to_numpy(float)
+    low = df["low"].to_numpy(float)
+    close = df["close"].to_numpy(float)
+    n = len(close)
+    atr, _ = _stored_or(df, f"wilder_atr_{atr_window}", lambda: _wilder_atr(high, low, close, atr_window),
+                        atr_window + 1)
+
+    if strategy_type == "sma_cross":
+        fast, fast_minp = _stored_or(df, f"sma_{sma_fast}", lambda: _sma(close, sma_fast), sma_fast)
+        slow, slow_minp = _stored_or(df, f"sma_{sma_slow}", lambda: _sma(close, sma_slow), sma_slow)
+        slow_minp = max(fast_minp, slow_minp)
+        with np.errstate(invalid="ignore"):
+            cross = _crossover(fast, slow, slow_minp)
+        entry, exit_ = cross > 0, cross < 0
+    elif strategy_type == "donchian_breakout":
+        n_high, n_low = int(sp.get("n_high", 20)), int(sp.get("n_low", 10))
+        with np.errstate(invalid="ignore"):
+            entry = close > _rolling(high, n_high, np.max)
+            exit_ = close < _rolling(low, n_low, np.min)
+    elif strategy_type == "momentum":
+        lookback, threshold = int(sp.get("lookback", 60)), float(sp.get("threshold", 0.0))
+        mom = np.full(n, np.nan)
+        if lookback < n:
+            mom[lookback:] = (close[lookback:] / close[:-lookback]) - 1.0
+        with np.errstate(invalid="ignore"):
+            entry = mom > threshold
+            exit_ = mom <= 0
+    else:
+        raise ValueError("strategy_type inválido")
+
+    minp = min_period(df.columns, strategy_type, sma_fast, sma_slow, atr_window, sp)
+    active = np.arange(n) >= (minp - 1)
+    return entry & active, exit_ & active, atr, minp
+
+
+# --- Métricas (equivalentes aos analyzers) ---
+
+def _max_drawdown_pct(equity: np.ndarray) -> float:
+    peak = np.maximum.accumulate(equity)
+    return float(np.max(100.0 * (peak - equity) / peak)) if len(equity) else 0.0
+
+def _sharpe_annual(dates: pd.DatetimeIndex, equity: np.ndarray, initial_cash: float) -> float | None:
+    """SharpeRatio_A (timeframe anual): retornos por ano-calendário, desvio populacional."""
+    if not len(equity):
+        return None
+    year_end = pd.Series(equity, index=dates).groupby(dates.year).last().to_numpy()
+    starts = np.concatenate([[initial_cash], year_end[:-1]])
+    rets = year_end / starts - 1.0
+    # fsum, como backtrader.mathsupport: séries constantes dão desvio exatamente 0
+    excess = [float(r) - RISK_FREE_RATE for r in rets]
+    avg = math.fsum(excess) / len(excess)
+    dev = math.sqrt(math.fsum((x - avg) ** 2 for x in excess) / len(excess))
+    if dev == 0.0:
+        return None
+    return float(avg / dev)
+
+
+# --- Execução ---
+
+def run_vectorized(
+    df: pd.DataFrame,
+    initial_cash: float,
+    commission: float,
+    sma_fast: int,
+    sma_slow: int,
+    atr_window: int,
+    atr_k: float,
+    risk_perc: float,
+    strategy_type: str = "sma_cross",
+    strategy_params: Dict[str, Any] | None = None,
+) -> dict:
+    """Mesmo contrato de backtest_service._execute: {metrics, trades, daily}."""
+    sp = strategy_params or {}
+    try:
+        entry, exit_, atr, _ = _signals(df, strategy_type, sma_fast, sma_slow, atr_window, sp)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    open_ = df["open"].to_numpy(float)
+    close = df["close"].to_numpy(float)
+    n = len(close)
+    c = float(commission)
+
+    # stop = atr_k * max(1e-6, ATR), como em _position_size_by_risk (ATR NaN -> size 0)
+    with np.errstate(invalid="ignore"):
+        stop = atr_k * np.maximum(1e-6, atr)
+
+    pos = np.zeros(n, dtype=np.int64)
+    cash_arr = np.empty(n)
+    trades = []
+    n_opened = 0
+
+    cash = float(initial_cash)
+    i = 0  # próxima barra em que a estratégia está zerada
+    while i < n:
+        # candidatos a entrada: sinal + size > 0 + caixa na submissão (preço de criação = close)
+        seg = slice(i, n - 1)  # uma ordem na última barra nunca executa
+        cand = np.flatnonzero(entry[seg]) + i
+        if atr_k <= 0:  # stop_distance <= 0 -> size 0
+            cand = cand[:0]
+        size = np.zeros(len(cand), dtype=np.int64)
+        cand = cand[np.isfinite(stop[cand])]
+        if len(cand):
+            size = np.floor((cash * risk_perc) / stop[cand]).astype(np.int64)
+            cost = size * close[cand]
+            ok = (size > 0) & (cash - cost - size * c * close[cand] >= 0.0)
+            cand, size = cand[ok], size[ok]
+
+        filled = None
+        for k, sz in zip(cand, size):
+            f = k + 1
+            px = open_[f]
+            new_cash = cash - sz * px - sz * c * px
+            if new_cash >= 0.0:
+                filled = (f, int(sz), px, new_cash)
+                break
+        if filled is None:
+            cash_arr[i:] = cash
+            break
+
+        f, sz, entry_px, cash_in = filled
+        cash_arr[i:f] = cash
+        n_opened += 1
+
+        # saída: primeiro sinal a partir da barra da entrada, executado na abertura seguinte
+        ex = np.flatnonzero(exit_[f:n - 1]) + f
+        if not len(ex):
+            pos[f:] = sz
+            cash_arr[f:] = cash_in
+            break
+        x = int(ex[0]) + 1
+        exit_px = open_[x]
+        pnl = sz * (exit_px - entry_px)
+        comm = sz * c * entry_px + sz * c * exit_px
+        pos[f:x] = sz
+        cash_arr[f:x] = cash_in
+        cash = cash_in + sz * entry_px + pnl - sz * c * exit_px
+        trades.append({
+            "date": df.index[x].date().isoformat(),
+            "side": "SELL",
+            "price": float(exit_px),
+            "size": sz,
+            "pnl": float(pnl - comm),
+        })
+        i = x
+
+    equity = cash_arr + pos * close
+
+    final_value = float(equity[-1]) if n else float(initial_cash)
+    closed = len(trades)
+    won = sum(1 for t in trades if t["pnl"] >= 0.0)
+    metrics = {
+        "final_value": final_value,
+        "return_pct": (final_value / initial_cash - 1.0) if initial_cash else None,
+        "max_drawdown_pct": _max_drawdown_pct(equity),
+        "sharpe_a": _sharpe_annual(df.index, equity, initial_cash),
+        "total_trades": n_opened,
+        "won": won if closed else None,
+        "lost": (closed - won) if closed else None,
+    }
+
+    dates = df.index.strftime("%Y-%m-%d")
+    last = ~dates.duplicated(keep="last")  # intraday: última barra de cada dia
+    daily = [
+        {"date": d, "position": int(p), "cash": float(cs), "equity": float(e)}
+        for d, p, cs, e in zip(dates[last], pos[last], cash_arr[last], equity[last])
+    ]
+    return {"metrics": metrics, "trades": trades, "daily": daily}
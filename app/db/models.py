@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, Float, ForeignKey, UniqueConstraint, Index, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Date, Float, ForeignKey, UniqueConstraint, Index, DateTime, JSON, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .base import Base
@@ -8,6 +8,8 @@ class Symbol(Base):
     id = Column(Integer, primary_key=True, index=True)
     ticker = Column(String(32), unique=True, index=True, nullable=False)
     name = Column(String(128), nullable=True)
+    # incrementado na transação de cada upsert de prices/indicators (versão do espelho mmap)
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
     prices = relationship("Price", back_populates="symbol")
     indicators = relationship("Indicator", back_populates="symbol")
 
@@ -40,13 +42,18 @@ class Backtest(Base):
     initial_cash = Column(Float, nullable=False)
     commission = Column(Float, nullable=False, default=0.0)
     params = Column(JSON, nullable=True)
-    status = Column(String(16), nullable=False, default="finished")
+    status = Column(String(16), nullable=False, default="finished", index=True)  # queued/running/finished/failed
     metrics = Column(JSON, nullable=True)
+    error = Column(String(500), nullable=True)
+    fingerprint = Column(String(64), nullable=True, index=True)  # pedido + dados + código (dedupe)
+    timings = Column(JSON, nullable=True)   # segundos por fase (load/setup/engine/analyzers/collect/persist)
+    profile = Column(Text, nullable=True)   # relatório do cProfile, quando pedido
 
 class Trade(Base):
     __tablename__ = "trades"
     id = Column(Integer, primary_key=True)
     backtest_id = Column(Integer, ForeignKey("backtests.id"), nullable=False, index=True)
+    ticker = Column(String(32), nullable=True)  # ativo do trade (varia no modo carteira)
     date = Column(Date, nullable=False, index=True)
     side = Column(String(4), nullable=False)  # BUY/SELL
     price = Column(Float, nullable=False)
@@ -84,3 +91,17 @@ class Indicator(Base):
         UniqueConstraint("symbol_id","date","name", name="uq_indicator_symbol_date_name"),
     )
 
+
+class WalkForwardWindow(Base):
+    __tablename__ = "walk_forward_windows"
+    id = Column(Integer, primary_key=True)
+    backtest_id = Column(Integer, ForeignKey("backtests.id"), nullable=False, index=True)
+    idx = Column(Integer, nullable=False)
+    train_start = Column(Date, nullable=False)
+    train_end = Column(Date, nullable=False)
+    test_start = Column(Date, nullable=False)
+    test_end = Column(Date, nullable=False)
+    params = Column(JSON, nullable=True)         # melhor combinação no treino
+    train_metrics = Column(JSON, nullable=True)
+    test_metrics = Column(JSON, nullable=True)
+    __table_args__ = (UniqueConstraint("backtest_id", "idx", name="uq_wf_window_per_backtest"),)
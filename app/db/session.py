@@ -1,16 +1,89 @@
+import logging
 import os
-from sqlalchemy import create_engine
+import time
+import weakref
+from functools import lru_cache
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import ArgumentError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from starlette.concurrency import run_in_threadpool
+
+try:  # engine assíncrono é opcional (extra "async": greenlet + asyncpg/aiosqlite)
+    import greenlet  # noqa: F401  (o adaptador async do SQLAlchemy depende dele)
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    HAS_ASYNC_DB = True
+except ImportError:
+    HAS_ASYNC_DB = False
+
+from app.core.metrics import (
+    DB_POOL_CHECKOUT_WAIT, DB_POOL_IN_USE, DB_POOL_SIZE, DB_POOL_OVERFLOW, DB_POOL_CHECKOUTS,
+)
+
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# URL do engine async das rotas de leitura; vazio = DATABASE_URL com o driver async (ASYNC_DRIVERS)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or None
+# 1 = rotas de leitura pelo engine async (extra "async"); 0 = engine síncrono numa thread
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
 
 _engine = None
 _SessionLocal = None
+_async_engine = None
+_AsyncSessionLocal = None
+_async_unavailable = False
+
+@lru_cache(maxsize=None)
+def timed_pool_class(cls: type) -> type:
+    """Subclasse do pool que mede, em db_pool_checkout_wait_seconds, a espera por uma conexão."""
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return cls._do_get(self)
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - t0, db=self._dialect.name)
+
+    return type(f"Timed{cls.__name__}", (cls,), {"_do_get": _do_get})
+
+_instrumented = weakref.WeakSet()
+
+def instrument_engine(engine) -> None:
+    """
+    Liga as métricas do pool ao engine (idempotente): conexões emprestadas,
+    checkouts e, em QueuePool, tamanho/overflow. A espera no checkout só é medida
+    se o pool vier de timed_pool_class (caso do get_engine).
+    """
+    if engine in _instrumented:
+        return
+    _instrumented.add(engine)
+    db = engine.dialect.name
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_conn, record, proxy):
+        DB_POOL_IN_USE.inc(db=db)
+        DB_POOL_CHECKOUTS.inc(db=db)
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_conn, record):
+        DB_POOL_IN_USE.dec(db=db)
+
+    # engine.pool muda num dispose(); os eventos acima são copiados para o pool novo
+    ref = weakref.ref(engine)
+    if isinstance(engine.pool, QueuePool):
+        DB_POOL_SIZE.set_function(lambda: ref().pool.size() if ref() else 0, db=db)
+        DB_POOL_OVERFLOW.set_function(lambda: ref().pool.overflow() if ref() else 0, db=db)
 
 def get_engine():
     global _engine
     if _engine is None:
-        _engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+        url = make_url(DATABASE_URL)
+        poolclass = timed_pool_class(url.get_dialect().get_pool_class(url))
+        _engine = create_engine(url, pool_pre_ping=True, poolclass=poolclass)
+        instrument_engine(_engine)
     return _engine
 
 def get_session_local():
@@ -18,3 +91,73 @@ def get_session_local():
     if _SessionLocal is None:
         _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
     return _SessionLocal
+
+def async_url(url):
+    """postgresql+psycopg2://... -> postgresql+asyncpg://..., sqlite:///x.db -> sqlite+aiosqlite:///x.db."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"sem driver async para {backend}")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+def get_async_engine():
+    """
+    Engine async (mesmo pool instrumentado do síncrono) ou None quando não há
+    extra/driver instalado ou DB_ASYNC=0: quem chama cai para o engine síncrono.
+    """
+    global _async_engine, _async_unavailable
+    if _async_engine is None and not _async_unavailable:
+        if not (HAS_ASYNC_DB and DB_ASYNC):
+            _async_unavailable = True
+            return None
+        try:
+            url = make_url(ASYNC_DATABASE_URL) if ASYNC_DATABASE_URL else async_url(DATABASE_URL)
+            poolclass = timed_pool_class(url.get_dialect().get_pool_class(url))
+            _async_engine = create_async_engine(url, pool_pre_ping=True, poolclass=poolclass)
+        except (ImportError, ValueError, ArgumentError) as e:  # driver ausente, banco sem driver async ou URL vazia
+            logger.warning("Engine async indisponível, leituras no engine síncrono: %s", e)
+            _async_unavailable = True
+            return None
+        instrument_engine(_async_engine.sync_engine)
+    return _async_engine
+
+def get_async_session_local():
+    global _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        engine = get_async_engine()
+        if engine is None:
+            return None
+        _AsyncSessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    return _AsyncSessionLocal
+
+async def run_read(fn, *args):
+    """
+    Executa fn(db, *args) — código de leitura escrito para Session síncrona —
+    sem bloquear o event loop: com o engine async, via AsyncSession.run_sync (o
+    I/O do banco vira await); sem ele, numa thread do pool do Starlette.
+    """
+    AsyncSessionLocal = get_async_session_local()
+    if AsyncSessionLocal is None:
+        def _sync():
+            with get_session_local()() as db:
+                return fn(db, *args)
+        return await run_in_threadpool(_sync)
+    async with AsyncSessionLocal() as db:
+        return await db.run_sync(fn, *args)
+
+async def ping_db() -> bool:
+    """SELECT 1 no banco sem bloquear o event loop (health check)."""
+    engine = get_async_engine()
+    try:
+        if engine is None:
+            def _sync():
+                with get_engine().connect() as conn:
+                    conn.execute(text("SELECT 1"))
+            await run_in_threadpool(_sync)
+        else:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        logger.exception("Health check: falha ao consultar o banco")
+        return False
@@ -1,5 +1,5 @@
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import date
 from typing import Optional, Dict, Any, List, Literal
 
@@ -18,13 +18,148 @@ class RunBacktestRequest(BaseModel):
 
     strategy_type: Literal["sma_cross", "donchian_breakout", "momentum"] = "sma_cross"
     strategy_params: Optional[Dict[str, Any]] = None
+    engine: Literal["backtrader", "vectorized"] = "backtrader"
+    # True = executa mesmo se um backtest idêntico já estiver gravado
+    force: bool = False
+    # True = roda sob cProfile (sem reaproveitar resultados); relatório vai na resposta e no backtest
+    profile: bool = False
+    # barras intraday do IntradayStore (None = diárias da tabela prices) e
+    # reamostragem opcional para um intervalo maior antes de rodar
+    interval: Optional[Literal["1m", "2m", "5m", "15m", "30m", "60m", "1h", "1d"]] = None
+    timeframe: Optional[Literal["1m", "2m", "5m", "15m", "30m", "60m", "1h", "1d"]] = None
+
+class PortfolioBacktestRequest(BaseModel):
+    tickers: List[str] = Field(..., min_length=1)
+    start_date: date
+    end_date: date
+    initial_cash: float = 100000
+    commission: float = 0.0
+
+    sma_fast: int = 20
+    sma_slow: int = 50
+    atr_window: int = 14
+    atr_k: float = 2.0
+    risk_perc: float = 0.01
+
+    strategy_type: Literal["sma_cross", "donchian_breakout", "momentum"] = "sma_cross"
+    strategy_params: Optional[Dict[str, Any]] = None
+    force: bool = False
+
+class PortfolioBacktestResponse(BaseModel):
+    backtest_id: int
+    metrics: Dict[str, Any]
+    per_symbol: Dict[str, Dict[str, Any]]
+    timings: Optional[Dict[str, float]] = None
+    reused: bool = False
+
+class SweepRequest(BaseModel):
+    ticker: str
+    start_date: date
+    end_date: date
+    initial_cash: float = 100000
+    commission: float = 0.0
+
+    strategy_type: Literal["sma_cross", "donchian_breakout", "momentum"] = "sma_cross"
+    # valores fixos (fora da grade)
+    sma_fast: int = 20
+    sma_slow: int = 50
+    atr_window: int = 14
+    atr_k: float = 2.0
+    risk_perc: float = 0.01
+    strategy_params: Optional[Dict[str, Any]] = None
+
+    # ex.: {"sma_fast": [10, 20], "sma_slow": [50, 100], "atr_k": [1.5, 2.0]}
+    grid: Dict[str, List[Any]] = Field(..., min_length=1)
+    mode: Literal["grid", "random"] = "grid"
+    n_samples: Optional[int] = Field(None, ge=1)
+    seed: Optional[int] = None
+    max_workers: Optional[int] = Field(None, ge=1, le=64)
+    persist_details: bool = False
+    sort_by: str = "sharpe_a"
+    engine: Literal["backtrader", "vectorized"] = "backtrader"
+    # False = combinações já gravadas com a mesma impressão digital são reaproveitadas
+    force: bool = False
+
+class WalkForwardRequest(BaseModel):
+    ticker: str
+    start_date: date
+    end_date: date
+    initial_cash: float = 100000
+    commission: float = 0.0
+
+    strategy_type: Literal["sma_cross", "donchian_breakout", "momentum"] = "sma_cross"
+    # valores fixos (fora da grade)
+    sma_fast: int = 20
+    sma_slow: int = 50
+    atr_window: int = 14
+    atr_k: float = 2.0
+    risk_perc: float = 0.01
+    strategy_params: Optional[Dict[str, Any]] = None
+
+    grid: Dict[str, List[Any]] = Field(..., min_length=1)
+    # tamanhos em barras (pregões); o passo entre janelas é test_bars
+    train_bars: int = Field(252, ge=2)
+    test_bars: int = Field(63, ge=1)
+    anchored: bool = False
+    objective: Literal["sharpe_a", "return_pct", "final_value"] = "sharpe_a"
+    max_workers: Optional[int] = Field(None, ge=1, le=64)
+    engine: Literal["backtrader", "vectorized"] = "backtrader"
+    force: bool = False
+
+class WalkForwardWindowOut(BaseModel):
+    idx: int
+    train_start: date
+    train_end: date
+    test_start: date
+    test_end: date
+    params: Dict[str, Any]
+    train_metrics: Optional[Dict[str, Any]] = None
+    test_metrics: Optional[Dict[str, Any]] = None
+
+class WalkForwardResponse(BaseModel):
+    backtest_id: int
+    metrics: Dict[str, Any]
+    windows: List[WalkForwardWindowOut]
+    workers: Optional[int] = None
+    elapsed_s: Optional[float] = None
+    reused: bool = False
+
+class SweepRow(BaseModel):
+    params: Dict[str, Any]
+    backtest_id: Optional[int] = None
+    metrics: Optional[Dict[str, Any]] = None
+    elapsed_s: Optional[float] = None
+    error: Optional[str] = None
+    reused: bool = False
+
+class SweepResponse(BaseModel):
+    ticker: str
+    strategy_type: str
+    combinations: int
+    workers: int
+    elapsed_s: float
+    results: List[SweepRow]
 
 class RunBacktestResponse(BaseModel):
     backtest_id: int
     metrics: Dict[str, Any]
+    timings: Optional[Dict[str, float]] = None
+    profile: Optional[str] = None
+    reused: bool = False
+
+class JobSubmitResponse(BaseModel):
+    backtest_id: int
+    status: str
+
+class JobStatusResponse(BaseModel):
+    backtest_id: int
+    status: str
+    error: Optional[str] = None
+    metrics: Optional[Dict[str, Any]] = None
 
 class TradeOut(BaseModel):
     date: date
+    ticker: Optional[str] = None
     side: str
     price: float
     size: int
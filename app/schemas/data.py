@@ -1,5 +1,6 @@
-from pydantic import BaseModel, field_validator
-from datetime import date
+from pydantic import BaseModel, Field, field_validator
+from typing import Dict, List, Optional, Literal
+from datetime import date, datetime
 
 class UpdateDataRequest(BaseModel):
     ticker: str
@@ -8,6 +9,9 @@ class UpdateDataRequest(BaseModel):
     sma_fast: int = 20
     sma_slow: int = 50
     atr_window: int = 14
+    incremental: bool = False
+    # indicadores extras por nome ("ema_20", "rsi_14", "bb_upper_20"...)
+    indicators: List[str] = []
 
     @field_validator("ticker")
     @classmethod
@@ -18,3 +22,72 @@ class UpdateDataResponse(BaseModel):
     symbol_id: int
     inserted_prices: int
     inserted_indicators: int
+
+class BatchUpdateRequest(BaseModel):
+    tickers: List[str] = Field(..., min_length=1, max_length=1000)
+    start: date
+    end: date
+    sma_fast: int = 20
+    sma_slow: int = 50
+    atr_window: int = 14
+    incremental: bool = False
+    indicators: List[str] = []
+    max_workers: int = Field(8, ge=1, le=32)
+
+class TickerUpdateResult(BaseModel):
+    ticker: str
+    symbol_id: Optional[int] = None
+    inserted_prices: int
+    inserted_indicators: int
+    elapsed_s: float
+    error: Optional[str] = None
+
+class BatchUpdateResponse(BaseModel):
+    results: List[TickerUpdateResult]
+    ok: int
+    failed: int
+    elapsed_s: float
+
+IntradayInterval = Literal["1m", "2m", "5m", "15m", "30m", "60m", "1h"]
+
+class IntradayUpdateRequest(BaseModel):
+    ticker: str
+    start: date
+    end: date
+    interval: IntradayInterval = "1m"
+
+    @field_validator("ticker")
+    @classmethod
+    def strip_up(cls, v: str) -> str:
+        return v.strip()
+
+class IntradayUpdateResponse(BaseModel):
+    ticker: str
+    interval: str
+    bars: int
+    first: Optional[datetime] = None
+    last: Optional[datetime] = None
+    elapsed_s: float
+
+class MaterializeIndicatorsRequest(BaseModel):
+    ticker: str
+    # None = indicadores do catálogo (INDICATOR_CATALOG) para o ticker
+    names: Optional[List[str]] = None
+
+    @field_validator("ticker")
+    @classmethod
+    def strip_up(cls, v: str) -> str:
+        return v.strip()
+
+class MaterializeIndicatorsResponse(BaseModel):
+    symbol_id: int
+    names: List[str]
+    bars: int
+    inserted_indicators: int
+    elapsed_s: float
+
+class IndicatorMatrixResponse(BaseModel):
+    ticker: str
+    dates: List[date]
+    columns: List[str]
+    values: Dict[str, List[Optional[float]]]
@@ -1,4 +1,8 @@
-from sqlalchemy import select
+import json
+from datetime import date
+
+import numpy as np
+from sqlalchemy import select, func
 from app.db.session import get_session_local
 from app.db.models import Backtest, Trade, DailyPosition
 import math
@@ -20,47 +24,219 @@ def _iso(d):
 def get_backtest_results(bt_id: int):
     SessionLocal = get_session_local()
     with SessionLocal() as db:
-        bt = db.execute(select(Backtest).where(Backtest.id == bt_id)).scalar_one_or_none()
+        return backtest_results(db, bt_id)
+
+def backtest_version(db, bt_id: int) -> tuple[str, str] | None:
+    """
+    (status, versão) da linha do backtest, ou None se não existe. A versão
+    (created_at + fingerprint) muda quando o id é apagado e reaproveitado e
+    valida as entradas do results_cache entre workers.
+    """
+    row = db.execute(
+        select(Backtest.status, Backtest.created_at, Backtest.fingerprint).where(Backtest.id == bt_id)
+    ).one_or_none()
+    if row is None:
+        return None
+    status, created_at, fingerprint = row
+    return status, f"{_iso(created_at)}|{fingerprint or ''}"
+
+def backtest_results(db, bt_id: int):
+    """Leitura de get_backtest_results numa sessão já aberta (também usada por run_read nas rotas async)."""
+    bt = db.execute(select(Backtest).where(Backtest.id == bt_id)).scalar_one_or_none()
+    if not bt:
+        return None
+
+    trades_rows = db.execute(
+        select(Trade).where(Trade.backtest_id == bt_id).order_by(Trade.date.asc())
+    ).scalars().all()
+
+    daily_rows = db.execute(
+        select(DailyPosition).where(DailyPosition.backtest_id == bt_id).order_by(DailyPosition.date.asc())
+    ).scalars().all()
+
+    raw_metrics = bt.metrics or {}
+    metrics = {k: _num(v) if isinstance(v, (int, float)) else v for k, v in raw_metrics.items()}
+
+    trades = [
+        {
+            "date": _iso(t.date),
+            "ticker": t.ticker,
+            "side": t.side,
+            "price": _num(t.price),
+            "size": int(t.size) if t.size is not None else 0,
+            "pnl": _num(t.pnl),
+        }
+        for t in trades_rows
+    ]
+
+    daily = [
+        {
+            "date": _iso(d.date),
+            "position": int(d.position) if d.position is not None else 0,
+            "cash": _num(d.cash),
+            "equity": _num(d.equity),
+        }
+        for d in daily_rows
+    ]
+
+    return {
+        "backtest_id": bt.id,
+        "ticker": bt.ticker,
+        "strategy_type": bt.strategy_type,
+        "status": bt.status,
+        "metrics": metrics,
+        "timings": bt.timings,
+        "profile": bt.profile,
+        "trades": trades,
+        "daily_positions": daily,
+    }
+
+
+TIMING_STATS_LIMIT = 500
+
+
+def timing_stats(strategy_type: str | None = None, engine: str | None = None,
+                 limit: int = TIMING_STATS_LIMIT) -> dict:
+    """
+    p50/p95/média por fase (segundos) sobre os últimos `limit` backtests
+    finalizados que têm tempos gravados, opcionalmente filtrados por
+    strategy_type e engine (params["engine"]).
+    """
+    SessionLocal = get_session_local()
+    with SessionLocal() as db:
+        stmt = select(Backtest.timings).where(
+            Backtest.status == "finished", Backtest.timings.is_not(None)
+        )
+        if strategy_type:
+            stmt = stmt.where(Backtest.strategy_type == strategy_type)
+        if engine:
+            # params["engine"] vira json_extract (SQLite) / ->> (Postgres); sem a chave = backtrader
+            stmt = stmt.where(func.coalesce(Backtest.params["engine"].as_string(), "backtrader") == engine)
+        stmt = stmt.order_by(Backtest.id.desc()).limit(limit)
+        rows = db.execute(stmt).scalars().all()
+
+    samples: dict[str, list[float]] = {}
+    for timings in rows:
+        for k, v in timings.items():
+            if isinstance(v, (int, float)):
+                samples.setdefault(k.removesuffix("_s"), []).append(float(v))
+    phases = {}
+    for name, vals in sorted(samples.items()):
+        arr = np.asarray(vals)
+        p50, p95 = np.percentile(arr, [50, 95])
+        phases[name] = {"count": len(vals), "p50_s": float(p50), "p95_s": float(p95), "mean_s": float(arr.mean())}
+    return {"backtests": len(rows), "phases": phases}
+
+
+# --- Streaming (NDJSON) ---
+
+RESULT_SECTIONS = {
+    "trades": (Trade, ["date", "ticker", "side", "price", "size", "pnl"]),
+    "daily": (DailyPosition, ["date", "position", "cash", "equity"]),
+}
+STREAM_CHUNK_SIZE = 1000
+
+_FORMAT = {
+    "date": _iso,
+    "ticker": lambda v: v,
+    "side": lambda v: v,
+    "price": _num,
+    "size": lambda v: int(v) if v is not None else 0,
+    "position": lambda v: int(v) if v is not None else 0,
+    "pnl": _num,
+    "cash": _num,
+    "equity": _num,
+}
+
+
+def _line(obj: dict) -> bytes:
+    return (json.dumps(obj, separators=(",", ":")) + "\n").encode()
+
+
+def stream_backtest_results(
+    bt_id: int,
+    sections=("trades", "daily"),
+    start: date | None = None,
+    end: date | None = None,
+    fields: list[str] | None = None,
+    limit: int | None = None,
+    offset: int = 0,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+):
+    """
+    Resultados em NDJSON, linha a linha, sem montar a resposta inteira em memória.
+
+    Primeira linha {"type": "backtest", ...metadados e métricas}; depois uma linha
+    por trade ({"type": "trade", ...}) e por dia ({"type": "daily", ...}), na ordem
+    de `sections`; por fim {"type": "end", "trades": n, "daily": m}.
+    As linhas são lidas com yield_per (cursor do lado do servidor no Postgres).
+    `limit`/`offset` valem por seção; `fields` restringe as colunas (date sempre vai).
+
+    Retorna None se o backtest não existe, {"error": ...} para parâmetros inválidos
+    ou um gerador de bytes.
+    """
+    sections = list(sections)
+    bad = [s for s in sections if s not in RESULT_SECTIONS]
+    if bad or not sections:
+        return {"error": f"seção inválida: {', '.join(bad) or '(vazia)'}"}
+    cols = {}
+    for s in sections:
+        allowed = RESULT_SECTIONS[s][1]
+        wanted = [f for f in (fields or allowed) if f in allowed]
+        cols[s] = ["date"] + [f for f in wanted if f != "date"]
+    if fields:
+        known = {f for s in sections for f in RESULT_SECTIONS[s][1]}
+        unknown = [f for f in fields if f not in known]
+        if unknown:
+            return {"error": f"campo inválido: {', '.join(unknown)}"}
+
+    SessionLocal = get_session_local()
+    with SessionLocal() as db:
+        bt = db.get(Backtest, bt_id)
         if not bt:
             return None
-
-        trades_rows = db.execute(
-            select(Trade).where(Trade.backtest_id == bt_id).order_by(Trade.date.asc())
-        ).scalars().all()
-
-        daily_rows = db.execute(
-            select(DailyPosition).where(DailyPosition.backtest_id == bt_id).order_by(DailyPosition.date.asc())
-        ).scalars().all()
-
-        raw_metrics = bt.metrics or {}
-        metrics = {k: _num(v) if isinstance(v, (int, float)) else v for k, v in raw_metrics.items()}
-
-        trades = [
-            {
-                "date": _iso(t.date),
-                "side": t.side,
-                "price": _num(t.price),
-                "size": int(t.size) if t.size is not None else 0,
-                "pnl": _num(t.pnl),
-            }
-            for t in trades_rows
-        ]
-
-        daily = [
-            {
-                "date": _iso(d.date),
-                "position": int(d.position) if d.position is not None else 0,
-                "cash": _num(d.cash),
-                "equity": _num(d.equity),
-            }
-            for d in daily_rows
-        ]
-
-        return {
+        header = {
+            "type": "backtest",
             "backtest_id": bt.id,
             "ticker": bt.ticker,
             "strategy_type": bt.strategy_type,
-            "metrics": metrics,
-            "trades": trades,
-            "daily_positions": daily,
+            "status": bt.status,
+            "metrics": {k: _num(v) if isinstance(v, (int, float)) else v for k, v in (bt.metrics or {}).items()},
+            "timings": bt.timings,
         }
+
+    def gen():
+        yield _line(header)
+        counts = {}
+        with SessionLocal() as db:
+            for s in sections:
+                model, _ = RESULT_SECTIONS[s]
+                names = cols[s]
+                stmt = select(*[getattr(model, c) for c in names]).where(model.backtest_id == bt_id)
+                if start is not None:
+                    stmt = stmt.where(model.date >= start)
+                if end is not None:
+                    stmt = stmt.where(model.date <= end)
+                stmt = stmt.order_by(model.date.asc(), model.id.asc()).offset(offset)
+                if limit is not None:
+                    stmt = stmt.limit(limit)
+
+                kind = "trade" if s == "trades" else s
+                fmt = [_FORMAT[c] for c in names]
+                n = 0
+                buf = []
+                for row in db.execute(stmt.execution_options(yield_per=chunk_size)):
+                    rec = {"type": kind}
+                    for c, f, v in zip(names, fmt, row):
+                        rec[c] = f(v)
+                    buf.append(json.dumps(rec, separators=(",", ":")))
+                    n += 1
+                    if len(buf) >= chunk_size:
+                        yield ("\n".join(buf) + "\n").encode()
+                        buf = []
+                if buf:
+                    yield ("\n".join(buf) + "\n").encode()
+                counts[s] = n
+        yield _line({"type": "end", **counts})
+
+    return gen()
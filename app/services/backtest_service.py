@@ -1,17 +1,32 @@
 # app/services/backtest_service.py
 from __future__ import annotations
 
+import hashlib
+import time
+from functools import lru_cache
+
 import backtrader as bt
 import pandas as pd
 from datetime import date
 from typing import Optional, Dict, Any
 
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, insert, update, delete
 
 from app.db.session import get_session_local
-from app.db.models import Price, Symbol, Backtest, Trade, DailyPosition, Metric
-from app.core.strategies import SmaCrossRiskATR, DonchianBreakout, MomentumTF
+from app.db.models import Price, Symbol, Backtest, Trade, DailyPosition, Metric, Indicator, WalkForwardWindow
+from app.core.strategies import SmaCrossRiskATR, DonchianBreakout, MomentumTF, stored_indicator_names
 from app.core.collectors import TradeCollector, EquityDailyCollector
+from app.core.vectorized import run_vectorized
+from app.core.profiling import PhaseTimer, timed_analyzer, profiled
+from app.core.metrics import observe_backtest
+from app.core.offload import compute
+from app.core.timeframes import DAILY, bt_timeframe, can_resample, check_interval, resample_ohlcv
+from app.services.intraday_store import intraday_store
+from app.services.price_cache import price_cache
+from app.services import price_mirror as price_mirror_mod
+from app.services.data_service import rebuild_price_mirror
+from app.services.results_cache import results_cache
+from app.services.fingerprint import run_fingerprint, data_hash
 
 
 # --- Feed Pandas para Backtrader (colunas em lower-case) ---
@@ -26,22 +41,137 @@ class PandasDataBT(bt.feeds.PandasData):
         ("openinterest", None),
     )
 
+    def start(self):
+        super().start()
+        # o PandasData original lê cada célula com .iloc a cada barra; aqui as
+        # colunas viram listas uma única vez e _load só indexa
+        df = self.p.dataname
+        self._rows = len(df)
+        self._cols = [
+            (getattr(self.lines, name), df.iloc[:, col].tolist())
+            for name in self.getlinealiases()
+            if name != "datetime" and (col := self._colmapping[name]) is not None
+        ]
+        self._dtnums = [bt.date2num(ts.to_pydatetime()) for ts in df.index]
+
+    def _load(self):
+        self._idx += 1
+        if self._idx >= self._rows:
+            return False
+        i = self._idx
+        for line, values in self._cols:
+            line[0] = values[i]
+        self.lines.datetime[0] = self._dtnums[i]
+        return True
+
+
+OHLCV_COLS = ["open", "high", "low", "close", "volume"]
+
+
+@lru_cache(maxsize=64)
+def _feed_class(extra: tuple[str, ...]) -> type:
+    """Subclasse do PandasDataBT com uma linha por indicador gravado (ex.: "sma_20")."""
+    if not extra:
+        return PandasDataBT
+    return type(
+        "PandasDataBT_" + "_".join(extra),
+        (PandasDataBT,),
+        {"lines": extra, "params": tuple((c, c) for c in extra)},
+    )
+
+
+def make_feed(df: pd.DataFrame, interval: str = DAILY) -> PandasDataBT:
+    """
+    Feed do Backtrader; colunas além do OHLCV viram linhas extras com o mesmo nome.
+    `interval` ("1d", "5m", ...) define timeframe/compression do feed.
+    """
+    extra = tuple(c for c in df.columns if c not in OHLCV_COLS)
+    timeframe, compression = bt_timeframe(interval)
+    return _feed_class(extra)(dataname=df, timeframe=timeframe, compression=compression)
+
 
-def _load_df(ticker: str, start: date, end: date) -> pd.DataFrame | None:
+def _indicator_frame(rows, index: pd.DatetimeIndex) -> pd.DataFrame:
     """
-    Lê OHLCV do Postgres e devolve DataFrame indexado por data com colunas lower-case.
+    Linhas (date, name, value) da tabela indicators pivotadas (data x nome) e alinhadas a `index`.
+    Séries com buracos depois do primeiro valor são descartadas: para elas a
+    estratégia recalcula o indicador, em vez de operar com lacunas.
     """
+    if not rows:
+        return pd.DataFrame(index=index)
+
+    long = pd.DataFrame(rows, columns=["date", "name", "value"])
+    long["date"] = pd.to_datetime(long["date"])
+    wide = long.pivot(index="date", columns="name", values="value").reindex(index).astype(float)
+    keep = [c for c in wide.columns if c.isidentifier() and not wide[c].loc[wide[c].first_valid_index():].isna().any()]
+    return wide[sorted(keep)]
+
+
+def _indicator_filter(indicators) -> list:
+    """WHERE extra sobre indicators: só os nomes pedidos (None = todos os gravados)."""
+    return [] if indicators is None else [Indicator.name.in_(list(indicators))]
+
+
+def _stored_indicators(db, symbol_id: int, start: date, end: date, index: pd.DatetimeIndex,
+                       indicators=None) -> pd.DataFrame:
+    """Séries gravadas do símbolo no intervalo, só as de `indicators` (ver _indicator_frame)."""
+    if indicators is not None and not indicators:
+        return pd.DataFrame(index=index)
+    rows = db.execute(
+        select(Indicator.date, Indicator.name, Indicator.value)
+        .where(
+            and_(
+                Indicator.symbol_id == symbol_id,
+                Indicator.date >= start,
+                Indicator.date <= end,
+                *_indicator_filter(indicators),
+            )
+        )
+    ).all()
+    return _indicator_frame(rows, index)
+
+
+def _load_df(ticker: str, start: date, end: date, indicators=None) -> pd.DataFrame | None:
+    """
+    Lê OHLCV do Postgres e devolve DataFrame indexado por data com colunas lower-case,
+    mais uma coluna por indicador gravado de `indicators` (ex.: "sma_20"; ver
+    stored_indicator_names). None traz todos os gravados, para inspeção: os
+    backtests pedem só o que a estratégia lê, para não carregar o catálogo
+    inteiro nem mudar data_hash quando ele cresce.
+    Usa o price_cache (LRU em processo) quando o intervalo já foi carregado.
+
+    Com PRICE_MIRROR_DIR configurado, lê do espelho mmap (price_mirror): o
+    período é cortado por busca binária e o DataFrame é uma vista somente
+    leitura das páginas do arquivo, sem passar pelas linhas do banco. O
+    symbols.data_version lido junto com o símbolo confere se o espelho está em dia.
+    """
+    mirror = price_mirror_mod.price_mirror
+    if mirror is None:
+        cached = price_cache.get(ticker, start, end, indicators)
+        if cached is not None:
+            return cached
+
     SessionLocal = get_session_local()
     with SessionLocal() as db:
         sym = db.execute(select(Symbol).where(Symbol.ticker == ticker)).scalar_one_or_none()
         if not sym:
             return None
+        symbol_id, version = sym.id, sym.data_version
+    if mirror is not None:
+        # versão diferente da do banco = espelho atrasado (queda entre o commit e o merge)
+        df = mirror.read(symbol_id, start, end, indicators, version)
+        if df is None and rebuild_price_mirror(symbol_id):
+            df = mirror.read(symbol_id, start, end, indicators)
+        return df if df is not None else pd.DataFrame()
+
+    # upsert que invalidar o símbolo durante a leitura descarta o put abaixo
+    generation = price_cache.generation(symbol_id)
+    with SessionLocal() as db:
 
         rows = db.execute(
             select(Price.date, Price.open, Price.high, Price.low, Price.close, Price.volume)
             .where(
                 and_(
-                    Price.symbol_id == sym.id,
+                    Price.symbol_id == symbol_id,
                     Price.date >= start,
                     Price.date <= end,
                 )
@@ -49,47 +179,111 @@ def _load_df(ticker: str, start: date, end: date) -> pd.DataFrame | None:
             .order_by(Price.date.asc())
         ).all()
 
-    if not rows:
-        return pd.DataFrame()
+        if not rows:
+            return pd.DataFrame()
+
+        df = pd.DataFrame(rows, columns=["date", *OHLCV_COLS])
+        df["date"] = pd.to_datetime(df["date"])
+        df = df.set_index("date").sort_index()
 
-    df = pd.DataFrame(rows, columns=["date", "open", "high", "low", "close", "volume"])
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.set_index("date").sort_index()
+        for c in OHLCV_COLS:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
 
-    for c in ["open", "high", "low", "close", "volume"]:
-        df[c] = pd.to_numeric(df[c], errors="coerce")
+        df = df.join(_stored_indicators(db, symbol_id, start, end, df.index, indicators))
 
+    price_cache.put(ticker, symbol_id, start, end, df, indicators, generation)
+    return df.copy()
+
+
+def _load_intraday(ticker: str, start: date, end: date, interval: str, timeframe: Optional[str] = None) -> pd.DataFrame:
+    """
+    Barras `interval` do IntradayStore de start a end (dias inteiros), indexadas
+    pelo timestamp; com `timeframe` maior, reamostradas na carga (ex.: 1m -> 15m).
+    Não há indicadores gravados para intraday: as estratégias calculam os seus.
+    """
+    df = intraday_store.read(ticker, interval, start, pd.Timestamp(end) + pd.Timedelta(days=1))
+    if timeframe and timeframe != interval and not df.empty:
+        df = resample_ohlcv(df, timeframe)
     return df
 
 
-def run_backtest(
-    ticker: str,
-    start: date,
-    end: date,
-    initial_cash: float,
-    commission: float,
+MAX_PORTFOLIO_TICKERS = 100
+
+
+def _load_panel(tickers: list[str], start: date, end: date, indicators=None) -> Dict[str, Any]:
+    """
+    Carrega vários tickers com uma consulta por tabela (symbols, prices e
+    indicators com WHERE symbol_id IN (...)) e alinha todos num calendário comum:
+    a união dos pregões a partir do primeiro dia em que todos têm cotação.
+    Um pregão que falta para um ticker repete o fechamento anterior
+    (open/high/low = close, volume 0), e os indicadores gravados (só os de
+    `indicators`, como em _load_df) seguem o último valor.
+
+    Retorna {ticker: DataFrame} na ordem de `tickers`, ou {"error": ...}.
+    """
+    SessionLocal = get_session_local()
+    with SessionLocal() as db:
+        ids = dict(db.execute(select(Symbol.ticker, Symbol.id).where(Symbol.ticker.in_(tickers))).all())
+        missing = [t for t in tickers if t not in ids]
+        if missing:
+            return {"error": f"Ticker sem dados: {', '.join(missing)}. Rode /data/update antes."}
+
+        prices = db.execute(
+            select(Price.symbol_id, Price.date, Price.open, Price.high, Price.low, Price.close, Price.volume)
+            .where(and_(Price.symbol_id.in_(ids.values()), Price.date >= start, Price.date <= end))
+            .order_by(Price.symbol_id.asc(), Price.date.asc())
+        ).all()
+        inds = [] if indicators is not None and not indicators else db.execute(
+            select(Indicator.symbol_id, Indicator.date, Indicator.name, Indicator.value)
+            .where(and_(Indicator.symbol_id.in_(ids.values()), Indicator.date >= start, Indicator.date <= end,
+                        *_indicator_filter(indicators)))
+        ).all()
+
+    px = pd.DataFrame(prices, columns=["symbol_id", "date", *OHLCV_COLS])
+    px["date"] = pd.to_datetime(px["date"])
+    ind_by_sym: Dict[int, list] = {}
+    for sid, d, name, value in inds:
+        ind_by_sym.setdefault(sid, []).append((d, name, value))
+
+    frames = {}
+    for t in tickers:
+        df = px[px["symbol_id"] == ids[t]].drop(columns="symbol_id").set_index("date")
+        if df["close"].dropna().empty:
+            return {"error": f"Sem dados para {t} no período informado. Rode /data/update antes."}
+        frames[t] = df.astype(float).join(_indicator_frame(ind_by_sym.get(ids[t], []), df.index))
+
+    first = max(df.index[0] for df in frames.values())
+    calendar = pd.DatetimeIndex(sorted(set().union(*(df.index for df in frames.values()))))
+    calendar = calendar[calendar >= first].rename("date")
+
+    for t, df in frames.items():
+        df = df.reindex(calendar)
+        filled = df["close"].isna()
+        df["close"] = df["close"].ffill()
+        for c in ("open", "high", "low"):
+            df[c] = df[c].where(~filled, df["close"])
+        df["volume"] = df["volume"].fillna(0.0)
+        extra = [c for c in df.columns if c not in OHLCV_COLS]
+        df[extra] = df[extra].ffill()
+        frames[t] = df
+    return frames
+
+
+STRATEGY_TYPES = ("sma_cross", "donchian_breakout", "momentum")
+ENGINES = ("backtrader", "vectorized")
+
+
+def _add_strategy(
+    cerebro: bt.Cerebro,
+    strategy_type: str,
     sma_fast: int,
     sma_slow: int,
     atr_window: int,
     atr_k: float,
     risk_perc: float,
-    strategy_type: str = "sma_cross",
-    strategy_params: Optional[Dict[str, Any]] = None,
-) -> dict:
-    """
-    Executa o backtest, grava resultados no banco e retorna {backtest_id, metrics}.
-    """
-    df = _load_df(ticker, start, end)
-    if df is None or df.empty or df["close"].dropna().empty:
-        return {"error": "Sem dados para o período informado. Rode /data/update antes."}
-
-    cerebro = bt.Cerebro()
-    datafeed = PandasDataBT(dataname=df)
-    cerebro.adddata(datafeed)
-    cerebro.broker.setcash(initial_cash)
-    cerebro.broker.setcommission(commission=commission)
-
-    sp = strategy_params or {}
+    sp: Dict[str, Any],
+) -> bool:
+    """Registra a estratégia no Cerebro; False se strategy_type for inválido."""
     if strategy_type == "sma_cross":
         cerebro.addstrategy(
             SmaCrossRiskATR,
@@ -118,16 +312,77 @@ def run_backtest(
             risk_perc=risk_perc,
         )
     else:
+        return False
+    return True
+
+
+def _execute(
+    df: pd.DataFrame | Dict[str, pd.DataFrame],
+    initial_cash: float,
+    commission: float,
+    sma_fast: int,
+    sma_slow: int,
+    atr_window: int,
+    atr_k: float,
+    risk_perc: float,
+    strategy_type: str = "sma_cross",
+    strategy_params: Optional[Dict[str, Any]] = None,
+    engine: str = "backtrader",
+    interval: str = DAILY,
+    timer: Optional[PhaseTimer] = None,
+) -> dict:
+    """
+    Roda o backtest sobre um DataFrame já carregado (sem banco).
+    Retorna {metrics, trades, daily} ou {error}. Usado pelo run_backtest e pelas sweeps.
+
+    engine="vectorized" usa app.core.vectorized (NumPy) em vez do Backtrader.
+    Com um dict {ticker: DataFrame} (modo carteira), cada ticker vira um feed
+    nomeado no mesmo Cerebro/broker; só no Backtrader.
+    `interval` é o intervalo das barras de `df` (intraday: a série "daily"
+    sai com a última barra de cada dia).
+
+    Com `timer`, acumula as fases setup / engine / analyzers / collect (as três
+    primeiras somam o cerebro.run()) e o tempo de cada analyzer (analyzer_<nome>).
+    """
+    timer = timer or PhaseTimer()
+    frames = df if isinstance(df, dict) else {None: df}
+    if engine == "vectorized" and isinstance(df, dict):
+        return {"error": "engine vectorized não suporta carteira"}
+    if engine == "vectorized":
+        with timer.phase("engine"):
+            return run_vectorized(df, initial_cash, commission, sma_fast, sma_slow, atr_window, atr_k,
+                                  risk_perc, strategy_type, strategy_params)
+    if engine != "backtrader":
+        return {"error": "engine inválido"}
+
+    t_setup = time.perf_counter()
+    cerebro = bt.Cerebro()
+    for name, frame in frames.items():
+        cerebro.adddata(make_feed(frame, interval), name=name)
+    cerebro.broker.setcash(initial_cash)
+    cerebro.broker.setcommission(commission=commission)
+
+    sp = strategy_params or {}
+    if not _add_strategy(cerebro, strategy_type, sma_fast, sma_slow, atr_window, atr_k, risk_perc, sp):
         return {"error": "strategy_type inválido"}
 
-    # Analyzers
-    cerebro.addanalyzer(bt.analyzers.DrawDown, _name="dd")
-    cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name="ta")
-    cerebro.addanalyzer(bt.analyzers.SharpeRatio_A, _name="sharpe")
-    cerebro.addanalyzer(TradeCollector, _name="tc")
-    cerebro.addanalyzer(EquityDailyCollector, _name="ed")
+    # Analyzers (cada um cronometrado nos hooks chamados pelo Cerebro)
+    analyzer_s: Dict[str, float] = {}
+    for cls, name in ((bt.analyzers.DrawDown, "dd"), (bt.analyzers.TradeAnalyzer, "ta"),
+                      (bt.analyzers.SharpeRatio_A, "sharpe"), (TradeCollector, "tc"),
+                      (EquityDailyCollector, "ed")):
+        cerebro.addanalyzer(timed_analyzer(cls, analyzer_s, name), _name=name)
+    timer.add("setup", time.perf_counter() - t_setup)
 
+    t_run = time.perf_counter()
     strat = cerebro.run()[0]
+    run_s = time.perf_counter() - t_run
+    analyzers_total = sum(analyzer_s.values())
+    timer.add("engine", run_s - analyzers_total)
+    timer.add("analyzers", analyzers_total)
+    for name, sec in analyzer_s.items():
+        timer.add(f"analyzer_{name}", sec)
+    t_collect = time.perf_counter()
 
     # --- Métricas
     final_value = float(cerebro.broker.getvalue())
@@ -165,10 +420,52 @@ def run_backtest(
     # IMPORTANTE: agora usamos get_analysis() (o seu código anterior olhava .trades)
     trades = strat.analyzers.tc.get_analysis()         # lista de dicts
     daily = strat.analyzers.ed.get_analysis()          # lista de dicts
+    timer.add("collect", time.perf_counter() - t_collect)
 
-    # --- Persistência
-    SessionLocal = get_session_local()
-    with SessionLocal() as db:
+    return {"metrics": metrics, "trades": trades, "daily": daily}
+
+
+def _execute_timed(*args, **kwargs) -> dict:
+    """_execute no processo de cálculo, devolvendo também os tempos das fases."""
+    timer = PhaseTimer()
+    res = _execute(*args, timer=timer, **kwargs)
+    return res | {"timings": timer.timings}
+
+
+def _execute_offloaded(timer: PhaseTimer, *args, **kwargs) -> dict:
+    """_execute no pool de processos das rotas (offload.compute), somando as fases em `timer`."""
+    res = compute(_execute_timed, *args, **kwargs)
+    for name, sec in res.pop("timings").items():
+        timer.add(name.removesuffix("_s"), sec)
+    return res
+
+
+def _as_date(d) -> date:
+    # os collectors devolvem ISO "YYYY-MM-DD"; fromisoformat é bem mais barato que pd.to_datetime
+    return date.fromisoformat(d[:10]) if isinstance(d, str) else d
+
+
+def _persist(
+    db,
+    ticker: str,
+    start: date,
+    end: date,
+    strategy_type: str,
+    initial_cash: float,
+    commission: float,
+    params: Dict[str, Any],
+    metrics: Dict[str, Any],
+    trades: list,
+    daily: list,
+    backtest_id: Optional[int] = None,
+    fingerprint: Optional[str] = None,
+    timings: Optional[Dict[str, float]] = None,
+    profile: Optional[str] = None,
+) -> int:
+    """Grava Backtest + trades + série diária + métricas na sessão `db` (sem commit final).
+    Tudo na mesma transação de quem chama. Com backtest_id, conclui uma linha já
+    existente (job enfileirado) em vez de criar outra."""
+    if backtest_id is None:
         btrow = Backtest(
             ticker=ticker,
             start_date=start,
@@ -176,53 +473,272 @@ def run_backtest(
             strategy_type=strategy_type,
             initial_cash=initial_cash,
             commission=commission,
-            params={"sma_fast": sma_fast, "sma_slow": sma_slow, "atr_window": atr_window, "atr_k": atr_k, "risk_perc": risk_perc} | sp,
+            params=params,
             status="finished",
             metrics=metrics,
+            fingerprint=fingerprint,
+            timings=timings,
+            profile=profile,
         )
         db.add(btrow)
-        db.commit()
-        db.refresh(btrow)
+        db.flush()
         backtest_id = btrow.id
+    else:
+        db.execute(
+            update(Backtest)
+            .where(Backtest.id == backtest_id)
+            .values(params=params, status="finished", metrics=metrics, error=None, fingerprint=fingerprint,
+                    timings=timings, profile=profile)
+        )
 
-        # trades
-        for t in trades:
-            # normaliza tipos para o SQLAlchemy
-            tdate = pd.to_datetime(t["date"]).date() if isinstance(t["date"], str) else t["date"]
-            db.add(
-                Trade(
-                    backtest_id=backtest_id,
-                    date=tdate,
-                    side=t.get("side"),
-                    price=float(t["price"]) if t.get("price") is not None else None,
-                    size=int(t["size"]) if t.get("size") is not None else 0,
-                    pnl=float(t["pnl"]) if t.get("pnl") is not None else None,
-                )
-            )
+    # trades / série diária / métricas: INSERT core em lote (executemany),
+    # sem passar pelo unit-of-work do ORM objeto a objeto
+    if trades:
+        db.execute(insert(Trade), [
+            {
+                "backtest_id": backtest_id,
+                "ticker": t.get("ticker", ticker),
+                "date": _as_date(t["date"]),
+                "side": t.get("side"),
+                "price": float(t["price"]) if t.get("price") is not None else None,
+                "size": int(t["size"]) if t.get("size") is not None else 0,
+                "pnl": float(t["pnl"]) if t.get("pnl") is not None else None,
+            }
+            for t in trades
+        ])
 
-        # série diária
-        for d in daily:
-            ddate = pd.to_datetime(d["date"]).date() if isinstance(d["date"], str) else d["date"]
-            db.add(
-                DailyPosition(
-                    backtest_id=backtest_id,
-                    date=ddate,
-                    position=int(d["position"]),
-                    cash=float(d["cash"]),
-                    equity=float(d["equity"]),
-                )
-            )
+    if daily:
+        db.execute(insert(DailyPosition), [
+            {
+                "backtest_id": backtest_id,
+                "date": _as_date(d["date"]),
+                "position": int(d["position"]),
+                "cash": float(d["cash"]),
+                "equity": float(d["equity"]),
+            }
+            for d in daily
+        ])
 
-        # métricas
-        for k, v in metrics.items():
-            db.add(
-                Metric(
-                    backtest_id=backtest_id,
-                    name=k,
-                    value=float(v) if v is not None else None,
-                )
+    if metrics:
+        db.execute(insert(Metric), [
+            {"backtest_id": backtest_id, "name": k, "value": float(v) if v is not None else None}
+            for k, v in metrics.items()
+        ])
+
+    return backtest_id
+
+
+def find_finished(db, fingerprints) -> Dict[str, tuple[int, dict]]:
+    """Backtests finalizados com essas impressões digitais: {fingerprint: (id, metrics)} (o mais recente)."""
+    fps = list(set(fingerprints))
+    if not fps:
+        return {}
+    rows = db.execute(
+        select(Backtest.fingerprint, Backtest.id, Backtest.metrics)
+        .where(Backtest.fingerprint.in_(fps), Backtest.status == "finished")
+        .order_by(Backtest.id.asc())
+    ).all()
+    return {fp: (bt_id, metrics or {}) for fp, bt_id, metrics in rows}
+
+
+def run_backtest(
+    ticker: str,
+    start: date,
+    end: date,
+    initial_cash: float,
+    commission: float,
+    sma_fast: int,
+    sma_slow: int,
+    atr_window: int,
+    atr_k: float,
+    risk_perc: float,
+    strategy_type: str = "sma_cross",
+    strategy_params: Optional[Dict[str, Any]] = None,
+    engine: str = "backtrader",
+    force: bool = False,
+    profile: bool = False,
+    interval: Optional[str] = None,
+    timeframe: Optional[str] = None,
+    offload: bool = False,
+) -> dict:
+    """
+    Executa o backtest, grava resultados no banco e retorna {backtest_id, metrics, timings}.
+
+    Um pedido idêntico a um backtest já finalizado (mesma impressão digital:
+    pedido normalizado + dados do período + versão do código) devolve o id
+    existente com reused=True, sem rodar de novo; force=True sempre executa.
+
+    timings traz os segundos de cada fase (load, setup, engine, analyzers,
+    collect, persist e total) e fica gravado no backtest. profile=True roda a
+    execução sob cProfile (sem reaproveitar resultados) e grava o relatório.
+
+    Com `interval` intraday ("1m", "5m", ...) as barras vêm do IntradayStore e,
+    com `timeframe`, são reamostradas para um intervalo maior antes de rodar;
+    trades e série diária continuam por dia (última barra de cada dia).
+
+    offload=True (rotas da API) roda o cálculo no pool de processos de
+    offload.compute; scripts e chamadas diretas rodam na thread atual.
+    """
+    interval = None if interval == DAILY else interval
+    bar = timeframe or interval or DAILY
+    try:
+        for iv in (interval, timeframe):
+            if iv is not None:
+                check_interval(iv)
+    except ValueError as e:
+        return {"error": str(e)}
+    if not can_resample(interval or DAILY, bar):
+        return {"error": f"não é possível reamostrar {interval or DAILY} em {bar}"}
+
+    timer = PhaseTimer()
+    names = stored_indicator_names(strategy_type, sma_fast, sma_slow, atr_window)
+    with timer.phase("load"):
+        df = _load_intraday(ticker, start, end, interval, bar) if interval else _load_df(ticker, start, end, names)
+    if df is None or df.empty or df["close"].dropna().empty:
+        if interval:
+            return {"error": f"Sem barras {interval} para o período informado. Rode /data/intraday/update antes."}
+        return {"error": "Sem dados para o período informado. Rode /data/update antes."}
+
+    sp = strategy_params or {}
+    params = {"sma_fast": sma_fast, "sma_slow": sma_slow, "atr_window": atr_window, "atr_k": atr_k,
+              "risk_perc": risk_perc, "engine": engine} | sp
+    if interval:
+        params |= {"interval": interval, "timeframe": bar}
+    fp = run_fingerprint(ticker, start, end, strategy_type, initial_cash, commission, params, data_hash(df, names))
+    if not (force or profile):
+        SessionLocal = get_session_local()
+        with SessionLocal() as db:
+            found = find_finished(db, [fp]).get(fp)
+        if found:
+            return {"backtest_id": found[0], "metrics": found[1], "reused": True}
+
+    prof: Dict[str, str] = {}
+    args = (df, initial_cash, commission, sma_fast, sma_slow, atr_window, atr_k, risk_perc, strategy_type, sp, engine)
+    if profile:  # o cProfile só enxerga o processo atual
+        with profiled(prof):
+            res = _execute(*args, interval=bar, timer=timer)
+    elif offload:
+        res = _execute_offloaded(timer, *args, interval=bar)
+    else:
+        res = _execute(*args, interval=bar, timer=timer)
+    if "error" in res:
+        return res
+    metrics = res["metrics"]
+
+    # --- Persistência: os tempos entram na mesma transação, depois das linhas
+    SessionLocal = get_session_local()
+    with SessionLocal() as db:
+        with timer.phase("persist"):
+            backtest_id = _persist(
+                db, ticker, start, end, strategy_type, initial_cash, commission, params,
+                metrics, res["trades"], res["daily"], fingerprint=fp, profile=prof.get("profile"),
             )
+        timings = timer.finish()
+        db.execute(update(Backtest).where(Backtest.id == backtest_id).values(timings=timings))
+        db.commit()
+    observe_backtest("run", strategy_type, engine, timings)
+
+    out = {"backtest_id": backtest_id, "metrics": metrics, "timings": timings}
+    if profile:
+        out["profile"] = prof.get("profile")
+    return out
+
+
+PORTFOLIO_TICKER = "PORTFOLIO"
+
+
+def _per_symbol(trades) -> Dict[str, dict]:
+    """Resumo por ticker a partir dos trades fechados (ticker, pnl)."""
+    out: Dict[str, dict] = {}
+    for tk, pnl in trades:
+        s = out.setdefault(tk, {"trades": 0, "won": 0, "lost": 0, "pnl": 0.0})
+        s["trades"] += 1
+        s["pnl"] += pnl or 0.0
+        s["won" if (pnl or 0.0) >= 0 else "lost"] += 1
+    return out
+
+
+def run_portfolio_backtest(
+    tickers: list[str],
+    start: date,
+    end: date,
+    initial_cash: float,
+    commission: float,
+    sma_fast: int,
+    sma_slow: int,
+    atr_window: int,
+    atr_k: float,
+    risk_perc: float,
+    strategy_type: str = "sma_cross",
+    strategy_params: Optional[Dict[str, Any]] = None,
+    force: bool = False,
+    offload: bool = False,
+) -> dict:
+    """
+    Uma estratégia sobre vários tickers com caixa compartilhado (um Cerebro,
+    um feed por ticker). Grava um Backtest com ticker "PORTFOLIO" (os tickers
+    ficam em params), trades com o ticker de cada um e o equity agregado.
+    Retorna {backtest_id, metrics, per_symbol, ...}; dedupe e offload como em run_backtest.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return {"error": "informe ao menos um ticker"}
+    if len(tickers) > MAX_PORTFOLIO_TICKERS:
+        return {"error": f"máximo de {MAX_PORTFOLIO_TICKERS} tickers por carteira"}
+
+    timer = PhaseTimer()
+    with timer.phase("load"):
+        frames = _load_panel(tickers, start, end, stored_indicator_names(strategy_type, sma_fast, sma_slow, atr_window))
+    if "error" in frames:
+        return frames
 
+    sp = strategy_params or {}
+    params = {"sma_fast": sma_fast, "sma_slow": sma_slow, "atr_window": atr_window, "atr_k": atr_k,
+              "risk_perc": risk_perc, "engine": "backtrader", "tickers": tickers} | sp
+    dh = hashlib.sha256("".join(data_hash(df) for df in frames.values()).encode()).hexdigest()
+    fp = run_fingerprint(PORTFOLIO_TICKER, start, end, strategy_type, initial_cash, commission, params, dh)
+    SessionLocal = get_session_local()
+    if not force:
+        with SessionLocal() as db:
+            found = find_finished(db, [fp]).get(fp)
+            if found:
+                rows = db.execute(select(Trade.ticker, Trade.pnl).where(Trade.backtest_id == found[0])).all()
+                return {"backtest_id": found[0], "metrics": found[1], "per_symbol": _per_symbol(rows),
+                        "reused": True}
+
+    args = (frames, initial_cash, commission, sma_fast, sma_slow, atr_window, atr_k, risk_perc, strategy_type, sp)
+    res = _execute_offloaded(timer, *args) if offload else _execute(*args, timer=timer)
+    if "error" in res:
+        return res
+
+    with SessionLocal() as db:
+        with timer.phase("persist"):
+            backtest_id = _persist(
+                db, PORTFOLIO_TICKER, start, end, strategy_type, initial_cash, commission, params,
+                res["metrics"], res["trades"], res["daily"], fingerprint=fp,
+            )
+        timings = timer.finish()
+        db.execute(update(Backtest).where(Backtest.id == backtest_id).values(timings=timings))
         db.commit()
+    observe_backtest("portfolio", strategy_type, "backtrader", timings)
 
-    return {"backtest_id": backtest_id, "metrics": metrics}
+    return {
+        "backtest_id": backtest_id,
+        "metrics": res["metrics"],
+        "per_symbol": _per_symbol((t["ticker"], t["pnl"]) for t in res["trades"]),
+        "timings": timings,
+    }
+
+
+def delete_backtest(bt_id: int) -> bool:
+    """Apaga o backtest e tudo que foi gravado para ele. False se não existe."""
+    SessionLocal = get_session_local()
+    with SessionLocal() as db:
+        if db.get(Backtest, bt_id) is None:
+            return False
+        for model in (Trade, DailyPosition, Metric, WalkForwardWindow):
+            db.execute(delete(model).where(model.backtest_id == bt_id))
+        db.execute(delete(Backtest).where(Backtest.id == bt_id))
+        db.commit()
+    results_cache.invalidate(bt_id)
+    return True
@@ -1,88 +1,180 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import date
 from typing import Tuple
+import numpy as np
 import pandas as pd
-from sqlalchemy import select
-from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import select, update, and_, or_, func
+from sqlalchemy.dialects import postgresql, sqlite
 from app.db.session import get_session_local
 from app.db.models import Symbol, Price, Indicator
-from app.adapters.market_data import fetch_ohlcv_yf
-from app.core.indicators import sma, atr
+from app.adapters.market_data import fetch_ohlcv, fetch_intraday
+from app.core.indicators import compute as compute_indicators, parse_name, warmup as indicator_warmup
+from app.services.price_cache import price_cache
+from app.services.intraday_store import intraday_store
+from app.services import price_mirror as price_mirror_mod
+from app.services.indicator_catalog import indicator_catalog
+from app.core.timeframes import check_interval, DAILY
+from app.core.metrics import observe_ingest
+
+# linhas por INSERT multi-valores (7 colunas -> 7000 parâmetros, dentro dos
+# limites do Postgres (65535) e do SQLite (32766))
+PRICES_BATCH_SIZE = 1000
+INDICATORS_BATCH_SIZE = 2000
+
+# paralelismo padrão do update em lote (fica abaixo do pool padrão do engine: 5 + 10 overflow)
+BATCH_MAX_WORKERS = 8
+
+OHLCV_COLS = ["open", "high", "low", "close", "volume"]
 
 def _f(x):
     return float(x) if pd.notna(x) else None
 
-def upsert_prices(symbol_id: int, df: pd.DataFrame) -> int:
+def _dialect_insert(db, model):
+    """INSERT com suporte a ON CONFLICT no dialeto da sessão (Postgres em produção, SQLite nos testes)."""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
+
+def _price_records(symbol_id: int, df: pd.DataFrame) -> list[dict]:
+    """Converte o DataFrame OHLCV em dicts prontos para o INSERT, sem iterrows."""
+    out = pd.DataFrame({"date": pd.to_datetime(df["date"]).dt.date})
+    for c in OHLCV_COLS:
+        out[c] = pd.to_numeric(df[c], errors="coerce").astype(float)
+    # ON CONFLICT não aceita a mesma chave duas vezes no mesmo statement
+    out = out.drop_duplicates(subset="date", keep="last")
+    out = out.astype(object).where(out.notna(), None)
+    out.insert(0, "symbol_id", symbol_id)
+    return out.to_dict("records")
+
+def _bulk_upsert(db, model, records: list[dict], index_elements: list[str], update_cols: list[str],
+                 batch_size: int, only_changed: bool = False) -> None:
+    """
+    Executa um INSERT ... ON CONFLICT DO UPDATE multi-valores a cada `batch_size` registros.
+    Com only_changed=True o UPDATE só atinge linhas cujo valor mudou (IS DISTINCT FROM).
+    """
+    batch_size = max(1, int(batch_size))
+    table = model.__table__
+    for i in range(0, len(records), batch_size):
+        stmt = _dialect_insert(db, model).values(records[i:i + batch_size])
+        where = None
+        if only_changed:
+            where = or_(*[table.c[c].is_distinct_from(stmt.excluded[c]) for c in update_cols])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={c: stmt.excluded[c] for c in update_cols},
+            where=where,
+        )
+        db.execute(stmt)
+
+def upsert_prices(symbol_id: int, df: pd.DataFrame, batch_size: int = PRICES_BATCH_SIZE) -> int:
+    """
+    Upsert em lote: um INSERT ... ON CONFLICT (symbol_id, date) DO UPDATE
+    multi-valores a cada `batch_size` barras. Retorna o número de barras gravadas.
+    """
+    if df is None or df.empty:
+        return 0
+    t0 = time.perf_counter()
+    records = _price_records(symbol_id, df)
+
+    mirror = price_mirror_mod.price_mirror
     SessionLocal = get_session_local()
     with SessionLocal() as db:
-        total = 0
-        for _, row in df.iterrows():
-            d = row["date"]
-            try:
-                d = pd.to_datetime(d).date()
-            except Exception:
-                pass
-
-            stmt = insert(Price).values(
-                symbol_id=symbol_id,
-                date=d,
-                open=_f(row["open"]),
-                high=_f(row["high"]),
-                low=_f(row["low"]),
-                close=_f(row["close"]),
-                volume=_f(row["volume"]),
-            ).on_conflict_do_update(
-                index_elements=["symbol_id","date"],
-                set_={
-                    "open":  _f(row["open"]),
-                    "high":  _f(row["high"]),
-                    "low":   _f(row["low"]),
-                    "close": _f(row["close"]),
-                    "volume":_f(row["volume"]),
-                },
-            )
-            db.execute(stmt)
-            total += 1
+        _bulk_upsert(db, Price, records, ["symbol_id", "date"], OHLCV_COLS, batch_size)
+        version = _bump_data_version(db, symbol_id)
         db.commit()
-        return total
-    
-from sqlalchemy import and_, delete  
-from sqlalchemy.dialects.postgresql import insert
-import pandas as pd
+    price_cache.invalidate_symbol(symbol_id)
+    if mirror is not None and not mirror.merge_prices(symbol_id, records, version):
+        rebuild_price_mirror(symbol_id)
+    observe_ingest("prices", len(records), time.perf_counter() - t0)
+    return len(records)
 
-def upsert_indicators(symbol_id: int, idx: pd.Index, name: str, values: pd.Series, params: str | None = None) -> int:
+def _indicator_records(symbol_id: int, ind: pd.DataFrame) -> list[dict]:
+    """Wide (data x nome) -> registros long, descartando NaN."""
+    long = ind.copy()
+    long.index = pd.to_datetime(long.index).date
+    long.index.name = "date"
+    long = long.stack(future_stack=True).dropna().rename("value").reset_index()
+    long.columns = ["date", "name", "value"]
+    long["value"] = long["value"].astype(float)
+    long.insert(0, "symbol_id", symbol_id)
+    return long.to_dict("records")
+
+def upsert_indicator_frame(symbol_id: int, ind: pd.DataFrame, batch_size: int = INDICATORS_BATCH_SIZE) -> int:
     """
-    Insere/atualiza indicadores SEM usar a coluna 'params' (que não existe na sua tabela).
-    Estratégia simples: delete+insert para a (symbol_id, date, name).
+    Grava várias séries de indicadores de uma vez. `ind` é indexado por data e
+    tem uma coluna por indicador (ex.: "sma_20", "atr_14").
+
+    Usa a uq_indicator_symbol_date_name num upsert em lote; linhas já gravadas
+    com o mesmo valor não são reescritas. Retorna o número de valores não-NaN.
     """
+    if ind is None or ind.empty:
+        return 0
+    t0 = time.perf_counter()
+    records = _indicator_records(symbol_id, ind)
+    if not records:
+        return 0
+
+    mirror = price_mirror_mod.price_mirror
     SessionLocal = get_session_local()
     with SessionLocal() as db:
-        total = 0
-        for d, v in values.dropna().items():
-
-            try:
-                d = pd.to_datetime(d).date()
-            except Exception:
-                pass
-
-            db.execute(
-                delete(Indicator).where(
-                    and_(
-                        Indicator.symbol_id == symbol_id,
-                        Indicator.date == d,
-                        Indicator.name == name,
-                    )
-                )
-            )
-            db.execute(
-                insert(Indicator).values(
-                    symbol_id=symbol_id,
-                    date=d,
-                    name=name,
-                    value=float(v),
-                )
-            )
-            total += 1
+        _bulk_upsert(db, Indicator, records, ["symbol_id", "date", "name"], ["value"],
+                     batch_size, only_changed=True)
+        version = _bump_data_version(db, symbol_id)
         db.commit()
-        return total
+    # os frames em cache carregam os indicadores gravados como colunas
+    price_cache.invalidate_symbol(symbol_id)
+    if mirror is not None and not mirror.merge_indicators(symbol_id, records, version):
+        rebuild_price_mirror(symbol_id)
+    observe_ingest("indicators", len(records), time.perf_counter() - t0)
+    return len(records)
+
+def _bump_data_version(db, symbol_id: int) -> int:
+    """
+    Incrementa symbols.data_version na transação do upsert e devolve o novo
+    valor. O espelho mmap grava a versão que refletiu; _load_df compara com a
+    do banco, então uma queda entre o commit e o merge (mesmo só revisando
+    valores de datas já gravadas) leva a uma reconstrução.
+    """
+    db.execute(update(Symbol).where(Symbol.id == symbol_id).values(data_version=Symbol.data_version + 1))
+    return db.execute(select(Symbol.data_version).where(Symbol.id == symbol_id)).scalar_one()
+
+def rebuild_price_mirror(symbol_id: int) -> bool:
+    """
+    Regrava o espelho mmap do símbolo (preços + indicadores) a partir do banco.
+    Usado na primeira carga do símbolo; depois os upserts mesclam incrementalmente.
+    """
+    mirror = price_mirror_mod.price_mirror
+    if mirror is None:
+        return False
+    SessionLocal = get_session_local()
+    with SessionLocal() as db:
+        version = db.execute(select(Symbol.data_version).where(Symbol.id == symbol_id)).scalar_one_or_none()
+        prices = db.execute(
+            select(Price.date, Price.open, Price.high, Price.low, Price.close, Price.volume)
+            .where(Price.symbol_id == symbol_id)
+        ).all()
+        rows = db.execute(
+            select(Indicator.date, Indicator.name, Indicator.value).where(Indicator.symbol_id == symbol_id)
+        ).all()
+    if not prices:
+        return False
+    ind = None
+    if rows:
+        long = pd.DataFrame(rows, columns=["date", "name", "value"])
+        long["date"] = pd.to_datetime(long["date"])
+        ind = long.pivot(index="date", columns="name", values="value").astype(float)
+    mirror.replace(symbol_id, pd.DataFrame(prices, columns=["date", *OHLCV_COLS]), ind, version)
+    return True
+
+def upsert_indicators(symbol_id: int, idx: pd.Index, name: str, values: pd.Series, params: str | None = None) -> int:
+    """
+    Insere/atualiza uma série de indicador (a tabela não tem coluna 'params').
+    Mantido por compatibilidade; delega para upsert_indicator_frame.
+    """
+    return upsert_indicator_frame(symbol_id, values.to_frame(name))
 
 
 def ensure_symbol(ticker: str) -> int:
@@ -95,22 +187,224 @@ def ensure_symbol(ticker: str) -> int:
         db.add(sym); db.commit(); db.refresh(sym)
         return sym.id
 
-def update_prices_and_indicators(ticker: str, start: str, end: str, sma_windows=(20,50), atr_window=14) -> dict:
-    symbol_id = ensure_symbol(ticker)
-    prices = fetch_ohlcv_yf(ticker, start, end)
+def _symbol_id(ticker: str) -> int | None:
+    SessionLocal = get_session_local()
+    with SessionLocal() as db:
+        return db.execute(select(Symbol.id).where(Symbol.ticker == ticker)).scalar_one_or_none()
+
+def _latest_price_date(symbol_id: int) -> date | None:
+    SessionLocal = get_session_local()
+    with SessionLocal() as db:
+        return db.execute(select(func.max(Price.date)).where(Price.symbol_id == symbol_id)).scalar_one_or_none()
+
+def _load_price_tail(symbol_id: int, before: date, n: int | None) -> pd.DataFrame:
+    """Últimas `n` barras gravadas com data < `before` (aquecimento dos indicadores; None = todas)."""
+    SessionLocal = get_session_local()
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(Price.date, Price.open, Price.high, Price.low, Price.close, Price.volume)
+            .where(and_(Price.symbol_id == symbol_id, Price.date < before))
+            .order_by(Price.date.desc())
+            .limit(n)
+        ).all()
+    return pd.DataFrame(rows[::-1], columns=["date"] + OHLCV_COLS)
+
+def _incremental_fetch_start(symbol_id: int, start: str, end: str) -> str | None:
+    """Início do download no modo incremental; None se não há nada a buscar."""
+    latest = _latest_price_date(symbol_id)
+    if latest is None:
+        return start
+    fetch_start = max(pd.Timestamp(start), pd.Timestamp(latest) + pd.Timedelta(days=1))
+    if fetch_start >= pd.Timestamp(end):
+        return None
+    return fetch_start.date().isoformat()
+
+def _indicator_names(sma_windows, atr_window, indicators=()) -> list[str]:
+    """Nomes a calcular: sma_N/atr_N dos parâmetros + os pedidos por nome (ValueError se inválido)."""
+    names = [f"sma_{w}" for w in sma_windows] + [f"atr_{atr_window}"] + list(indicators)
+    for name in names:
+        parse_name(name)
+    return list(dict.fromkeys(names))
+
+def _store_prices_and_indicators(symbol_id: int, prices: pd.DataFrame, names: list[str],
+                                 incremental: bool) -> dict:
     inserted_prices = upsert_prices(symbol_id, prices)
 
     if prices.empty:
         return { "symbol_id": symbol_id, "inserted_prices": 0, "inserted_indicators": 0 }
 
-    df = prices.set_index('date').sort_index()
-    inserted_ind = 0
+    df = prices.assign(date=pd.to_datetime(prices["date"])).set_index('date').sort_index()
+    first_new = df.index[0]
 
-    for w in sma_windows:
-        values = sma(df['close'], w)
-        inserted_ind += upsert_indicators(symbol_id, df.index, f"sma_{w}", values, f"window={w}")
+    if incremental:
+        # janela de aquecimento do indicador mais exigente; os recursivos (EMA,
+        # ATR de Wilder, RSI) só reproduzem o histórico completo com todas as barras
+        need = [indicator_warmup(n) for n in names]
+        warmup = None if None in need else max(need)
+        tail = _load_price_tail(symbol_id, first_new.date(), warmup)
+        if not tail.empty:
+            tail = tail.assign(date=pd.to_datetime(tail["date"])).set_index("date")
+            df = pd.concat([tail, df[OHLCV_COLS]])
 
-    values_atr = atr(df[['high','low','close']], atr_window)
-    inserted_ind += upsert_indicators(symbol_id, df.index, f"atr_{atr_window}", values_atr, f"window={atr_window}")
+    ind = compute_indicators(df, names)
+    inserted_ind = upsert_indicator_frame(symbol_id, ind[ind.index >= first_new])
 
     return {"symbol_id": symbol_id, "inserted_prices": inserted_prices, "inserted_indicators": inserted_ind}
+
+def update_prices_and_indicators(ticker: str, start: str, end: str, sma_windows=(20,50), atr_window=14,
+                                 incremental: bool = False, indicators=()) -> dict:
+    """
+    Baixa OHLCV, grava em `prices` e recalcula SMA/ATR em `indicators`, mais os
+    indicadores pedidos por nome em `indicators` (ex.: "ema_20", "rsi_14",
+    "bb_upper_20"; ver app.core.indicators.KINDS) e os do catálogo do ticker
+    (INDICATOR_CATALOG), todos numa passada. Nome inválido: ValueError.
+
+    incremental=True: busca só o intervalo após a última data gravada do símbolo
+    e recalcula os indicadores apenas com a janela de aquecimento (maior janela)
+    do histórico gravado + as barras novas.
+    """
+    names = _indicator_names(sma_windows, atr_window, [*indicators, *indicator_catalog.names_for(ticker)])
+    symbol_id = ensure_symbol(ticker)
+
+    fetch_start = _incremental_fetch_start(symbol_id, start, end) if incremental else start
+    if fetch_start is None:
+        return {"symbol_id": symbol_id, "inserted_prices": 0, "inserted_indicators": 0}
+
+    prices = fetch_ohlcv(ticker, fetch_start, end)
+    return _store_prices_and_indicators(symbol_id, prices, names, incremental)
+
+
+def materialize_indicators(ticker: str, names=None) -> dict:
+    """
+    Calcula sobre todo o histórico gravado do ticker os indicadores pedidos (ou,
+    sem `names`, os do catálogo) e grava em lote. Serve para preencher símbolos
+    já ingeridos quando o catálogo ganha indicadores novos. ValueError para
+    ticker sem cotações ou nome inválido.
+    """
+    names = list(dict.fromkeys(names if names is not None else indicator_catalog.names_for(ticker)))
+    for name in names:
+        parse_name(name)
+    symbol_id = _symbol_id(ticker)
+    prices = _load_price_tail(symbol_id, date.max, None) if symbol_id else pd.DataFrame()
+    if prices.empty:
+        raise ValueError(f"sem cotações gravadas para {ticker}")
+    t0 = time.perf_counter()
+    inserted = 0
+    if names:
+        df = prices.assign(date=pd.to_datetime(prices["date"])).set_index("date")
+        inserted = upsert_indicator_frame(symbol_id, compute_indicators(df, names))
+    return {"symbol_id": symbol_id, "names": names, "bars": len(prices), "inserted_indicators": inserted,
+            "elapsed_s": time.perf_counter() - t0}
+
+
+def get_indicator_matrix(ticker: str, start: date | None = None, end: date | None = None,
+                         names=None) -> dict | None:
+    """
+    Indicadores gravados do ticker como matriz larga data x nome, numa única
+    consulta (indicators JOIN symbols). Colunas em ordem alfabética (ou na
+    ordem de `names`); valores ausentes = None. None se o ticker não existe.
+    """
+    stmt = (
+        select(Indicator.date, Indicator.name, Indicator.value)
+        .join(Symbol, Symbol.id == Indicator.symbol_id)
+        .where(Symbol.ticker == ticker)
+    )
+    if start is not None:
+        stmt = stmt.where(Indicator.date >= start)
+    if end is not None:
+        stmt = stmt.where(Indicator.date <= end)
+    if names:
+        stmt = stmt.where(Indicator.name.in_(list(names)))
+
+    SessionLocal = get_session_local()
+    with SessionLocal() as db:
+        rows = db.execute(stmt).all()
+        if not rows and db.execute(select(Symbol.id).where(Symbol.ticker == ticker)).first() is None:
+            return None
+
+    dates, names_col, values = zip(*rows) if rows else ((), (), ())
+    udates, di = np.unique(np.array(dates, dtype="datetime64[D]"), return_inverse=True)
+    columns = list(dict.fromkeys(names)) if names else sorted(set(names_col))
+    pos = {n: i for i, n in enumerate(columns)}
+    matrix = np.full((len(columns), len(udates)), np.nan)
+    matrix[[pos[n] for n in names_col], di] = np.array(values, dtype=float)
+    return {
+        "ticker": ticker,
+        "dates": [str(d) for d in udates],
+        "columns": columns,
+        "values": {n: [None if np.isnan(v) else float(v) for v in matrix[i]] for i, n in enumerate(columns)},
+    }
+
+
+def update_intraday(ticker: str, start: str, end: str, interval: str = "1m") -> dict:
+    """
+    Baixa barras intraday pelo adapter e grava no IntradayStore (arquivos
+    colunares por símbolo/mês, fora da tabela prices). Regravar um período
+    substitui as barras de mesmo timestamp.
+    """
+    if check_interval(interval) == DAILY:
+        raise ValueError("barras diárias vão para /data/update")
+    t0 = time.perf_counter()
+    bars = fetch_intraday(ticker, start, end, interval)
+    written = intraday_store.write(ticker, interval, bars)
+    elapsed = time.perf_counter() - t0
+    observe_ingest("intraday", written, elapsed)
+    return {
+        "ticker": ticker,
+        "interval": interval,
+        "bars": written,
+        "first": bars["ts"].iloc[0] if written else None,
+        "last": bars["ts"].iloc[-1] if written else None,
+        "elapsed_s": elapsed,
+    }
+
+
+def _db_lock():
+    """SQLite aceita um único escritor (e os testes usam uma só conexão): serializa o acesso ao banco."""
+    SessionLocal = get_session_local()
+    with SessionLocal() as db:
+        is_sqlite = db.get_bind().dialect.name == "sqlite"
+    return threading.Lock() if is_sqlite else nullcontext()
+
+def update_many(tickers: list[str], start: str, end: str, sma_windows=(20,50), atr_window=14,
+                incremental: bool = False, max_workers: int = BATCH_MAX_WORKERS, indicators=()) -> dict:
+    """
+    Atualiza vários tickers em paralelo: o download (rede) roda em até
+    `max_workers` threads e as gravações usam o pool do engine compartilhado.
+    Falhas ficam no resultado do ticker e não derrubam o lote.
+    """
+    _indicator_names(sma_windows, atr_window, indicators)  # nome inválido derruba o lote antes de começar
+    tickers = list(dict.fromkeys(t.strip() for t in tickers if t and t.strip()))
+    db_lock = _db_lock()
+
+    def _one(ticker: str) -> dict:
+        t0 = time.perf_counter()
+        symbol_id = None
+        try:
+            names = _indicator_names(sma_windows, atr_window, [*indicators, *indicator_catalog.names_for(ticker)])
+            with db_lock:
+                symbol_id = ensure_symbol(ticker)
+                fetch_start = _incremental_fetch_start(symbol_id, start, end) if incremental else start
+            if fetch_start is None:
+                res = {"symbol_id": symbol_id, "inserted_prices": 0, "inserted_indicators": 0}
+            else:
+                prices = fetch_ohlcv(ticker, fetch_start, end)
+                with db_lock:
+                    res = _store_prices_and_indicators(symbol_id, prices, names, incremental)
+            res["error"] = None
+        except Exception as e:
+            # falha depois do ensure_symbol: o símbolo já existe, devolve o id
+            res = {"symbol_id": symbol_id, "inserted_prices": 0, "inserted_indicators": 0, "error": str(e)}
+        return {"ticker": ticker, **res, "elapsed_s": time.perf_counter() - t0}
+
+    t0 = time.perf_counter()
+    workers = max(1, min(int(max_workers), len(tickers) or 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="data-update") as pool:
+        results = list(pool.map(_one, tickers))
+
+    return {
+        "results": results,
+        "ok": sum(1 for r in results if r["error"] is None),
+        "failed": sum(1 for r in results if r["error"] is not None),
+        "elapsed_s": time.perf_counter() - t0,
+    }
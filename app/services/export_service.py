@@ -0,0 +1,166 @@
+# app/services/export_service.py
+from __future__ import annotations
+
+import csv
+import io
+import json
+from datetime import date
+
+from sqlalchemy import select
+
+from app.db.session import get_session_local
+from app.db.models import Backtest, Trade, DailyPosition
+
+try:  # pyarrow é opcional (extra "columnar"); sem ele só há CSV
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+    HAS_ARROW = True
+except ImportError:
+    HAS_ARROW = False
+
+EXPORT_FORMATS = {
+    "arrow": ("application/vnd.apache.arrow.stream", ".arrow"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+    "csv": ("text/csv", ".csv"),
+}
+EXPORT_CHUNK_SIZE = 50_000
+MAX_EXPORT_IDS = 5000
+
+# (coluna, tipo arrow) por tabela; backtest_id sempre primeiro para exportar vários ids juntos
+_TABLES = {
+    "daily": (DailyPosition, [("backtest_id", "int64"), ("date", "date32"), ("position", "int64"),
+                              ("cash", "float64"), ("equity", "float64")]),
+    "trades": (Trade, [("backtest_id", "int64"), ("date", "date32"), ("ticker", "string"), ("side", "string"),
+                       ("price", "float64"), ("size", "int64"), ("pnl", "float64")]),
+}
+
+
+def _schema(cols):
+    return pa.schema([(name, getattr(pa, typ)()) for name, typ in cols])
+
+
+def _batches(db, model, cols, bt_ids, start, end, chunk_size):
+    """Blocos de colunas (listas) direto das tuplas do resultado, sem dict por linha."""
+    stmt = select(*[getattr(model, c) for c, _ in cols]).where(model.backtest_id.in_(bt_ids))
+    if start is not None:
+        stmt = stmt.where(model.date >= start)
+    if end is not None:
+        stmt = stmt.where(model.date <= end)
+    stmt = stmt.order_by(model.backtest_id.asc(), model.date.asc(), model.id.asc())
+    result = db.execute(stmt.execution_options(yield_per=chunk_size))
+    for part in result.partitions():
+        yield [list(c) for c in zip(*part)]
+
+
+def _backtests_table(db, bt_ids):
+    """Uma linha por backtest: metadados, params (JSON) e uma coluna por métrica."""
+    rows = db.execute(select(Backtest).where(Backtest.id.in_(bt_ids)).order_by(Backtest.id)).scalars().all()
+    metric_names = sorted({k for r in rows for k in (r.metrics or {})})
+    names = ["backtest_id", "ticker", "strategy_type", "start_date", "end_date", "status", "params", *metric_names]
+    cols = [
+        [r.id for r in rows],
+        [r.ticker for r in rows],
+        [r.strategy_type for r in rows],
+        [r.start_date for r in rows],
+        [r.end_date for r in rows],
+        [r.status for r in rows],
+        [json.dumps(r.params or {}, sort_keys=True) for r in rows],
+        *[[(r.metrics or {}).get(m) for r in rows] for m in metric_names],
+    ]
+    return names, cols
+
+
+def export_results(
+    bt_ids: list[int],
+    table: str = "daily",
+    fmt: str = "parquet",
+    start: date | None = None,
+    end: date | None = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> dict:
+    """
+    Exporta resultados de um ou mais backtests num único arquivo colunar.
+
+    table: "daily" (série diária), "trades" ou "backtests" (uma linha por id,
+    com params e métricas). fmt: "arrow" (IPC stream), "parquet" ou "csv".
+    As linhas saem ordenadas por (backtest_id, date) e cada bloco de
+    `chunk_size` linhas vira um RecordBatch / row group.
+
+    Retorna {"content": bytes, "media_type", "filename", "rows"}, ou {"error"}
+    (ids inexistentes são listados no erro).
+    """
+    if fmt not in EXPORT_FORMATS:
+        return {"error": f"formato inválido (use {', '.join(EXPORT_FORMATS)})"}
+    if table not in (*_TABLES, "backtests"):
+        return {"error": "table inválida (use daily, trades ou backtests)"}
+    if fmt != "csv" and not HAS_ARROW:
+        return {"error": "pyarrow não instalado: só há exportação em csv"}
+    bt_ids = sorted(set(bt_ids))
+    if not bt_ids:
+        return {"error": "informe ao menos um backtest id"}
+    if len(bt_ids) > MAX_EXPORT_IDS:
+        return {"error": f"máximo de {MAX_EXPORT_IDS} backtests por exportação"}
+
+    media_type, ext = EXPORT_FORMATS[fmt]
+    filename = f"backtests_{table}_{bt_ids[0]}" + (f"-{bt_ids[-1]}" if len(bt_ids) > 1 else "") + ext
+
+    SessionLocal = get_session_local()
+    with SessionLocal() as db:
+        found = set(db.execute(select(Backtest.id).where(Backtest.id.in_(bt_ids))).scalars())
+        missing = [i for i in bt_ids if i not in found]
+        if missing:
+            return {"error": f"backtest não encontrado: {', '.join(map(str, missing))}"}
+
+        if table == "backtests":
+            names, cols = _backtests_table(db, bt_ids)
+            chunks = [cols]
+            schema = None
+        else:
+            model, spec = _TABLES[table]
+            names = [c for c, _ in spec]
+            chunks = _batches(db, model, spec, bt_ids, start, end, chunk_size)
+            schema = _schema(spec) if HAS_ARROW else None
+
+        if fmt == "csv":
+            content, rows = _write_csv(names, chunks)
+        else:
+            content, rows = _write_arrow(fmt, names, chunks, schema)
+
+    return {"content": content, "media_type": media_type, "filename": filename, "rows": rows}
+
+
+def _write_csv(names, chunks) -> tuple[bytes, int]:
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    w.writerow(names)
+    rows = 0
+    for cols in chunks:
+        for row in zip(*cols):
+            w.writerow(["" if v is None else v.isoformat() if isinstance(v, date) else v for v in row])
+            rows += 1
+    return buf.getvalue().encode(), rows
+
+
+def _write_arrow(fmt, names, chunks, schema) -> tuple[bytes, int]:
+    sink = pa.BufferOutputStream()
+    writer = None
+    rows = 0
+    for cols in chunks:
+        if schema is not None:
+            batch = pa.record_batch([pa.array(c, type=f.type) for c, f in zip(cols, schema)], schema=schema)
+        else:
+            batch = pa.record_batch([pa.array(c) for c in cols], names=names)
+        if writer is None:
+            writer = (pa_ipc.new_stream(sink, batch.schema) if fmt == "arrow"
+                      else pq.ParquetWriter(sink, batch.schema))
+        if fmt == "arrow":
+            writer.write_batch(batch)
+        else:
+            writer.write_table(pa.Table.from_batches([batch]))
+        rows += batch.num_rows
+    if writer is None:  # nenhuma linha: arquivo só com o schema
+        schema = schema or pa.schema([(n, pa.null()) for n in names])
+        writer = pa_ipc.new_stream(sink, schema) if fmt == "arrow" else pq.ParquetWriter(sink, schema)
+    writer.close()
+    return sink.getvalue().to_pybytes(), rows
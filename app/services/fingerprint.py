@@ -0,0 +1,128 @@
+# app/services/fingerprint.py
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict
+
+import backtrader as bt
+import pandas as pd
+
+# código cujo comportamento define o resultado de um backtest; mudou, muda a versão
+_ENGINE_SOURCES = ("core/strategies.py", "core/collectors.py", "core/vectorized.py", "services/backtest_service.py",
+                   "services/walkforward_service.py")
+
+
+@lru_cache(maxsize=1)
+def code_version() -> str:
+    """Hash do código das estratégias/motores + versão do Backtrader."""
+    root = Path(__file__).resolve().parent.parent
+    h = hashlib.sha256(bt.__version__.encode())
+    for rel in _ENGINE_SOURCES:
+        h.update(rel.encode())
+        h.update((root / rel).read_bytes())
+    return h.hexdigest()[:16]
+
+
+OHLCV_COLS = ("open", "high", "low", "close", "volume")
+
+
+class DataHasher:
+    """
+    data_hash de subconjuntos de colunas do mesmo DataFrame; cada coluna é
+    hasheada uma vez. Uma sweep carrega a união dos indicadores da grade e
+    calcula o hash de cada combinação só sobre as colunas que ela lê.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._index: bytes | None = None
+        self._cols: Dict[str, bytes] = {}
+
+    def columns(self, indicators=None) -> list[str]:
+        """OHLCV na ordem fixa + indicadores presentes (todos com None, ou só os de `indicators`) ordenados."""
+        wanted = None if indicators is None else set(indicators)
+        extra = sorted(str(c) for c in self.df.columns
+                       if c not in OHLCV_COLS and (wanted is None or c in wanted))
+        return [c for c in OHLCV_COLS if c in self.df.columns] + extra
+
+    def _digest(self, col: str) -> bytes:
+        d = self._cols.get(col)
+        if d is None:
+            d = self._cols[col] = hashlib.sha256(
+                pd.util.hash_pandas_object(self.df[col], index=False).to_numpy().tobytes()).digest()
+        return d
+
+    def __call__(self, indicators=None) -> str:
+        cols = self.columns(indicators)
+        if self._index is None:
+            self._index = hashlib.sha256(pd.util.hash_pandas_object(self.df.index).to_numpy().tobytes()).digest()
+        h = hashlib.sha256(",".join(cols).encode())
+        h.update(self._index)
+        for c in cols:
+            h.update(self._digest(c))
+        return h.hexdigest()
+
+
+def data_hash(df: pd.DataFrame, indicators=None) -> str:
+    """
+    Hash dos dados que alimentam o backtest: datas, OHLCV e os indicadores
+    gravados presentes no frame (só os de `indicators`, se informado). Com os
+    stored_indicator_names da execução, /run, jobs, sweeps e walk-forward
+    chegam ao mesmo hash para o mesmo período e parâmetros.
+    """
+    return DataHasher(df)(indicators)
+
+
+def _norm(v: Any) -> Any:
+    """20 e 20.0 viram o mesmo valor; dicts com chaves ordenadas."""
+    if isinstance(v, bool) or v is None or isinstance(v, str):
+        return v
+    if isinstance(v, (int, float)):
+        f = float(v)
+        if math.isfinite(f) and f.is_integer():
+            return int(f)
+        return f
+    if isinstance(v, (date, pd.Timestamp)):
+        return v.isoformat()
+    if isinstance(v, dict):
+        return {str(k): _norm(x) for k, x in sorted(v.items())}
+    if isinstance(v, (list, tuple)):
+        return [_norm(x) for x in v]
+    return str(v)
+
+
+def run_fingerprint(
+    ticker: str,
+    start: date,
+    end: date,
+    strategy_type: str,
+    initial_cash: float,
+    commission: float,
+    params: Dict[str, Any],
+    data: str,
+    details: bool = True,
+) -> str:
+    """
+    Impressão digital determinística de uma execução: pedido normalizado (params
+    já inclui engine) + hash dos dados (`data`, ver data_hash) + versão do código.
+    `details` distingue execuções gravadas sem trades/série diária (sweeps).
+    """
+    payload = _norm({
+        "ticker": ticker,
+        "start": start,
+        "end": end,
+        "strategy_type": strategy_type,
+        "initial_cash": initial_cash,
+        "commission": commission,
+        "params": params,
+        "details": details,
+    })
+    h = hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode())
+    h.update(data.encode())
+    h.update(code_version().encode())
+    return h.hexdigest()
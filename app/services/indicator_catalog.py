@@ -0,0 +1,95 @@
+# app/services/indicator_catalog.py
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+
+from app.core.indicators import parse_name
+
+# arquivo JSON com os indicadores a materializar na ingestão; vazio = catálogo vazio
+INDICATOR_CATALOG = os.getenv("INDICATOR_CATALOG") or None
+
+
+def expand(spec: str) -> list[str]:
+    """
+    Uma entrada do catálogo em nomes de indicador:
+        "rsi_14"          -> ["rsi_14"]
+        "sma_10:50:10"    -> ["sma_10", "sma_20", "sma_30", "sma_40", "sma_50"]   (início:fim:passo, fim incluso)
+        "ema_5:8"         -> ["ema_5", "ema_6", "ema_7", "ema_8"]
+    ValueError para tipo, janela ou faixa inválidos.
+    """
+    base, _, rng = spec.strip().partition(":")
+    kind, first = parse_name(base)
+    if not rng:
+        return [base]
+    parts = rng.split(":")
+    if len(parts) > 2 or not all(p.isdigit() for p in parts):
+        raise ValueError(f"faixa inválida: {spec} (use <tipo>_<início>:<fim>[:<passo>])")
+    last, step = int(parts[0]), int(parts[1]) if len(parts) == 2 else 1
+    if last < first or step < 1:
+        raise ValueError(f"faixa inválida: {spec}")
+    return [f"{kind}_{w}" for w in range(first, last + 1, step)]
+
+
+def _expand_all(specs) -> list[str]:
+    if not isinstance(specs, list):
+        raise ValueError("o catálogo espera listas de indicadores")
+    return list(dict.fromkeys(n for s in specs for n in expand(str(s))))
+
+
+class IndicatorCatalog:
+    """
+    Catálogo declarativo dos indicadores materializados na tabela indicators:
+
+        {
+          "global": ["sma_10:300:10", "atr_14", "rsi_14"],
+          "symbols": {"PETR4.SA": ["ema_9:21:3", "donchian_high_20:60:20"]}
+        }
+
+    Cada ticker recebe os globais mais os seus. O arquivo é relido quando muda
+    (mtime), sem reiniciar a API; um arquivo inválido levanta ValueError na
+    leitura, em vez de cair silenciosamente para um catálogo vazio.
+    """
+
+    def __init__(self, path: str | Path | None):
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._mtime: float | None = None
+        self._global: list[str] = []
+        self._symbols: dict[str, list[str]] = {}
+
+    def _refresh(self) -> None:
+        if self.path is None:
+            return
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            mtime = None
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            if mtime is None:
+                self._global, self._symbols = [], {}
+            else:
+                raw = json.loads(self.path.read_text())
+                self._global = _expand_all(raw.get("global", []))
+                self._symbols = {t.strip(): _expand_all(v) for t, v in (raw.get("symbols") or {}).items()}
+            self._mtime = mtime
+
+    def names_for(self, ticker: str) -> list[str]:
+        """Indicadores do catálogo para o ticker (globais + do símbolo), sem repetição."""
+        self._refresh()
+        return list(dict.fromkeys(self._global + self._symbols.get(ticker, [])))
+
+    def describe(self) -> dict:
+        self._refresh()
+        return {
+            "path": str(self.path) if self.path else None,
+            "global": list(self._global),
+            "symbols": {t: list(v) for t, v in self._symbols.items()},
+        }
+
+
+indicator_catalog = IndicatorCatalog(INDICATOR_CATALOG)
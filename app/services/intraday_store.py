@@ -0,0 +1,116 @@
+# app/services/intraday_store.py
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.adapters.market_data import INTRADAY_COLUMNS, HAS_PARQUET, _file_stem, _empty_intraday
+from app.core.timeframes import check_interval
+
+# raiz dos arquivos de barras intraday (um diretório por intervalo e ticker)
+INTRADAY_DIR = os.getenv("INTRADAY_DIR", "data/intraday")
+
+
+class IntradayStore:
+    """
+    Barras intraday em arquivos colunares por símbolo, particionados por mês:
+
+        <root>/<interval>/<TICKER>/<YYYY-MM>.parquet   (ou .csv sem pyarrow)
+
+    Colunas ts (início da barra, UTC sem fuso), open, high, low, close, volume,
+    ordenadas por ts. Centenas de milhares de barras por símbolo ficam fora da
+    tabela `prices` (uma linha + índices por barra): cada partição é comprimida
+    (zstd) e a leitura de um período só abre os meses que o cobrem.
+
+    write() mescla com a partição existente (a barra nova vence) e troca o
+    arquivo de forma atômica; escritas no mesmo (ticker, intervalo) são
+    serializadas dentro do processo.
+    """
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self.ext = ".parquet" if HAS_PARQUET else ".csv"
+        self._locks: dict[tuple[str, str], threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _dir(self, ticker: str, interval: str) -> Path:
+        return self.root / check_interval(interval) / _file_stem(ticker)
+
+    def _lock(self, ticker: str, interval: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault((ticker, interval), threading.Lock())
+
+    def _read_part(self, path: Path) -> pd.DataFrame:
+        if path.suffix == ".parquet":
+            df = pd.read_parquet(path)
+        else:
+            df = pd.read_csv(path, float_precision="round_trip", parse_dates=["ts"])
+        return df.astype({"ts": "datetime64[ns]"})
+
+    def _write_part(self, df: pd.DataFrame, path: Path) -> None:
+        tmp = path.with_name(path.name + ".tmp")
+        if path.suffix == ".parquet":
+            df.to_parquet(tmp, index=False, compression="zstd")
+        else:
+            df.to_csv(tmp, index=False)
+        os.replace(tmp, path)  # leitores nunca veem a partição pela metade
+
+    def write(self, ticker: str, interval: str, bars: pd.DataFrame) -> int:
+        """Grava barras no formato INTRADAY_COLUMNS. Retorna quantas barras vieram."""
+        if bars is None or bars.empty:
+            return 0
+        bars = bars[INTRADAY_COLUMNS].astype({"ts": "datetime64[ns]"})
+        d = self._dir(ticker, interval)
+        d.mkdir(parents=True, exist_ok=True)
+        months = bars["ts"].dt.strftime("%Y-%m")
+        with self._lock(ticker, interval):
+            for month, part in bars.groupby(months, sort=True):
+                path = d / f"{month}{self.ext}"
+                if path.exists():
+                    part = pd.concat([self._read_part(path), part], ignore_index=True)
+                part = part.drop_duplicates(subset="ts", keep="last").sort_values("ts").reset_index(drop=True)
+                self._write_part(part, path)
+        return len(bars)
+
+    def read(self, ticker: str, interval: str, start, end) -> pd.DataFrame:
+        """Barras com ts em [start, end), indexadas por ts (DataFrame vazio se não houver)."""
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        d = self._dir(ticker, interval)
+        parts = []
+        for month in pd.period_range(start, end, freq="M"):
+            path = d / f"{month.strftime('%Y-%m')}{self.ext}"
+            if path.exists():
+                parts.append(self._read_part(path))
+        df = pd.concat(parts, ignore_index=True) if parts else _empty_intraday()
+        ts = df["ts"].to_numpy()
+        a, b = np.searchsorted(ts, start.to_datetime64()), np.searchsorted(ts, end.to_datetime64())
+        return df.iloc[a:b].set_index("ts")
+
+    def stats(self) -> dict:
+        """Barras e bytes por intervalo/ticker (lê só os metadados no parquet)."""
+        out = {}
+        if not self.root.exists():
+            return out
+        for interval_dir in sorted(p for p in self.root.iterdir() if p.is_dir()):
+            for tdir in sorted(p for p in interval_dir.iterdir() if p.is_dir()):
+                files = sorted(tdir.glob(f"*{self.ext}"))
+                if not files:
+                    continue
+                if self.ext == ".parquet":
+                    import pyarrow.parquet as pq
+                    bars = sum(pq.ParquetFile(f).metadata.num_rows for f in files)
+                else:
+                    bars = sum(len(self._read_part(f)) for f in files)
+                out.setdefault(interval_dir.name, {})[tdir.name] = {
+                    "bars": bars,
+                    "bytes": sum(f.stat().st_size for f in files),
+                    "months": [f.stem for f in files],
+                }
+        return out
+
+
+intraday_store = IntradayStore(INTRADAY_DIR)
@@ -0,0 +1,245 @@
+# app/services/job_service.py
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from typing import Any, Dict, Optional
+
+from sqlalchemy import update
+
+from app.db.session import get_session_local
+from app.db.models import Backtest
+from app.core.profiling import PhaseTimer
+from app.core.strategies import stored_indicator_names
+from app.core.metrics import observe_backtest
+from app.services.backtest_service import _load_df, _execute_timed, _persist
+from app.services.fingerprint import run_fingerprint, data_hash
+from app.services.results_cache import results_cache
+
+logger = logging.getLogger(__name__)
+
+# backtests simultâneos (threads de orquestração + processos de cálculo)
+BACKTEST_WORKERS = int(os.getenv("BACKTEST_WORKERS", "2"))
+# jobs aceitos e ainda não concluídos; acima disso o submit é recusado
+BACKTEST_QUEUE_MAX = int(os.getenv("BACKTEST_QUEUE_MAX", "100"))
+# 0 = roda o Backtrader na própria thread (útil para depurar)
+BACKTEST_USE_PROCESSES = os.getenv("BACKTEST_USE_PROCESSES", "1") != "0"
+
+
+class QueueFull(Exception):
+    pass
+
+
+class BacktestJobQueue:
+    """
+    Fila local de backtests, sem broker externo.
+
+    submit() grava a linha Backtest com status "queued" e devolve o id na hora.
+    Uma thread por job (no máximo `workers` ao mesmo tempo) marca "running",
+    carrega os preços, manda o cálculo para um pool de processos (o Backtrader
+    é CPU-bound e preso ao GIL) e grava o resultado como "finished" ou "failed".
+    A fila vive no processo da API: jobs pendentes se perdem num restart.
+    """
+
+    def __init__(self, workers: int = BACKTEST_WORKERS, max_queue: int = BACKTEST_QUEUE_MAX,
+                 use_processes: bool = BACKTEST_USE_PROCESSES):
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.use_processes = use_processes
+        self._lock = threading.Lock()
+        self._threads: ThreadPoolExecutor | None = None
+        self._procs: ProcessPoolExecutor | None = None
+        self._futures: dict[int, Future] = {}
+        self._queued = 0
+        self._running = 0
+        self.submitted = 0
+        self.finished = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _pools(self) -> tuple[ThreadPoolExecutor, ProcessPoolExecutor | None]:
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bt-job")
+            if self.use_processes and self._procs is None:
+                self._procs = ProcessPoolExecutor(max_workers=self.workers)
+            return self._threads, self._procs
+
+    def _compute(self, *args) -> dict:
+        """
+        _execute_timed no pool de processos. Um worker morto (OOM, segfault no
+        Backtrader) quebra o pool inteiro: o job atual falha e o pool é
+        descartado, para o próximo job subir um novo.
+        """
+        _, procs = self._pools()
+        if procs is None:
+            return _execute_timed(*args)
+        try:
+            return procs.submit(_execute_timed, *args).result()
+        except BrokenProcessPool:
+            with self._lock:
+                if self._procs is procs:
+                    self._procs = None
+            procs.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def shutdown(self) -> None:
+        """
+        Encerra os pools (lifespan da app), como offload.shutdown: sem isso os
+        processos de cálculo ficam órfãos quando o uvicorn sai. Jobs submetidos
+        depois sobem pools novos.
+        """
+        with self._lock:
+            threads, procs, self._threads, self._procs = self._threads, self._procs, None, None
+        if procs is not None:
+            procs.shutdown(wait=True, cancel_futures=True)
+        if threads is not None:
+            threads.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, ticker: str, start: date, end: date, initial_cash: float, commission: float,
+               params: Dict[str, Any], strategy_type: str = "sma_cross", engine: str = "backtrader") -> int:
+        with self._lock:
+            if self._queued + self._running >= self.max_queue:
+                self.rejected += 1
+                raise QueueFull(f"fila cheia ({self.max_queue} jobs)")
+            self._queued += 1
+            self.submitted += 1
+
+        try:
+            SessionLocal = get_session_local()
+            with SessionLocal() as db:
+                row = Backtest(
+                    ticker=ticker,
+                    start_date=start,
+                    end_date=end,
+                    strategy_type=strategy_type,
+                    initial_cash=initial_cash,
+                    commission=commission,
+                    params=params | {"engine": engine},
+                    status="queued",
+                )
+                db.add(row)
+                db.commit()
+                bt_id = row.id
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+            raise
+
+        threads, _ = self._pools()
+        job = dict(ticker=ticker, start=start, end=end, initial_cash=initial_cash, commission=commission,
+                   params=params, strategy_type=strategy_type, engine=engine)
+        fut = threads.submit(self._run, bt_id, job)
+        with self._lock:
+            self._futures[bt_id] = fut
+        fut.add_done_callback(lambda _f, i=bt_id: self._forget(i))
+        return bt_id
+
+    def _forget(self, bt_id: int) -> None:
+        with self._lock:
+            self._futures.pop(bt_id, None)
+
+    def _set_status(self, bt_id: int, status: str, error: Optional[str] = None) -> None:
+        SessionLocal = get_session_local()
+        with SessionLocal() as db:
+            db.execute(update(Backtest).where(Backtest.id == bt_id).values(status=status, error=error))
+            db.commit()
+        results_cache.invalidate(bt_id)
+
+    def _run(self, bt_id: int, job: dict) -> None:
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        try:
+            self._set_status(bt_id, "running")
+            timer = PhaseTimer()
+            p = job["params"]
+            with timer.phase("load"):
+                names = stored_indicator_names(job["strategy_type"], p["sma_fast"], p["sma_slow"], p["atr_window"])
+                df = _load_df(job["ticker"], job["start"], job["end"], names)
+            if df is None or df.empty or df["close"].dropna().empty:
+                raise ValueError("Sem dados para o período informado. Rode /data/update antes.")
+
+            base = {k: p[k] for k in ("sma_fast", "sma_slow", "atr_window", "atr_k", "risk_perc")}
+            sp = {k: v for k, v in p.items() if k not in base}
+            args = (df, job["initial_cash"], job["commission"], *base.values(), job["strategy_type"], sp, job["engine"])
+            res = self._compute(*args)
+            if "error" in res:
+                raise ValueError(res["error"])
+            for name, sec in res["timings"].items():
+                timer.add(name.removesuffix("_s"), sec)
+
+            params = p | {"engine": job["engine"]}
+            fp = run_fingerprint(job["ticker"], job["start"], job["end"], job["strategy_type"],
+                                 job["initial_cash"], job["commission"], params, data_hash(df, names))
+            SessionLocal = get_session_local()
+            with SessionLocal() as db:
+                with timer.phase("persist"):
+                    _persist(
+                        db, job["ticker"], job["start"], job["end"], job["strategy_type"],
+                        job["initial_cash"], job["commission"], params,
+                        res["metrics"], res["trades"], res["daily"], backtest_id=bt_id, fingerprint=fp,
+                    )
+                timings = timer.finish()
+                db.execute(update(Backtest).where(Backtest.id == bt_id).values(timings=timings))
+                db.commit()
+            observe_backtest("job", job["strategy_type"], job["engine"], timings)
+            results_cache.invalidate(bt_id)
+            with self._lock:
+                self.finished += 1
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            try:
+                self._set_status(bt_id, "failed", str(e)[:500])
+            except Exception:
+                logger.exception("Falha ao gravar o status do job %s", bt_id)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def wait(self, bt_id: int, timeout: Optional[float] = None) -> bool:
+        """Bloqueia até o job terminar (True) ou estourar o timeout (False). Para scripts/testes."""
+        with self._lock:
+            fut = self._futures.get(bt_id)
+        if fut is None:
+            return True
+        try:
+            fut.result(timeout=timeout)
+        except FutureTimeout:  # no 3.10 não é o TimeoutError embutido
+            return False
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queued": self._queued,
+                "running": self._running,
+                "submitted": self.submitted,
+                "finished": self.finished,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }
+
+
+job_queue = BacktestJobQueue()
+
+
+def get_job_status(bt_id: int) -> dict | None:
+    SessionLocal = get_session_local()
+    with SessionLocal() as db:
+        row = db.get(Backtest, bt_id)
+        if row is None:
+            return None
+        return {
+            "backtest_id": row.id,
+            "status": row.status,
+            "error": row.error,
+            "metrics": row.metrics if row.status == "finished" else None,
+        }
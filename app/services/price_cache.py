@@ -0,0 +1,127 @@
+# app/services/price_cache.py
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import pandas as pd
+
+# orçamento de memória do cache (colunas + índice dos DataFrames em cache)
+PRICE_CACHE_MAX_MB = float(os.getenv("PRICE_CACHE_MAX_MB", "256"))
+
+OHLCV_COLS = ("open", "high", "low", "close", "volume")
+
+
+def _names_key(indicators) -> frozenset | None:
+    return None if indicators is None else frozenset(indicators)
+
+
+def _covers(have: frozenset | None, want: frozenset | None) -> bool:
+    """Entrada com `have` indicadores serve um pedido de `want` (None = todos os gravados)."""
+    return have is None or (want is not None and want <= have)
+
+
+class PriceFrameCache:
+    """
+    LRU em processo dos DataFrames OHLCV carregados por _load_df.
+
+    Chave (ticker, start, end, indicadores); uma consulta contida num intervalo
+    já em cache, pedindo indicadores que a entrada tem, é servida por fatia do
+    superconjunto (indicadores None = todos os gravados). Limitado por bytes,
+    não por entradas.
+    upsert_prices e upsert_indicator_frame chamam invalidate_symbol() ao gravar
+    barras ou indicadores do símbolo. Quem carrega do banco pega generation()
+    antes de ler e a passa ao put(): um frame lido antes de uma invalidação
+    (sem os indicadores recém-gravados, por exemplo) não volta ao cache, onde
+    serviria fatias de superconjunto desatualizadas.
+    O cache é por processo: com vários workers cada um tem o seu.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, tuple[int, pd.DataFrame, int]] = OrderedDict()
+        self._bytes = 0
+        self._generations: dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, ticker: str, start: date, end: date, indicators=None) -> pd.DataFrame | None:
+        want = _names_key(indicators)
+        with self._lock:
+            for key in reversed(self._entries):
+                t, s, e, have = key
+                if t == ticker and s <= start and end <= e and _covers(have, want):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    df = self._entries[key][1].loc[pd.Timestamp(start):pd.Timestamp(end)]
+                    if want is not None and have != want:
+                        df = df[[c for c in df.columns if c in OHLCV_COLS or c in want]]
+                    return df.copy()
+            self.misses += 1
+            return None
+
+    def put(self, ticker: str, symbol_id: int, start: date, end: date, df: pd.DataFrame,
+            indicators=None, generation: int | None = None) -> None:
+        # index.nbytes em vez de memory_usage(index=True): esse inclui a hashtable
+        # do índice, que cresce depois do primeiro .loc e distorce a contagem
+        size = int(df.memory_usage(index=False, deep=True).sum()) + int(df.index.nbytes)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generations.get(symbol_id, 0):
+                return
+            # entradas do mesmo ticker contidas no novo intervalo ficam redundantes
+            names = _names_key(indicators)
+            for key in [k for k in self._entries
+                        if k[0] == ticker and start <= k[1] and k[2] <= end and _covers(names, k[3])]:
+                self._drop(key)
+            key = (ticker, start, end, names)
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (symbol_id, df, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def generation(self, symbol_id: int) -> int:
+        with self._lock:
+            return self._generations.get(symbol_id, 0)
+
+    def invalidate_symbol(self, symbol_id: int) -> None:
+        with self._lock:
+            self._generations[symbol_id] = self._generations.get(symbol_id, 0) + 1
+            for key in [k for k, v in self._entries.items() if v[0] == symbol_id]:
+                self._drop(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, key: tuple) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / total) if total else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+price_cache = PriceFrameCache(int(PRICE_CACHE_MAX_MB * 1024 * 1024))
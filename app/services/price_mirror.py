@@ -0,0 +1,258 @@
+# app/services/price_mirror.py
+from __future__ import annotations
+
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:  # trava entre processos nas escritas; sem fcntl (Windows) só entre threads
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# diretório do espelho de leitura de prices/indicators; vazio = desligado
+PRICE_MIRROR_DIR = os.getenv("PRICE_MIRROR_DIR") or None
+
+OHLCV_COLS = ["open", "high", "low", "close", "volume"]
+
+
+class PriceMirror:
+    """
+    Espelho de leitura da tabela prices (e dos indicadores gravados) em arquivos
+    NumPy mapeados em memória, um por símbolo:
+
+        <root>/<symbol_id>.json              {"file": ..., "indicators": [...], "version": n}
+        <root>/<symbol_id>-<versão>.npy      float64 (6 + k, n)
+
+    Linha 0: datas (int64 em ns, guardadas bit a bit na matriz float64); linhas
+    1-5: OHLCV; demais: um indicador por linha (NaN onde não há valor), todos
+    alinhados às datas, que ficam ordenadas e sem repetição.
+
+    read() abre o .npy com mmap (páginas do cache do SO compartilhadas entre
+    processos) e corta o período por busca binária nas datas: o DataFrame
+    devolvido é uma vista somente leitura, sem cópia. Cada escrita gera uma
+    versão nova do .npy e troca o .json de forma atômica; leitores que já
+    mapearam a versão anterior seguem com ela até a próxima leitura. A versão
+    anterior é apagada logo que possível: no Windows um arquivo mapeado não pode
+    ser removido, e as sobras saem nas escritas seguintes do símbolo.
+
+    `version` é o symbols.data_version que o espelho reflete: upsert_prices e
+    upsert_indicator_frame o incrementam na mesma transação das barras e o
+    gravam aqui depois do commit. read(version=...) trata uma versão diferente
+    como miss, e quem chama reconstrói do banco (ex.: o processo caiu entre o
+    commit e o merge, mesmo que só valores tenham mudado).
+    """
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # symbol_id -> (arquivo, mmap, nomes, versão)
+        self._open: dict[int, tuple[str, np.ndarray, list[str], int | None]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def _meta_path(self, symbol_id: int) -> Path:
+        return self.root / f"{int(symbol_id)}.json"
+
+    # --- leitura
+
+    def _mapped(self, symbol_id: int) -> tuple[np.ndarray, list[str], int | None] | None:
+        for _ in range(3):  # a versão pode ser trocada entre ler o .json e abrir o .npy
+            try:
+                meta = json.loads(self._meta_path(symbol_id).read_text())
+            except FileNotFoundError:
+                return None
+            with self._lock:
+                cur = self._open.get(symbol_id)
+            if cur and cur[0] == meta["file"]:
+                return cur[1], cur[2], cur[3]
+            try:
+                arr = np.load(self.root / meta["file"], mmap_mode="r")
+            except FileNotFoundError:
+                continue
+            version = meta.get("version")
+            with self._lock:
+                self._open[symbol_id] = (meta["file"], arr, meta["indicators"], version)
+            return arr, meta["indicators"], version
+        return None
+
+    def read(self, symbol_id: int, start, end, indicators=None, version=None) -> pd.DataFrame | None:
+        """
+        Barras com data em [start, end] indexadas por "date", OHLCV + indicadores
+        (só os de `indicators`, ou todos com None; descartando séries com buracos
+        depois do primeiro valor, como _indicator_frame). None se o símbolo não
+        está no espelho ou se `version` (data_version atual no banco) difere da gravada.
+        """
+        mapped = self._mapped(symbol_id)
+        if mapped is not None and version is not None and mapped[2] != version:
+            with self._lock:
+                self.stale += 1
+            return None
+        if mapped is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        arr, names, _ = mapped
+        dates = arr[0].view(np.int64)
+        a = int(np.searchsorted(dates, pd.Timestamp(start).value, side="left"))
+        b = int(np.searchsorted(dates, pd.Timestamp(end).value, side="right"))
+        if a >= b:
+            return pd.DataFrame()
+        index = pd.DatetimeIndex(dates[a:b].view("M8[ns]"), name="date")
+        df = pd.DataFrame(arr[1:, a:b].T, index=index, columns=OHLCV_COLS + names, copy=False)
+        keep = []
+        wanted = None if indicators is None else set(indicators)
+        for i, name in enumerate(names):
+            if wanted is not None and name not in wanted:
+                continue
+            col = arr[6 + i, a:b]
+            valid = np.flatnonzero(~np.isnan(col))
+            if len(valid) and not np.isnan(col[valid[0]:]).any() and name.isidentifier():
+                keep.append(name)
+        with self._lock:
+            self.hits += 1
+        # colunas descartadas obrigam a uma cópia; no caso comum a vista é devolvida inteira
+        return df if len(keep) == len(names) else df[OHLCV_COLS + keep]
+
+    def has(self, symbol_id: int) -> bool:
+        return self._meta_path(symbol_id).exists()
+
+    # --- escrita
+
+    @contextmanager
+    def _write_lock(self, symbol_id: int):
+        path = self.root / f"{int(symbol_id)}.lock"
+        with open(path, "a") as fh:
+            if fcntl:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _current(self, symbol_id: int) -> tuple[dict | None, np.ndarray | None, list[str]]:
+        try:
+            meta = json.loads(self._meta_path(symbol_id).read_text())
+        except FileNotFoundError:
+            return None, None, []
+        return meta, np.load(self.root / meta["file"]), meta["indicators"]
+
+    def _publish(self, symbol_id: int, arr: np.ndarray, names: list[str], version: int | None) -> None:
+        name = f"{int(symbol_id)}-{uuid.uuid4().hex[:12]}.npy"
+        tmp = self.root / (name + ".tmp")
+        with open(tmp, "wb") as fh:
+            np.save(fh, np.ascontiguousarray(arr))
+        os.replace(tmp, self.root / name)
+        meta_tmp = self._meta_path(symbol_id).with_suffix(f".{uuid.uuid4().hex[:8]}.tmp")
+        meta_tmp.write_text(json.dumps({"file": name, "indicators": names, "version": version}))
+        os.replace(meta_tmp, self._meta_path(symbol_id))
+        with self._lock:
+            # solta o mmap deste processo antes de apagar a versão antiga
+            cur = self._open.get(symbol_id)
+            if cur and cur[0] != name:
+                del self._open[symbol_id]
+        self._remove_stale(symbol_id, name)
+
+    def _remove_stale(self, symbol_id: int, keep: str) -> None:
+        """
+        Apaga as versões antigas do símbolo. No POSIX quem já mapeou continua
+        lendo (o unlink só tira o nome); no Windows um arquivo ainda mapeado
+        (DataFrames vivos, outros processos) dá PermissionError e fica para a
+        próxima escrita.
+        """
+        for path in self.root.glob(f"{int(symbol_id)}-*.npy"):
+            if path.name == keep:
+                continue
+            try:
+                path.unlink(missing_ok=True)
+            except PermissionError:
+                pass
+
+    def replace(self, symbol_id: int, prices: pd.DataFrame, indicators: pd.DataFrame | None = None,
+                version: int | None = None) -> None:
+        """Reconstrói o símbolo inteiro: prices com coluna date + OHLCV; indicators largo (data x nome)."""
+        dates = pd.to_datetime(prices["date"]).to_numpy("M8[ns]").view(np.int64)
+        order = np.argsort(dates, kind="stable")
+        ind = indicators if indicators is not None else pd.DataFrame()
+        names = sorted(ind.columns)
+        arr = np.full((6 + len(names), len(dates)), np.nan)
+        arr[0] = dates[order].view(np.float64)
+        for i, c in enumerate(OHLCV_COLS):
+            arr[1 + i] = pd.to_numeric(prices[c], errors="coerce").to_numpy(float)[order]
+        if names:
+            aligned = ind.reindex(pd.DatetimeIndex(dates[order].view("M8[ns]")))
+            for i, n in enumerate(names):
+                arr[6 + i] = aligned[n].to_numpy(float)
+        with self._write_lock(symbol_id):
+            self._publish(symbol_id, arr, names, version)
+
+    def merge_prices(self, symbol_id: int, records: list[dict], version: int | None = None) -> bool:
+        """
+        Aplica um upsert de barras (registros de _price_records) sobre o espelho.
+        False se o símbolo ainda não tem espelho (quem chama reconstrói do banco).
+        """
+        new = pd.DataFrame(records)
+        new_dates = pd.to_datetime(new["date"]).to_numpy("M8[ns]").view(np.int64)
+        with self._write_lock(symbol_id):
+            meta, cur, names = self._current(symbol_id)
+            if meta is None:
+                return False
+            old_dates = cur[0].view(np.int64)
+            dates = np.union1d(old_dates, new_dates)
+            arr = np.full((cur.shape[0], len(dates)), np.nan)
+            arr[:, np.searchsorted(dates, old_dates)] = cur
+            pos = np.searchsorted(dates, new_dates)
+            for i, c in enumerate(OHLCV_COLS):
+                arr[1 + i, pos] = pd.to_numeric(new[c], errors="coerce").to_numpy(float)
+            arr[0] = dates.view(np.float64)
+            self._publish(symbol_id, arr, names, version)
+        return True
+
+    def merge_indicators(self, symbol_id: int, records: list[dict], version: int | None = None) -> bool:
+        """
+        Aplica registros (date, name, value) de _indicator_records. Datas sem barra
+        no espelho são ignoradas. False se o símbolo não tem espelho.
+        """
+        new = pd.DataFrame(records)
+        with self._write_lock(symbol_id):
+            meta, cur, names = self._current(symbol_id)
+            if meta is None:
+                return False
+            dates = cur[0].view(np.int64)
+            names2 = sorted(set(names) | set(new["name"]))
+            arr = np.full((6 + len(names2), cur.shape[1]), np.nan)
+            arr[:6] = cur[:6]
+            for i, n in enumerate(names):
+                arr[6 + names2.index(n)] = cur[6 + i]
+            new_dates = pd.to_datetime(new["date"]).to_numpy("M8[ns]").view(np.int64)
+            pos = np.searchsorted(dates, new_dates)
+            found = (pos < len(dates)) & (dates[np.minimum(pos, len(dates) - 1)] == new_dates)
+            rows = np.array([6 + names2.index(n) for n in new["name"]])
+            arr[rows[found], pos[found]] = new["value"].to_numpy(float)[found]
+            self._publish(symbol_id, arr, names2, version)
+        return True
+
+    def stats(self) -> dict:
+        files = list(self.root.glob("*.npy"))
+        with self._lock:
+            return {
+                "root": str(self.root),
+                "symbols": len(list(self.root.glob("*.json"))),
+                "bytes": sum(f.stat().st_size for f in files),
+                "mapped": len(self._open),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+            }
+
+
+price_mirror = PriceMirror(PRICE_MIRROR_DIR) if PRICE_MIRROR_DIR else None
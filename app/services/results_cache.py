@@ -0,0 +1,169 @@
+# app/services/results_cache.py
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# orçamento de memória das respostas serializadas de /backtests/{id}/results
+RESULTS_CACHE_MAX_MB = float(os.getenv("RESULTS_CACHE_MAX_MB", "64"))
+# diretório opcional: as respostas também vão para disco e sobrevivem a restarts
+RESULTS_CACHE_DIR = os.getenv("RESULTS_CACHE_DIR") or None
+
+
+def make_etag(body: bytes) -> str:
+    """ETag forte: hash do corpo exato da resposta."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match: lista separada por vírgulas, "*" ou W/"..." (comparação fraca, RFC 9110)."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _version_tag(version: str) -> str:
+    return hashlib.sha256(version.encode()).hexdigest()[:16]
+
+
+class ResultsCache:
+    """
+    LRU em processo dos resultados JSON já serializados, por backtest id.
+
+    Só backtests "finished" entram (não mudam mais). Cada entrada guarda a
+    versão da linha no banco (backtest_version: created_at + fingerprint) e
+    get() só a devolve se a versão pedida for a mesma: invalidate() limpa só o
+    processo que apagou o backtest, então os outros workers dependem dessa
+    checagem para não servir um backtest apagado, ou outro que reaproveitou o
+    id. Com `disk_dir`, cada resposta também é gravada em <id>.<versão>.json e
+    recarregada em caso de miss na memória (compartilhado entre workers).
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: str | None = None):
+        self.max_bytes = int(max_bytes)
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[int, tuple[str, bytes, str]] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale = 0
+
+    def _path(self, bt_id: int, version: str) -> Path:
+        return self.disk_dir / f"{int(bt_id)}.{_version_tag(version)}.json"
+
+    def _disk_files(self, bt_id: int) -> list[Path]:
+        return list(self.disk_dir.glob(f"{int(bt_id)}.*.json"))
+
+    def get(self, bt_id: int, version: str) -> tuple[str, bytes] | None:
+        """(etag, corpo) gravados para esta versão do backtest, ou None."""
+        entry = self.get_memory(bt_id, version)
+        return entry if entry is not None else self.get_disk(bt_id, version)
+
+    def get_memory(self, bt_id: int, version: str) -> tuple[str, bytes] | None:
+        """Só o LRU em memória, sem I/O (pode rodar no event loop). Um miss aqui não é contado."""
+        with self._lock:
+            entry = self._entries.get(bt_id)
+            if entry is None:
+                return None
+            if entry[2] == version:
+                self._entries.move_to_end(bt_id)
+                self.hits += 1
+                return entry[:2]
+            self._drop(bt_id)  # apagado/regravado por outro processo
+            self.stale += 1
+            return None
+
+    def get_disk(self, bt_id: int, version: str) -> tuple[str, bytes] | None:
+        """Camada de disco (lê arquivo: fora do event loop); o resultado sobe para a memória."""
+        if self.disk_dir:
+            try:
+                body = self._path(bt_id, version).read_bytes()
+            except FileNotFoundError:
+                body = None
+            if body is not None:
+                entry = (make_etag(body), body, version)
+                with self._lock:
+                    self.disk_hits += 1
+                self._put_memory(bt_id, entry)
+                return entry[:2]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, bt_id: int, body: bytes, version: str) -> tuple[str, bytes]:
+        entry = (make_etag(body), body, version)
+        self._put_memory(bt_id, entry)
+        if self.disk_dir:
+            path = self._path(bt_id, version)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(body)
+            os.replace(tmp, path)
+            for old in self._disk_files(bt_id):
+                if old != path:
+                    old.unlink(missing_ok=True)
+        return entry[:2]
+
+    def _put_memory(self, bt_id: int, entry: tuple[str, bytes, str]) -> None:
+        size = len(entry[1])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if bt_id in self._entries:
+                self._drop(bt_id)
+            self._entries[bt_id] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, bt_id: int) -> None:
+        with self._lock:
+            if bt_id in self._entries:
+                self._drop(bt_id)
+                self.invalidations += 1
+        if self.disk_dir:
+            for path in self._disk_files(bt_id):
+                path.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.disk_dir:
+            for p in self.disk_dir.glob("*.json"):
+                p.unlink(missing_ok=True)
+
+    def _drop(self, bt_id: int) -> None:
+        _, body, _ = self._entries.pop(bt_id)
+        self._bytes -= len(body)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "stale": self.stale,
+                "disk_dir": str(self.disk_dir) if self.disk_dir else None,
+            }
+
+
+results_cache = ResultsCache(int(RESULTS_CACHE_MAX_MB * 1024 * 1024), RESULTS_CACHE_DIR)
@@ -0,0 +1,226 @@
+# app/services/sweep_service.py
+from __future__ import annotations
+
+import itertools
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from app.db.session import get_session_local
+from app.core.strategies import stored_indicator_names
+from app.services.backtest_service import _load_df, _execute, _persist, find_finished, STRATEGY_TYPES
+from app.services.fingerprint import run_fingerprint, DataHasher
+
+# parâmetros de run_backtest que podem variar na grade; o resto vai em strategy_params
+BASE_PARAMS = ("sma_fast", "sma_slow", "atr_window", "atr_k", "risk_perc")
+STRATEGY_PARAMS = {
+    "sma_cross": (),
+    "donchian_breakout": ("n_high", "n_low"),
+    "momentum": ("lookback", "threshold"),
+}
+MAX_COMBINATIONS = 5000
+# métricas aceitas em sort_by -> True se menor é melhor (ordem crescente)
+SORT_ASCENDING = {
+    "sharpe_a": False,
+    "return_pct": False,
+    "final_value": False,
+    "max_drawdown_pct": True,
+    "total_trades": False,
+    "won": False,
+    "lost": True,
+}
+
+
+def expand_grid(
+    grid: Dict[str, List[Any]],
+    mode: str = "grid",
+    n_samples: Optional[int] = None,
+    seed: Optional[int] = None,
+    limit: int = MAX_COMBINATIONS,
+) -> List[Dict[str, Any]]:
+    """
+    Produto cartesiano da grade; em mode="random", amostra n_samples combinações
+    sem repetição. O tamanho é conferido contra `limit` antes de montar qualquer
+    combinação, e a amostra sorteia posições no produto (decodificadas eixo a
+    eixo), sem materializar o produto inteiro. ValueError se o pedido é inválido.
+    """
+    if mode not in ("grid", "random"):
+        raise ValueError("mode inválido (use grid ou random)")
+    keys = sorted(grid)
+    axes = [list(grid[k]) for k in keys]
+    total = math.prod(len(a) for a in axes)
+    if mode == "random":
+        if n_samples is None:
+            raise ValueError('mode="random" exige n_samples')
+        size = min(n_samples, total)
+    else:
+        size = total
+    if size > limit:
+        raise ValueError(f"grade com {size} combinações (máx. {limit})")
+    if size < total:
+        return [_decode(axes, keys, i) for i in random.Random(seed).sample(range(total), size)]
+    return [dict(zip(keys, vals)) for vals in itertools.product(*axes)]
+
+
+def _decode(axes: List[list], keys: List[str], i: int) -> Dict[str, Any]:
+    """i-ésima combinação na ordem de itertools.product (último eixo varia mais rápido)."""
+    vals = []
+    for axis in reversed(axes):
+        i, r = divmod(i, len(axis))
+        vals.append(axis[r])
+    return dict(zip(keys, reversed(vals)))
+
+
+def _grid_indicators(strategy_type: str, candidates) -> list[str]:
+    """Séries gravadas lidas por alguma combinação da grade (união de stored_indicator_names)."""
+    return sorted({n for base, _ in candidates
+                   for n in stored_indicator_names(strategy_type, base["sma_fast"], base["sma_slow"],
+                                                   base["atr_window"])})
+
+
+def _split(combo: Dict[str, Any], defaults: Dict[str, Any], strategy_params: Dict[str, Any]) -> tuple[dict, dict]:
+    base = {k: combo.get(k, defaults[k]) for k in BASE_PARAMS}
+    sp = dict(strategy_params) | {k: v for k, v in combo.items() if k not in BASE_PARAMS}
+    return base, sp
+
+
+# --- worker do pool: o DataFrame chega uma vez por processo (initializer), não por tarefa
+_WORKER_DF: pd.DataFrame | None = None
+
+def _init_worker(df: pd.DataFrame) -> None:
+    global _WORKER_DF
+    _WORKER_DF = df
+
+def _run_combo(args: tuple) -> dict:
+    strategy_type, engine, initial_cash, commission, base, sp = args
+    t0 = time.perf_counter()
+    res = _execute(_WORKER_DF, initial_cash, commission, strategy_type=strategy_type, strategy_params=sp,
+                   engine=engine, **base)
+    res["elapsed_s"] = time.perf_counter() - t0
+    return res
+
+
+def run_sweep(
+    ticker: str,
+    start: date,
+    end: date,
+    strategy_type: str,
+    grid: Dict[str, List[Any]],
+    initial_cash: float = 100000,
+    commission: float = 0.0,
+    defaults: Optional[Dict[str, Any]] = None,
+    strategy_params: Optional[Dict[str, Any]] = None,
+    mode: str = "grid",
+    n_samples: Optional[int] = None,
+    seed: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    persist_details: bool = False,
+    sort_by: str = "sharpe_a",
+    engine: str = "backtrader",
+    force: bool = False,
+) -> dict:
+    """
+    Roda uma varredura de parâmetros: carrega os preços uma vez, distribui as
+    combinações num pool de processos e grava cada combinação como um
+    Backtest (+ Metric) normal. Trades/série diária só com persist_details=True.
+    engine="vectorized" usa o motor NumPy (ordens de grandeza mais rápido em grades grandes).
+    Combinações já gravadas (mesma impressão digital) não rodam de novo, salvo force=True.
+    """
+    if strategy_type not in STRATEGY_TYPES:
+        return {"error": "strategy_type inválido"}
+    allowed = set(BASE_PARAMS) | set(STRATEGY_PARAMS[strategy_type])
+    unknown = sorted(set(grid) - allowed)
+    if unknown:
+        return {"error": f"parâmetros inválidos para {strategy_type}: {', '.join(unknown)}"}
+    if sort_by not in SORT_ASCENDING:
+        return {"error": f"sort_by inválido (use {', '.join(SORT_ASCENDING)})"}
+
+    try:
+        combos = expand_grid(grid, mode, n_samples, seed)
+    except ValueError as e:
+        return {"error": str(e)}
+    if not combos:
+        return {"error": "grade vazia"}
+
+    defaults = {"sma_fast": 20, "sma_slow": 50, "atr_window": 14, "atr_k": 2.0, "risk_perc": 0.01} | (defaults or {})
+    tasks = [(strategy_type, engine, initial_cash, commission, *_split(c, defaults, strategy_params or {}))
+             for c in combos]
+
+    df = _load_df(ticker, start, end, _grid_indicators(strategy_type, [t[4:] for t in tasks]))
+    if df is None or df.empty or df["close"].dropna().empty:
+        return {"error": "Sem dados para o período informado. Rode /data/update antes."}
+
+    # o hash de cada combinação cobre só os indicadores que ela lê, não a união
+    # da grade: a mesma combinação em outra grade (ou no /run) reaproveita o resultado
+    dh = DataHasher(df)
+    fps = [run_fingerprint(ticker, start, end, strategy_type, initial_cash, commission,
+                           base | {"engine": engine} | sp,
+                           dh(stored_indicator_names(strategy_type, base["sma_fast"], base["sma_slow"],
+                                                     base["atr_window"])),
+                           details=persist_details)
+           for (_, _, _, _, base, sp) in tasks]
+    SessionLocal = get_session_local()
+    existing = {}
+    if not force:
+        with SessionLocal() as db:
+            existing = find_finished(db, fps)
+    todo = [i for i, fp in enumerate(fps) if fp not in existing]
+
+    t0 = time.perf_counter()
+    workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+    workers = max(1, min(workers, len(todo) or 1))
+    pending = [tasks[i] for i in todo]
+    if workers == 1:
+        _init_worker(df)
+        outputs = [_run_combo(t) for t in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(df,)) as pool:
+            outputs = list(pool.map(_run_combo, pending, chunksize=max(1, len(pending) // (workers * 4))))
+    run_s = time.perf_counter() - t0
+    outputs = dict(zip(todo, outputs))
+
+    rows = []
+    with SessionLocal() as db:
+        for i, (combo, (_, _, _, _, base, sp), fp) in enumerate(zip(combos, tasks, fps)):
+            if fp in existing:
+                bt_id, metrics = existing[fp]
+                rows.append({"params": combo, "backtest_id": bt_id, "metrics": metrics, "error": None,
+                             "reused": True})
+                continue
+            out = outputs[i]
+            if "error" in out:
+                rows.append({"params": combo, "backtest_id": None, "metrics": None, "error": out["error"]})
+                continue
+            bt_id = _persist(
+                db, ticker, start, end, strategy_type, initial_cash, commission,
+                base | {"engine": engine} | sp, out["metrics"],
+                out["trades"] if persist_details else [],
+                out["daily"] if persist_details else [],
+                fingerprint=fp,
+            )
+            rows.append({"params": combo, "backtest_id": bt_id, "metrics": out["metrics"],
+                         "elapsed_s": out["elapsed_s"], "error": None})
+        db.commit()
+
+    sign = 1.0 if SORT_ASCENDING[sort_by] else -1.0
+
+    def _key(r):
+        # melhor primeiro (drawdown: menor); sem a métrica vai para o fim
+        v = (r["metrics"] or {}).get(sort_by)
+        return (v is None, sign * (v or 0.0))
+
+    rows.sort(key=_key)
+    return {
+        "ticker": ticker,
+        "strategy_type": strategy_type,
+        "combinations": len(rows),
+        "workers": workers,
+        "elapsed_s": run_s,
+        "results": rows,
+    }
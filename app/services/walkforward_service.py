@@ -0,0 +1,299 @@
+# app/services/walkforward_service.py
+from __future__ import annotations
+
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from app.db.session import get_session_local
+from app.db.models import WalkForwardWindow
+from app.core.vectorized import min_period, _max_drawdown_pct, _sharpe_annual
+from app.services.backtest_service import _load_df, _execute, _persist, find_finished, STRATEGY_TYPES
+from app.services.fingerprint import run_fingerprint, data_hash
+from app.services.sweep_service import BASE_PARAMS, STRATEGY_PARAMS, expand_grid, _split, _grid_indicators
+
+OBJECTIVES = ("sharpe_a", "return_pct", "final_value")
+MAX_WINDOWS = 200
+
+
+def make_windows(n: int, train_bars: int, test_bars: int, anchored: bool = False) -> List[dict]:
+    """
+    Janelas em posições de barra: treino [a, b) seguido de teste [b, c).
+    Os testes não se sobrepõem (passo = test_bars); o último pode ser mais curto.
+    anchored=True mantém o início do treino fixo (janela expansiva).
+    """
+    out = []
+    b = train_bars
+    while b < n:
+        a = 0 if anchored else b - train_bars
+        c = min(b + test_bars, n)
+        out.append({"train": (a, b), "test": (b, c)})
+        b = c
+    return out
+
+
+# --- DataFrame em memória compartilhada: copiado uma vez, lido por todos os workers sem pickle por tarefa
+
+def _share_frame(df: pd.DataFrame) -> tuple[SharedMemory, tuple]:
+    values = np.ascontiguousarray(df.to_numpy(dtype=float))
+    shm = SharedMemory(create=True, size=max(values.nbytes, 1))
+    np.ndarray(values.shape, dtype=float, buffer=shm.buf)[:] = values
+    meta = (shm.name, values.shape, list(df.columns), df.index.values, df.index.name)
+    return shm, meta
+
+
+_WORKER: Dict[str, Any] = {}
+
+def _init_worker(meta: tuple) -> None:
+    name, shape, columns, index, index_name = meta
+    shm = SharedMemory(name=name)
+    # quem cria é o processo pai, que também faz o unlink. Fora do fork o worker
+    # tem o próprio resource tracker, que apagaria o segmento ao sair
+    if multiprocessing.get_start_method() != "fork":
+        resource_tracker.unregister(shm._name, "shared_memory")
+    arr = np.ndarray(shape, dtype=float, buffer=shm.buf)
+    _WORKER["shm"] = shm  # mantém o mapeamento vivo enquanto o worker existir
+    _WORKER["df"] = pd.DataFrame(arr, index=pd.DatetimeIndex(index, name=index_name), columns=columns, copy=False)
+
+def _init_local(df: pd.DataFrame) -> None:
+    _WORKER["df"] = df
+
+
+def _score(metrics: dict, objective: str) -> float | None:
+    v = metrics.get(objective)
+    if v is None:
+        return None
+    v = float(v)
+    return v if math.isfinite(v) else None
+
+
+def _run_window(args: tuple) -> dict:
+    """Otimiza no treino (maior `objective`) e roda a melhor combinação no teste."""
+    w, strategy_type, engine, initial_cash, commission, candidates, objective = args
+    df = _WORKER["df"]
+    a, b = w["train"]
+    train = df.iloc[a:b]
+
+    best, best_score, best_metrics = None, None, None
+    for base, sp in candidates:
+        res = _execute(train, initial_cash, commission, strategy_type=strategy_type, strategy_params=sp,
+                       engine=engine, **base)
+        if "error" in res:
+            return {"error": res["error"]}
+        score = _score(res["metrics"], objective)
+        if best is None or (score is not None and (best_score is None or score > best_score)):
+            best, best_score, best_metrics = (base, sp), score, res["metrics"]
+
+    base, sp = best
+    # o teste começa minperiod-1 barras antes, para os indicadores chegarem aquecidos
+    # e o primeiro next() da estratégia cair na primeira barra do teste
+    t0, t1 = w["test"]
+    minp = min_period(df.columns, strategy_type, base["sma_fast"], base["sma_slow"], base["atr_window"], sp)
+    test = df.iloc[max(0, t0 - (minp - 1)):t1]
+    res = _execute(test, initial_cash, commission, strategy_type=strategy_type, strategy_params=sp,
+                   engine=engine, **base)
+    if "error" in res:
+        return {"error": res["error"]}
+
+    first = df.index[t0].date().isoformat()
+    daily = [d for d in res["daily"] if d["date"] >= first]
+    closes = dict(zip(test.index.strftime("%Y-%m-%d"), test["close"].to_numpy(float)))
+    return {
+        "params": base | sp,
+        "train_metrics": best_metrics,
+        "test_metrics": res["metrics"],
+        "daily": [d | {"close": closes[d["date"]]} for d in daily],
+        "trades": [t for t in res["trades"] if t["date"] >= first],
+    }
+
+
+def _stitch(outputs: List[dict], initial_cash: float) -> tuple[list, list]:
+    """
+    Encadeia as curvas de teste por retorno: a janela k roda com initial_cash e é
+    escalada pelo capital acumulado até ela (posições abertas no fim de uma janela
+    são marcadas a mercado no fechamento, sem custo de saída).
+
+    Equity, posição, tamanho e pnl dos trades são escalados juntos. Posição e
+    tamanho são arredondados para ações inteiras; a sobra do arredondamento vai
+    para o caixa, de modo que cada linha mantém equity = cash + position×close
+    (e o pnl de um trade fica a menos de um lote do size×Δpreço).
+    """
+    daily, trades = [], []
+    scale = 1.0
+    for out in outputs:
+        for d in out["daily"]:
+            equity = d["equity"] * scale
+            position = int(round(d["position"] * scale))
+            daily.append({"date": d["date"], "position": position,
+                          "cash": equity - position * d["close"], "equity": equity})
+        for t in out["trades"]:
+            trades.append(t | {"size": max(1, int(round(t["size"] * scale))),
+                               "pnl": t["pnl"] * scale if t.get("pnl") is not None else None})
+        if out["daily"]:
+            scale *= out["daily"][-1]["equity"] / initial_cash
+    return daily, trades
+
+
+def run_walk_forward(
+    ticker: str,
+    start: date,
+    end: date,
+    strategy_type: str,
+    grid: Dict[str, List[Any]],
+    train_bars: int = 252,
+    test_bars: int = 63,
+    anchored: bool = False,
+    objective: str = "sharpe_a",
+    initial_cash: float = 100000,
+    commission: float = 0.0,
+    defaults: Optional[Dict[str, Any]] = None,
+    strategy_params: Optional[Dict[str, Any]] = None,
+    engine: str = "backtrader",
+    max_workers: Optional[int] = None,
+    force: bool = False,
+) -> dict:
+    """
+    Walk-forward: divide o período em janelas treino/teste, escolhe na grade a
+    melhor combinação de cada treino (pela métrica `objective`) e a roda no teste
+    seguinte. As janelas rodam em paralelo num pool de processos que lê o
+    DataFrame de preços de memória compartilhada.
+
+    O resultado encadeado dos testes é gravado como um Backtest normal (série
+    diária, trades, métricas) e cada janela em walk_forward_windows.
+    """
+    if strategy_type not in STRATEGY_TYPES:
+        return {"error": "strategy_type inválido"}
+    if objective not in OBJECTIVES:
+        return {"error": f"objective inválido (use {', '.join(OBJECTIVES)})"}
+    allowed = set(BASE_PARAMS) | set(STRATEGY_PARAMS[strategy_type])
+    unknown = sorted(set(grid) - allowed)
+    if unknown:
+        return {"error": f"parâmetros inválidos para {strategy_type}: {', '.join(unknown)}"}
+    try:
+        combos = expand_grid(grid)
+    except ValueError as e:
+        return {"error": str(e)}
+    if not combos:
+        return {"error": "grade vazia"}
+
+    defaults = {"sma_fast": 20, "sma_slow": 50, "atr_window": 14, "atr_k": 2.0, "risk_perc": 0.01} | (defaults or {})
+    candidates = [_split(c, defaults, strategy_params or {}) for c in combos]
+
+    names = _grid_indicators(strategy_type, candidates)
+    df = _load_df(ticker, start, end, names)
+    if df is None or df.empty or df["close"].dropna().empty:
+        return {"error": "Sem dados para o período informado. Rode /data/update antes."}
+    windows = make_windows(len(df), train_bars, test_bars, anchored)
+    if not windows:
+        return {"error": f"período com {len(df)} barras: precisa de mais que train_bars={train_bars}"}
+    if len(windows) > MAX_WINDOWS:
+        return {"error": f"{len(windows)} janelas (máx. {MAX_WINDOWS}); aumente test_bars"}
+    wf = {"train_bars": train_bars, "test_bars": test_bars, "anchored": anchored, "objective": objective,
+          "grid": grid}
+    params = defaults | {"engine": engine} | (strategy_params or {}) | {"walk_forward": wf}
+
+    # o resultado depende de toda a grade (params inclui a grade): hash sobre os indicadores de todas as combinações
+    fp = run_fingerprint(ticker, start, end, strategy_type, initial_cash, commission, params, data_hash(df, names))
+    SessionLocal = get_session_local()
+    if not force:
+        with SessionLocal() as db:
+            found = find_finished(db, [fp]).get(fp)
+        if found:
+            return {"backtest_id": found[0], "metrics": found[1], "windows": get_windows(found[0]), "reused": True}
+
+    tasks = [(w, strategy_type, engine, initial_cash, commission, candidates, objective) for w in windows]
+    t0 = time.perf_counter()
+    workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+    workers = max(1, min(workers, len(tasks)))
+    if workers == 1:
+        _init_local(df)
+        outputs = [_run_window(t) for t in tasks]
+    else:
+        shm, meta = _share_frame(df)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(meta,)) as pool:
+                outputs = list(pool.map(_run_window, tasks))
+        finally:
+            shm.close()
+            shm.unlink()
+    run_s = time.perf_counter() - t0
+
+    errors = [o["error"] for o in outputs if "error" in o]
+    if errors:
+        return {"error": errors[0]}
+
+    daily, trades = _stitch(outputs, initial_cash)
+    equity = np.array([d["equity"] for d in daily])
+    dates = pd.DatetimeIndex([d["date"] for d in daily])
+    final_value = float(equity[-1])
+    closed = [t for t in trades if t.get("pnl") is not None]
+    won = sum(1 for t in closed if t["pnl"] >= 0.0)
+    metrics = {
+        "final_value": final_value,
+        "return_pct": (final_value / initial_cash - 1.0) if initial_cash else None,
+        "max_drawdown_pct": _max_drawdown_pct(equity),
+        "sharpe_a": _sharpe_annual(dates, equity, initial_cash),
+        "total_trades": sum(int(o["test_metrics"].get("total_trades") or 0) for o in outputs),
+        "won": won if closed else None,
+        "lost": (len(closed) - won) if closed else None,
+    }
+
+    idx = df.index
+    rows = [
+        {
+            "idx": i,
+            "train_start": idx[w["train"][0]].date(),
+            "train_end": idx[w["train"][1] - 1].date(),
+            "test_start": idx[w["test"][0]].date(),
+            "test_end": idx[w["test"][1] - 1].date(),
+            "params": o["params"],
+            "train_metrics": o["train_metrics"],
+            "test_metrics": o["test_metrics"],
+        }
+        for i, (w, o) in enumerate(zip(windows, outputs))
+    ]
+    with SessionLocal() as db:
+        bt_id = _persist(db, ticker, start, end, strategy_type, initial_cash, commission, params,
+                         metrics, trades, daily, fingerprint=fp)
+        for r in rows:
+            db.add(WalkForwardWindow(backtest_id=bt_id, **r))
+        db.commit()
+
+    return {
+        "backtest_id": bt_id,
+        "metrics": metrics,
+        "windows": rows,
+        "workers": workers,
+        "elapsed_s": run_s,
+    }
+
+
+def get_windows(bt_id: int) -> List[dict]:
+    SessionLocal = get_session_local()
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(WalkForwardWindow).where(WalkForwardWindow.backtest_id == bt_id).order_by(WalkForwardWindow.idx)
+        ).scalars().all()
+        return [
+            {
+                "idx": r.idx,
+                "train_start": r.train_start,
+                "train_end": r.train_end,
+                "test_start": r.test_start,
+                "test_end": r.test_end,
+                "params": r.params,
+                "train_metrics": r.train_metrics,
+                "test_metrics": r.test_metrics,
+            }
+            for r in rows
+        ]
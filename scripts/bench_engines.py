@@ -0,0 +1,54 @@
+"""
+Benchmark dos motores de backtest: Backtrader vs. vetorizado (NumPy).
+
+Uso:
+    python scripts/bench_engines.py --bars 5000 --repeat 3
+
+Roda _execute (sem banco) nas três estratégias sobre OHLCV sintético e
+imprime o tempo médio por execução e o ganho do motor vetorizado. A coluna
+"bt+stored" roda o Backtrader com sma_20/sma_50/atr_14 já no DataFrame, como
+_load_df entrega quando os indicadores estão gravados.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.indicators import sma, atr
+from app.services.backtest_service import _execute
+from scripts.bench_upsert_prices import synthetic_ohlcv
+
+CASES = [
+    ("sma_cross", {}),
+    ("donchian_breakout", {"n_high": 20, "n_low": 10}),
+    ("momentum", {"lookback": 60, "threshold": 0.0}),
+]
+
+
+def _time(df, engine, strategy_type, sp, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        _execute(df, 100000, 0.0005, 20, 50, 14, 2.0, 0.01, strategy_type, sp, engine)
+    return (time.perf_counter() - t0) / repeat
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bars", type=int, default=5000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    df = synthetic_ohlcv(args.bars).set_index("date")
+    stored = df.assign(sma_20=sma(df["close"], 20), sma_50=sma(df["close"], 50), atr_14=atr(df, 14))
+    for strategy_type, sp in CASES:
+        ref = _time(df, "backtrader", strategy_type, sp, args.repeat)
+        ind = _time(stored, "backtrader", strategy_type, sp, args.repeat)
+        vec = _time(df, "vectorized", strategy_type, sp, args.repeat)
+        print(f"{strategy_type:18s} backtrader {ref * 1000:8.1f} ms | bt+stored {ind * 1000:8.1f} ms "
+              f"({100 * (1 - ind / ref):4.0f}%) | vectorized {vec * 1000:7.2f} ms | {ref / vec:5.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark dos indicadores: app.core.indicators (NumPy) vs. as versões em pandas.
+
+Uso:
+    python scripts/bench_indicators.py --bars 100000 --repeat 5
+
+Cada linha compara o tempo mediano do indicador com o equivalente pandas
+(rolling/ewm sobre Series, o ATR antigo com pd.concat + max(axis=1)) e confere
+que os valores batem. "sma x N" calcula N janelas de uma vez (sma_many) contra
+N chamadas de rolling().mean().
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pandas as pd
+
+from app.core import indicators as ind
+from scripts.bench_upsert_prices import synthetic_ohlcv
+
+
+def _pd_atr(df, w):
+    prev = df["close"].shift(1)
+    tr = pd.concat([df["high"] - df["low"], (df["high"] - prev).abs(), (df["low"] - prev).abs()], axis=1).max(axis=1)
+    return tr.rolling(w, min_periods=w).mean()
+
+
+def _pd_true_range(df):
+    prev = df["close"].shift(1)
+    return pd.concat([df["high"], prev], axis=1).max(axis=1, skipna=False) \
+        - pd.concat([df["low"], prev], axis=1).min(axis=1, skipna=False)
+
+
+def _pd_smooth(x, alpha, w):
+    seeded = x.copy()
+    first = x.first_valid_index()
+    s = x.index.get_loc(first) + w - 1
+    seeded.iloc[:s] = np.nan
+    seeded.iloc[s] = x.iloc[s - w + 1:s + 1].mean()
+    return seeded.ewm(alpha=alpha, adjust=False).mean()
+
+
+def _pd_rsi(c, w):
+    d = c.diff()
+    up = _pd_smooth(d.clip(lower=0), 1 / w, w)
+    down = _pd_smooth((-d).clip(lower=0), 1 / w, w)
+    return 100 - 100 / (1 + up / down)
+
+
+def _median_time(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bars", type=int, default=100_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--windows", type=int, default=20, help="janelas no caso sma x N")
+    args = ap.parse_args()
+
+    df = synthetic_ohlcv(args.bars).set_index("date").astype(float)
+    c = df["close"]
+    windows = list(range(10, 10 + 10 * args.windows, 10))
+
+    cases = [
+        ("sma_20", lambda: ind.sma(c, 20), lambda: c.rolling(20).mean()),
+        (f"sma x {len(windows)}", lambda: ind.sma_many(c, windows),
+         lambda: pd.DataFrame({f"sma_{w}": c.rolling(w).mean() for w in windows})),
+        ("ema_20", lambda: ind.ema(c, 20), lambda: _pd_smooth(c, 2 / 21, 20)),
+        ("atr_14", lambda: ind.atr(df, 14), lambda: _pd_atr(df, 14)),
+        ("wilder_atr_14", lambda: ind.wilder_atr(df, 14), lambda: _pd_smooth(_pd_true_range(df), 1 / 14, 14)),
+        ("donchian_high_55", lambda: ind.donchian_high(df["high"], 55), lambda: df["high"].rolling(55).max()),
+        ("mom_60", lambda: ind.momentum(c, 60), lambda: c / c.shift(60) - 1),
+        ("vol_20", lambda: ind.volatility(c, 20), lambda: c.pct_change().rolling(20).std()),
+        ("rsi_14", lambda: ind.rsi(c, 14), lambda: _pd_rsi(c, 14)),
+        ("bollinger_20", lambda: ind.bollinger(c, 20),
+         lambda: (c.rolling(20).mean(), c.rolling(20).mean() + 2 * c.rolling(20).std(ddof=0),
+                  c.rolling(20).mean() - 2 * c.rolling(20).std(ddof=0))),
+    ]
+
+    print(f"{args.bars} barras, mediana de {args.repeat}\n")
+    print(f"{'indicador':18s} {'numpy ms':>10s} {'pandas ms':>10s} {'ganho':>7s} {'erro rel.':>10s}")
+    for name, ours, ref in cases:
+        a, b = ours(), ref()
+        a = np.column_stack(a) if isinstance(a, tuple) else np.asarray(a, float)
+        b = np.column_stack(b) if isinstance(b, tuple) else np.asarray(b, float)
+        b = b.T if a.shape != b.shape else b
+        m = ~np.isnan(b)
+        err = np.nanmax(np.abs(a[m] - b[m]) / np.maximum(np.abs(b[m]), 1e-12))
+        t_ours = _median_time(ours, args.repeat)
+        t_ref = _median_time(ref, args.repeat)
+        print(f"{name:18s} {t_ours * 1000:10.2f} {t_ref * 1000:10.2f} {t_ref / t_ours:6.1f}x {err:10.1e}")
+
+
+if __name__ == "__main__":
+    main()
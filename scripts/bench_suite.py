@@ -0,0 +1,237 @@
+"""
+Suíte de benchmarks dos caminhos quentes: ingestão, leitura, backtest e resultados.
+
+Uso:
+    python scripts/bench_suite.py --bars 5000 --symbols 3 --repeat 5 --out bench.json
+    python scripts/bench_suite.py --compare bench.json           # compara com uma execução anterior
+    DATABASE_URL=postgresql+psycopg2://... python scripts/bench_suite.py --out bench_pg.json
+
+Gera OHLCV sintético e determinístico (`--bars` barras x `--symbols` símbolos)
+e mede, num banco limpo (SQLite em memória sem DATABASE_URL):
+
+  upsert_prices.insert / .update   barras novas / regravação das mesmas barras
+  upsert_indicators                sma_20, sma_50 e atr_14 de cada símbolo
+  load_df.cold / .warm             _load_df sem e com o price_cache
+  load_df.mirror                   _load_df pelo espelho mmap (price_mirror, num diretório temporário)
+  run_backtest.<estratégia>.<engine>   ponta a ponta, com force=True
+  get_backtest_results             resposta completa de um backtest gravado
+
+Cada caso roda `--repeat` vezes e guarda min/mediana/média/máx em segundos
+(e linhas/s na ingestão). O JSON leva a máquina, as versões e o commit do git,
+para comparar execuções entre commits: com --compare, casos cuja mediana piorou
+mais que --threshold são listados e o processo sai com código 1.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pandas as pd
+import sqlalchemy
+import backtrader as bt
+
+from app.core.indicators import sma, atr
+from app.core.strategies import stored_indicator_names
+from app.services.data_service import ensure_symbol, upsert_prices, upsert_indicators
+from app.services.backtest_service import _load_df, run_backtest, STRATEGY_TYPES, ENGINES
+from app.services.backtest_results_service import get_backtest_results
+from app.services.price_cache import price_cache
+from app.services import price_mirror as price_mirror_mod
+from app.services.price_mirror import PriceMirror
+from app.services.results_cache import results_cache
+from scripts.bench_upsert_prices import synthetic_ohlcv, _setup_db
+
+STRATEGY_PARAMS = {
+    "sma_cross": {},
+    "donchian_breakout": {"n_high": 20, "n_low": 10},
+    "momentum": {"lookback": 60, "threshold": 0.0},
+}
+BACKTEST_ARGS = dict(initial_cash=100000, commission=0.0005, sma_fast=20, sma_slow=50, atr_window=14,
+                     atr_k=2.0, risk_perc=0.01)
+
+
+def _stats(samples: list[float], rows: int | None = None) -> dict:
+    out = {
+        "repeat": len(samples),
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+        "max_s": max(samples),
+    }
+    if rows:
+        out["rows"] = rows
+        out["rows_per_s"] = rows / out["median_s"]
+    return out
+
+
+def _timeit(fn, repeat: int, setup=None) -> list[float]:
+    samples = []
+    for i in range(repeat):
+        if setup:
+            setup(i)
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_suite(bars: int, symbols: int, repeat: int) -> dict:
+    frames = [synthetic_ohlcv(bars, seed=i) for i in range(symbols)]
+    rows = bars * symbols
+    results = {}
+
+    # --- Ingestão: cada repetição grava símbolos novos (insert) e depois regrava os mesmos (update)
+    ids: dict[int, list[int]] = {}
+
+    def insert(r):
+        ids[r] = [ensure_symbol(f"BENCH{r}_{i}") for i in range(symbols)]
+        for sid, df in zip(ids[r], frames):
+            upsert_prices(sid, df)
+    results["upsert_prices.insert"] = _stats(_timeit(insert, repeat), rows)
+
+    def update(r):
+        for sid, df in zip(ids[0], frames):
+            upsert_prices(sid, df)
+    results["upsert_prices.update"] = _stats(_timeit(update, repeat), rows)
+
+    indicators = []
+    for df in frames:
+        d = df.set_index("date")
+        indicators.append({"sma_20": sma(d["close"], 20), "sma_50": sma(d["close"], 50),
+                           "atr_14": atr(d[["high", "low", "close"]], 14)})
+    ind_rows = sum(int(s.notna().sum()) for ind in indicators for s in ind.values())
+
+    def write_indicators(r):
+        for sid, ind in zip(ids[r], indicators):
+            for name, values in ind.items():
+                upsert_indicators(sid, values.index, name, values)
+    results["upsert_indicators"] = _stats(_timeit(write_indicators, repeat), ind_rows)
+
+    # --- Leitura (o símbolo BENCH0_0 tem preços e indicadores)
+    ticker = "BENCH0_0"
+    start = frames[0]["date"].iloc[0].date()
+    end = frames[0]["date"].iloc[-1].date()
+    names = stored_indicator_names("sma_cross", 20, 50, 14)  # o que um backtest padrão lê
+    results["load_df.cold"] = _stats(_timeit(lambda r: _load_df(ticker, start, end, names), repeat,
+                                             setup=lambda r: price_cache.clear()), bars)
+    _load_df(ticker, start, end, names)
+    results["load_df.warm"] = _stats(_timeit(lambda r: _load_df(ticker, start, end, names), repeat), bars)
+    saved = price_mirror_mod.price_mirror
+    with tempfile.TemporaryDirectory() as tmp:
+        price_mirror_mod.price_mirror = PriceMirror(tmp)
+        try:
+            _load_df(ticker, start, end, names)  # constrói o espelho do símbolo
+            results["load_df.mirror"] = _stats(_timeit(lambda r: _load_df(ticker, start, end, names), repeat),
+                                               bars)
+        finally:
+            price_mirror_mod.price_mirror = saved
+
+    # --- Backtests ponta a ponta (carga, execução, gravação)
+    bt_id = None
+    for strategy_type in STRATEGY_TYPES:
+        for engine in ENGINES:
+            last = {}
+
+            def run(r, strategy_type=strategy_type, engine=engine):
+                last.update(run_backtest(ticker, start, end, strategy_type=strategy_type,
+                                         strategy_params=STRATEGY_PARAMS[strategy_type], engine=engine,
+                                         force=True, **BACKTEST_ARGS))
+            results[f"run_backtest.{strategy_type}.{engine}"] = _stats(_timeit(run, repeat), bars)
+            if "error" in last:
+                raise RuntimeError(f"{strategy_type}/{engine}: {last['error']}")
+            if strategy_type == "sma_cross" and engine == "backtrader":
+                bt_id = last["backtest_id"]
+
+    # --- Resultados (sem o cache de respostas, que fica na rota)
+    results["get_backtest_results"] = _stats(_timeit(lambda r: get_backtest_results(bt_id), repeat), bars)
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Imprime a razão das medianas (atual / base) e devolve os casos que pioraram além do limite."""
+    worse = []
+    print(f"\n{'caso':42s} {'base ms':>10s} {'atual ms':>10s} {'razão':>7s}")
+    for name, cur in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            print(f"{name:42s} {'-':>10s} {cur['median_s'] * 1000:10.2f}      novo")
+            continue
+        ratio = cur["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+        flag = "  <-- pior" if ratio > 1 + threshold else ""
+        print(f"{name:42s} {base['median_s'] * 1000:10.2f} {cur['median_s'] * 1000:10.2f} {ratio:7.2f}{flag}")
+        if flag:
+            worse.append(name)
+    return worse
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bars", type=int, default=5000)
+    ap.add_argument("--symbols", type=int, default=3)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--out", help="grava o resultado em JSON")
+    ap.add_argument("--compare", help="JSON de uma execução anterior")
+    ap.add_argument("--threshold", type=float, default=0.10, help="piora tolerada na mediana (0.10 = 10%%)")
+    args = ap.parse_args()
+
+    url = os.getenv("DATABASE_URL")
+    _setup_db(url)
+    results_cache.clear()
+    t0 = time.perf_counter()
+    results = run_suite(args.bars, args.symbols, args.repeat)
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "versions": {"numpy": np.__version__, "pandas": pd.__version__,
+                         "sqlalchemy": sqlalchemy.__version__, "backtrader": bt.__version__},
+            "db": sqlalchemy.engine.make_url(url).get_backend_name() if url else "sqlite-memory",
+            "bars": args.bars,
+            "symbols": args.symbols,
+            "repeat": args.repeat,
+            "elapsed_s": time.perf_counter() - t0,
+        },
+        "results": results,
+    }
+
+    for name, r in results.items():
+        rate = f"{r['rows_per_s']:14,.0f} linhas/s" if "rows_per_s" in r and name.startswith("upsert") else ""
+        print(f"{name:42s} mediana {r['median_s'] * 1000:10.2f} ms  (min {r['min_s'] * 1000:9.2f}) {rate}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nresultado gravado em {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        worse = compare(report, baseline, args.threshold)
+        if worse:
+            print(f"\n{len(worse)} caso(s) com mediana pior que {args.threshold:.0%}: {', '.join(worse)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark de ingestão: upsert_prices linha a linha (batch_size=1) vs. em lote.
+
+Uso:
+    python scripts/bench_upsert_prices.py --bars 5000 --symbols 5
+    DATABASE_URL=postgresql+psycopg2://... python scripts/bench_upsert_prices.py
+
+Sem DATABASE_URL usa SQLite em memória.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import session as session_mod
+from app.db.base import Base
+import app.db.models  # noqa: F401
+from app.services.data_service import ensure_symbol, upsert_prices, PRICES_BATCH_SIZE
+
+
+def synthetic_ohlcv(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 30.0 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = close * (1 + rng.normal(0, 0.002, n))
+    return pd.DataFrame({
+        "date": pd.bdate_range("2000-01-03", periods=n),
+        "open": open_,
+        "high": np.maximum(open_, close) * 1.01,
+        "low": np.minimum(open_, close) * 0.99,
+        "close": close,
+        "volume": rng.integers(1_000_000, 50_000_000, n).astype(float),
+    })
+
+
+def _setup_db(url: str | None):
+    engine = create_engine(url or "sqlite://", future=True)
+    Base.metadata.create_all(bind=engine)
+    session_mod._engine = engine
+    session_mod._SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+
+
+def run(bars: int, symbols: int, batch_size: int, prefix: str) -> float:
+    frames = [synthetic_ohlcv(bars, seed=i) for i in range(symbols)]
+    t0 = time.perf_counter()
+    total = 0
+    for i, df in enumerate(frames):
+        sid = ensure_symbol(f"{prefix}{i}")
+        total += upsert_prices(sid, df, batch_size=batch_size)
+    return total / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bars", type=int, default=5000)
+    ap.add_argument("--symbols", type=int, default=3)
+    ap.add_argument("--batch-size", type=int, default=PRICES_BATCH_SIZE)
+    args = ap.parse_args()
+
+    _setup_db(os.getenv("DATABASE_URL"))
+    row = run(args.bars, args.symbols, 1, "BENCH_ROW_")
+    bulk = run(args.bars, args.symbols, args.batch_size, "BENCH_BULK_")
+    print(f"linha a linha : {row:12,.0f} barras/s")
+    print(f"lote ({args.batch_size:>5}) : {bulk:12,.0f} barras/s  ({bulk / row:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Teste de carga das rotas de leitura com backtests síncronos rodando ao mesmo tempo.
+
+Uso:
+    python scripts/load_test.py --duration 15 --readers 32 --runners 4
+    python scripts/load_test.py --modes async --database-url postgresql+psycopg2://...   # banco já migrado
+    python scripts/load_test.py --app-dir ../outra-copia                                 # compara com outro checkout
+
+Para cada modo sobe um uvicorn (um worker) com:
+  sync   DB_ASYNC=0: leituras no engine síncrono, numa thread do Starlette
+  async  DB_ASYNC=1: leituras pelo engine async (precisa do extra "async")
+
+Os dados vêm do adapter "file" (CSV sintético num diretório temporário) e, sem
+--database-url, cada modo usa um SQLite novo em arquivo. Depois de semear um
+ticker e um backtest, `--runners` clientes repetem POST /backtests/run
+(force=True, sem reaproveitar) enquanto `--readers` clientes alternam
+GET /health, GET /backtests e GET /backtests/{id}/results. A saída é a vazão
+e a latência p50/p95/máx das leituras e a vazão dos backtests, por modo.
+
+O SQLite serializa as gravações: com muitos --runners os backtests começam a
+falhar com "database is locked" (coluna erros); para cargas maiores use
+--database-url com um Postgres. Em máquina de um núcleo só, os processos de
+cálculo disputam a mesma CPU das leituras e os ganhos ficam pequenos.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx
+from sqlalchemy import create_engine
+
+from app.db.base import Base
+import app.db.models  # noqa: F401  (registra as tabelas no Base)
+from scripts.bench_upsert_prices import synthetic_ohlcv
+
+TICKER = "LOAD3.SA"
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _percentile(xs: list[float], q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+
+def _start_server(mode: str, port: int, workdir: str, args) -> subprocess.Popen:
+    url = args.database_url
+    if url is None:
+        url = f"sqlite:///{os.path.join(workdir, f'load_{mode}.db')}"
+        Base.metadata.create_all(create_engine(url))
+    env = os.environ | {
+        "DATABASE_URL": url,
+        "DB_ASYNC": "1" if mode == "async" else "0",
+        "MARKET_DATA_ADAPTER": "file",
+        "MARKET_DATA_DIR": workdir,
+    }
+    env.pop("MARKET_DATA_CACHE_DIR", None)
+    env.pop("PRICE_MIRROR_DIR", None)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.api.main:app", "--port", str(port), "--log-level", "warning",
+         "--app-dir", args.app_dir],
+        cwd=args.app_dir, env=env,
+    )
+
+
+async def _wait_ready(client: httpx.AsyncClient, proc: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("uvicorn terminou antes de ficar pronto")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn não respondeu /health a tempo")
+
+
+async def _run_mode(mode: str, port: int, workdir: str, args) -> dict:
+    proc = _start_server(mode, port, workdir, args)
+    limits = httpx.Limits(max_connections=args.readers + args.runners + 4)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+            await _wait_ready(client, proc)
+            start, end = args.start, args.end
+            r = await client.post("/data/update", json={"ticker": TICKER, "start": start, "end": end})
+            r.raise_for_status()
+            run_body = {"ticker": TICKER, "start_date": start, "end_date": end, "force": True}
+            r = await client.post("/backtests/run", json=run_body)
+            r.raise_for_status()
+            bt_id = r.json()["backtest_id"]
+
+            reads = [("/health", None), ("/backtests", {"limit": 20}), (f"/backtests/{bt_id}/results", None)]
+            latencies: list[float] = []
+            errors = 0
+            runs = 0
+            stop = time.monotonic() + args.duration
+
+            async def reader(i: int):
+                nonlocal errors
+                k = i
+                while time.monotonic() < stop:
+                    path, params = reads[k % len(reads)]
+                    k += 1
+                    t0 = time.perf_counter()
+                    try:
+                        resp = await client.get(path, params=params)
+                    except httpx.TransportError:
+                        errors += 1
+                        continue
+                    latencies.append(time.perf_counter() - t0)
+                    errors += resp.status_code >= 400
+
+            async def runner():
+                nonlocal runs, errors
+                while time.monotonic() < stop:
+                    try:
+                        resp = await client.post("/backtests/run", json=run_body)
+                    except httpx.TransportError:
+                        errors += 1
+                        continue
+                    runs += resp.status_code == 200
+                    errors += resp.status_code >= 400
+
+            t0 = time.monotonic()
+            await asyncio.gather(*(reader(i) for i in range(args.readers)), *(runner() for _ in range(args.runners)))
+            elapsed = time.monotonic() - t0
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+    return {
+        "mode": mode,
+        "reads": len(latencies),
+        "reads_per_s": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else float("nan"),
+        "p95_ms": _percentile(latencies, 0.95) * 1000 if latencies else float("nan"),
+        "max_ms": max(latencies) * 1000 if latencies else float("nan"),
+        "runs_per_s": runs / elapsed,
+        "errors": errors,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--modes", default="sync,async", help="lista separada por vírgula: sync, async")
+    ap.add_argument("--duration", type=float, default=15.0, help="segundos de carga por modo")
+    ap.add_argument("--readers", type=int, default=32, help="clientes concorrentes nas rotas de leitura")
+    ap.add_argument("--runners", type=int, default=4, help="clientes concorrentes em POST /backtests/run")
+    ap.add_argument("--bars", type=int, default=2500, help="barras do ticker sintético")
+    ap.add_argument("--start", default="2000-01-01")
+    ap.add_argument("--end", default="2010-12-31")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--database-url", default=None, help="banco já migrado; padrão = SQLite novo por modo")
+    ap.add_argument("--app-dir", default=ROOT, help="checkout da API a subir (para comparar versões)")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="load_test_") as workdir:
+        synthetic_ohlcv(args.bars).to_csv(os.path.join(workdir, f"{TICKER}.csv"), index=False)
+        results = [asyncio.run(_run_mode(m.strip(), args.port + i, workdir, args))
+                   for i, m in enumerate(args.modes.split(","))]
+
+    print(f"\n{args.readers} leitores, {args.runners} backtests concorrentes, {args.duration:.0f}s por modo\n")
+    print(f"{'modo':6s} {'leituras':>9s} {'leit./s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'máx ms':>8s} "
+          f"{'runs/s':>7s} {'erros':>6s}")
+    for r in results:
+        print(f"{r['mode']:6s} {r['reads']:9d} {r['reads_per_s']:8.1f} {r['p50_ms']:8.1f} {r['p95_ms']:8.1f} "
+              f"{r['max_ms']:8.1f} {r['runs_per_s']:7.2f} {r['errors']:6d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import pytest
+import numpy as np
 import pandas as pd
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -22,9 +23,34 @@ import app.db.models as models  # noqa: F401
 # módulos onde vamos monkeypatchar
 from app.db import session as session_mod
 from app.services import data_service as data_service_mod
+from app.services import backtest_service as backtest_service_mod
+from app.services import backtest_results_service as backtest_results_service_mod
+from app.services import sweep_service as sweep_service_mod
+from app.services import job_service as job_service_mod
+from app.services import export_service as export_service_mod
+from app.services import walkforward_service as walkforward_service_mod
 from app.adapters import market_data as market_mod
 
 
+def make_ohlcv(start: str, periods: int) -> pd.DataFrame:
+    """
+    OHLCV sintético e determinístico (dias úteis) com tendência + ciclo,
+    longo o bastante para as janelas usadas nos testes.
+    """
+    dates = pd.bdate_range(start, periods=periods)
+    i = np.arange(periods)
+    close = 29.0 + 0.02 * i + 1.5 * np.sin(i / 6.0)
+    open_ = close - 0.1 * np.cos(i / 3.0)
+    return pd.DataFrame({
+        "date": dates,
+        "open": open_,
+        "high": np.maximum(open_, close) + 0.3,
+        "low": np.minimum(open_, close) - 0.3,
+        "close": close,
+        "volume": 50_000_000 + 1_000_000 * (i % 7),
+    })
+
+
 @pytest.fixture(scope="session")
 def test_engine():
     """
@@ -69,27 +95,37 @@ def _override_db_dependency(monkeypatch, TestSessionLocal, test_engine):
     # IMPORTANTE: no data_service foi feito "from app.db.session import get_session_local"
     # então precisamos monkeypatchar lá também:
     monkeypatch.setattr(data_service_mod, "get_session_local", _get_session_local)
+    monkeypatch.setattr(backtest_service_mod, "get_session_local", _get_session_local)
+    monkeypatch.setattr(backtest_results_service_mod, "get_session_local", _get_session_local)
+    monkeypatch.setattr(sweep_service_mod, "get_session_local", _get_session_local)
+    monkeypatch.setattr(job_service_mod, "get_session_local", _get_session_local)
+    monkeypatch.setattr(export_service_mod, "get_session_local", _get_session_local)
+    monkeypatch.setattr(walkforward_service_mod, "get_session_local", _get_session_local)
+    # rotas async (run_read/ping_db) usam o engine síncrono de teste numa thread;
+    # o caminho com engine async tem teste próprio (test_async_db.py)
+    monkeypatch.setattr(session_mod, "get_async_engine", lambda: None)
+    monkeypatch.setattr(session_mod, "get_async_session_local", lambda: None)
 
 
 @pytest.fixture(autouse=True)
 def _mock_market_data(monkeypatch):
     """
-    Mock do yfinance: retorna um pequeno OHLCV consistente para não depender de internet.
+    Mock do yfinance: retorna OHLCV sintético (make_ohlcv) para não depender de internet.
     """
     def fake_fetch_ohlcv_yf(ticker: str, start: str, end: str) -> pd.DataFrame:
-        data = {
-            "date": pd.to_datetime(
-                ["2022-01-03", "2022-01-04", "2022-01-05", "2022-01-06", "2022-01-07"]
-            ),
-            "open":   [28.54, 29.16, 29.19, 28.53, 28.90],
-            "high":   [29.22, 29.40, 29.27, 29.10, 29.35],
-            "low":    [28.53, 28.91, 27.94, 28.05, 28.70],
-            "close":  [29.09, 29.20, 28.07, 28.90, 29.10],
-            "volume": [52704700, 51739200, 78459800, 60000000, 55000000],
-        }
-        return pd.DataFrame(data)
+        df = make_ohlcv("2022-01-03", 120)
+        d = df["date"]
+        return df[(d >= pd.Timestamp(start)) & (d < pd.Timestamp(end))].reset_index(drop=True)
 
     monkeypatch.setattr(market_mod, "fetch_ohlcv_yf", fake_fetch_ohlcv_yf)
+    # data_service faz "from app.adapters.market_data import fetch_ohlcv"
+    monkeypatch.setattr(data_service_mod, "fetch_ohlcv", fake_fetch_ohlcv_yf)
+
+
+@pytest.fixture
+def ohlcv():
+    """Fábrica de OHLCV sintético: ohlcv(start, periods)."""
+    return make_ohlcv
 
 
 @pytest.fixture
@@ -0,0 +1,111 @@
+import threading
+from datetime import date
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("greenlet")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.api import routes_backtests as routes_backtests_mod
+from app.db import session as session_mod
+from app.db.base import Base
+from app.db.models import Backtest, Trade, DailyPosition
+from app.api.main import app
+from app.services.results_cache import results_cache
+
+
+@pytest.fixture
+def async_db(tmp_path, monkeypatch):
+    """Banco SQLite em arquivo lido pelo aiosqlite; as linhas são gravadas pelo engine síncrono."""
+    path = tmp_path / "async.db"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(sync_engine)
+    with sessionmaker(bind=sync_engine)() as db:
+        bt = Backtest(ticker="ASYNC3.SA", start_date=date(2022, 1, 3), end_date=date(2022, 3, 31),
+                      strategy_type="sma_cross", initial_cash=100_000.0, status="finished",
+                      metrics={"final_value": 101_000.0})
+        db.add(bt)
+        db.flush()
+        db.add(Trade(backtest_id=bt.id, ticker="ASYNC3.SA", date=date(2022, 2, 1), side="BUY", price=10.0, size=100))
+        db.add_all([DailyPosition(backtest_id=bt.id, date=date(2022, 1, d), position=0, cash=100_000.0,
+                                  equity=100_000.0) for d in (3, 4, 5)])
+        db.commit()
+        bt_id = bt.id
+
+    # NullPool: o TestClient roda o app no event loop do portal, sem reaproveitar conexões entre loops
+    engine = create_async_engine(session_mod.async_url(f"sqlite:///{path}"), poolclass=NullPool)
+    calls = []
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    def session_local():
+        calls.append(1)
+        return factory
+
+    monkeypatch.setattr(session_mod, "get_async_engine", lambda: engine)
+    monkeypatch.setattr(session_mod, "get_async_session_local", session_local)
+    results_cache.invalidate(bt_id)
+    yield bt_id, calls
+    results_cache.invalidate(bt_id)
+    sync_engine.dispose()
+
+
+def test_async_url():
+    assert str(session_mod.async_url("postgresql+psycopg2://u:p@h/db")) == "postgresql+asyncpg://u:***@h/db"
+    assert str(session_mod.async_url("sqlite:///x.db")) == "sqlite+aiosqlite:///x.db"
+    with pytest.raises(ValueError):
+        session_mod.async_url("mysql://h/db")
+
+
+def test_reads_through_async_engine(async_db):
+    bt_id, calls = async_db
+    with TestClient(app) as client:
+        assert client.get("/health").json() == {"status": "ok", "db": True}
+
+        listed = client.get("/backtests", params={"ticker": "ASYNC3.SA"}).json()
+        assert [b["id"] for b in listed] == [bt_id]
+        assert listed[0]["metrics"] == {"final_value": 101_000.0}
+
+        r = client.get(f"/backtests/{bt_id}/results")
+        assert r.status_code == 200
+        body = r.json()
+        assert body["trades"][0]["side"] == "BUY" and len(body["daily_positions"]) == 3
+
+        assert client.get("/backtests/999999/results").status_code == 404
+    # as leituras do banco (lista, versão + resultados, versão do 404) passaram pelo AsyncSession
+    assert len(calls) == 4
+
+
+def test_sync_backtest_runs_on_cpu_pool(client, monkeypatch):
+    seen = {}
+
+    def fake_run_backtest(**kwargs):
+        seen["thread"] = threading.current_thread().name
+        seen["offload"] = kwargs["offload"]
+        return {"backtest_id": 1, "metrics": {}}
+
+    monkeypatch.setattr(routes_backtests_mod, "run_backtest", fake_run_backtest)
+    r = client.post("/backtests/run", json={"ticker": "X.SA", "start_date": "2022-01-01",
+                                                          "end_date": "2022-02-01"})
+    assert r.status_code == 200
+    assert seen["thread"].startswith("bt-run") and seen["offload"] is True
+
+
+def test_direct_calls_compute_inline(client, monkeypatch):
+    """Scripts/bench chamam run_backtest direto: nada de pool de processos."""
+    from app.services import backtest_service as backtest_service_mod
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError("pool de processos usado fora da API")
+
+    monkeypatch.setattr(backtest_service_mod, "compute", no_pool)
+    assert client.post("/data/update", json={"ticker": "INLINE3.SA", "start": "2022-01-01",
+                                             "end": "2022-06-30"}).status_code == 200
+    res = backtest_service_mod.run_backtest("INLINE3.SA", date(2022, 1, 1), date(2022, 6, 30), 100_000, 0.0,
+                                            5, 20, 14, 2.0, 0.01, force=True)
+    assert res["backtest_id"] and res["timings"]["engine_s"] > 0
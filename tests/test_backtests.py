@@ -1,3 +1,7 @@
+import pandas as pd
+import pytest
+
+
 def test_run_backtest_and_results(client):
 
     upd = {
@@ -41,3 +45,545 @@ def test_run_backtest_and_results(client):
     assert "trades" in j3
     assert "daily_positions" in j3
     assert "metrics" in j3
+
+
+def test_run_backtest_bulk_persists_full_series(client):
+    upd = {"ticker": "PERSIST.SA", "start": "2022-01-01", "end": "2022-12-31",
+           "sma_fast": 3, "sma_slow": 5, "atr_window": 3}
+    assert client.post("/data/update", json=upd).status_code == 200
+
+    body = {"ticker": "PERSIST.SA", "start_date": "2022-01-01", "end_date": "2022-12-31",
+            "sma_fast": 3, "sma_slow": 5, "atr_window": 3, "commission": 0.0005}
+    j = client.post("/backtests/run", json=body).json()
+    assert j["timings"]["persist_s"] >= 0
+
+    res = client.get(f"/backtests/{j['backtest_id']}/results").json()
+    assert len(res["daily_positions"]) == 120  # uma linha por barra do OHLCV sintético
+    assert len(res["trades"]) == (j["metrics"]["won"] or 0) + (j["metrics"]["lost"] or 0)
+    assert res["daily_positions"][0]["date"] == "2022-01-03"
+
+
+def test_run_backtest_phase_timings_and_profile(client):
+    upd = {"ticker": "PROF.SA", "start": "2022-01-01", "end": "2022-12-31",
+           "sma_fast": 3, "sma_slow": 5, "atr_window": 3}
+    assert client.post("/data/update", json=upd).status_code == 200
+
+    body = {"ticker": "PROF.SA", "start_date": "2022-01-01", "end_date": "2022-12-31",
+            "sma_fast": 3, "sma_slow": 5, "atr_window": 3}
+    j = client.post("/backtests/run", json=body).json()
+    t = j["timings"]
+    for phase in ("load", "setup", "engine", "analyzers", "collect", "persist", "total"):
+        assert t[f"{phase}_s"] >= 0
+    assert t["analyzers_s"] == pytest.approx(sum(v for k, v in t.items() if k.startswith("analyzer_")))
+    assert j.get("profile") is None
+
+    res = client.get(f"/backtests/{j['backtest_id']}/results").json()
+    assert res["timings"] == t
+    assert res["profile"] is None
+
+    # profile=True não reaproveita o backtest idêntico e grava o relatório do cProfile
+    p = client.post("/backtests/run", json=body | {"profile": True}).json()
+    assert not p["reused"] and p["backtest_id"] != j["backtest_id"]
+    assert "cumulative" in p["profile"]
+    assert client.get(f"/backtests/{p['backtest_id']}/results").json()["profile"] == p["profile"]
+
+    stats = client.get("/backtests/timings/stats", params={"strategy_type": "sma_cross", "engine": "backtrader"}).json()
+    assert stats["backtests"] >= 2
+    engine = stats["phases"]["engine"]
+    assert engine["count"] >= 2 and 0 <= engine["p50_s"] <= engine["p95_s"]
+    assert client.get("/backtests/timings/stats", params={"engine": "nenhum"}).json()["backtests"] == 0
+
+
+def test_timing_stats_filters_engine_in_sql(client, TestSessionLocal):
+    """Muitos backtests recentes de outro engine não escondem os do engine pedido."""
+    from datetime import date
+    from app.db.models import Backtest
+    from app.services.backtest_results_service import timing_stats
+
+    def bt(params, engine_s):
+        return Backtest(ticker="TIME3.SA", start_date=date(2022, 1, 3), end_date=date(2022, 3, 31),
+                        strategy_type="timing_probe", initial_cash=1.0, status="finished", params=params,
+                        timings={"engine_s": engine_s, "total_s": engine_s})
+
+    with TestSessionLocal() as db:
+        db.add_all([bt({"engine": "backtrader"}, 2.0), bt({}, 4.0)])  # sem a chave = backtrader
+        db.add_all([bt({"engine": "vectorized"}, 0.01) for _ in range(20)])
+        db.commit()
+
+    got = timing_stats("timing_probe", "backtrader", limit=2)
+    assert got["backtests"] == 2 and got["phases"]["engine"]["mean_s"] == 3.0
+    assert timing_stats("timing_probe", "backtrader", limit=1)["phases"]["engine"]["mean_s"] == 4.0
+    assert timing_stats("timing_probe", "vectorized", limit=5)["backtests"] == 5
+
+
+def test_sweep_grid_persists_each_combination(client):
+    upd = {"ticker": "SWEEP.SA", "start": "2022-01-01", "end": "2022-12-31",
+           "sma_fast": 3, "sma_slow": 5, "atr_window": 3}
+    assert client.post("/data/update", json=upd).status_code == 200
+
+    body = {
+        "ticker": "SWEEP.SA",
+        "start_date": "2022-01-01",
+        "end_date": "2022-12-31",
+        "strategy_type": "sma_cross",
+        "atr_window": 3,
+        "grid": {"sma_fast": [3, 5], "sma_slow": [10, 20], "atr_k": [2.0]},
+        "max_workers": 2,
+    }
+    r = client.post("/backtests/sweep", json=body)
+    assert r.status_code == 200
+    j = r.json()
+    assert j["combinations"] == 4
+    assert {(x["params"]["sma_fast"], x["params"]["sma_slow"]) for x in j["results"]} == {
+        (3, 10), (3, 20), (5, 10), (5, 20)
+    }
+    ids = [x["backtest_id"] for x in j["results"]]
+    assert all(ids) and len(set(ids)) == 4
+
+    listed = client.get("/backtests", params={"ticker": "SWEEP.SA", "limit": 10}).json()
+    assert {b["id"] for b in listed} == set(ids)
+
+    bad = client.post("/backtests/sweep", json=body | {"grid": {"lookback": [10]}})
+    assert bad.status_code == 400
+    assert client.post("/backtests/sweep", json=body | {"mode": "random"}).status_code == 400
+
+    # melhor primeiro: sharpe decrescente, drawdown crescente
+    dd = client.post("/backtests/sweep", json=body | {"sort_by": "max_drawdown_pct"}).json()["results"]
+    vals = [x["metrics"]["max_drawdown_pct"] for x in dd]
+    assert vals == sorted(vals)
+    assert client.post("/backtests/sweep", json=body | {"sort_by": "sharpe"}).status_code == 400
+
+
+def test_sweep_reuses_combinations_across_grids(client):
+    """O hash dos dados de cada combinação não depende das outras combinações da grade."""
+    upd = {"ticker": "OVER.SA", "start": "2022-01-01", "end": "2022-06-30",
+           "indicators": ["sma_10", "sma_20", "sma_30", "sma_50", "wilder_atr_14"]}
+    assert client.post("/data/update", json=upd).status_code == 200
+    body = {"ticker": "OVER.SA", "start_date": "2022-01-01", "end_date": "2022-06-30",
+            "sma_slow": 50, "max_workers": 1, "persist_details": True}
+
+    a = client.post("/backtests/sweep", json=body | {"grid": {"sma_fast": [10, 20]}}).json()["results"]
+    b = client.post("/backtests/sweep", json=body | {"grid": {"sma_fast": [20, 30]}}).json()["results"]
+    first = {x["params"]["sma_fast"]: x for x in a}
+    second = {x["params"]["sma_fast"]: x for x in b}
+    assert second[20].get("reused") is True
+    assert second[20]["backtest_id"] == first[20]["backtest_id"]
+    assert not second[30].get("reused")
+
+    # mesma combinação pelo /run: mesma impressão digital
+    run = client.post("/backtests/run", json={"ticker": "OVER.SA", "start_date": "2022-01-01",
+                                              "end_date": "2022-06-30", "sma_fast": 10, "sma_slow": 50}).json()
+    assert run["reused"] and run["backtest_id"] == first[10]["backtest_id"]
+
+
+def test_expand_grid_random_samples_without_building_product():
+    import itertools
+    from app.services.sweep_service import expand_grid, MAX_COMBINATIONS
+
+    grid = {"a": [1, 2, 3], "b": ["x", "y"], "c": [0.5, 1.0, 1.5, 2.0]}
+    full = expand_grid(grid)
+    assert full == [dict(zip("abc", v)) for v in itertools.product(*grid.values())]
+
+    sample = expand_grid(grid, "random", n_samples=5, seed=7)
+    assert len(sample) == 5 and all(c in full for c in sample)
+    assert len({tuple(c.values()) for c in sample}) == 5
+    assert sample == expand_grid(grid, "random", n_samples=5, seed=7)
+    assert expand_grid(grid, "random", n_samples=100) == full
+
+    # 10^12 combinações: a amostra sai sem montar o produto; a grade inteira é recusada antes
+    huge = {k: list(range(100)) for k in "abcdef"}
+    assert len(expand_grid(huge, "random", n_samples=10, seed=1)) == 10
+    with pytest.raises(ValueError, match="máx"):
+        expand_grid(huge)
+    with pytest.raises(ValueError, match="máx"):
+        expand_grid(huge, "random", n_samples=MAX_COMBINATIONS + 1)
+    with pytest.raises(ValueError, match="n_samples"):
+        expand_grid(grid, "random")
+
+
+def test_backtest_job_queue_status_polling(client):
+    from app.services.job_service import job_queue
+
+    assert client.post("/data/update", json={"ticker": "JOBS.SA", "start": "2022-01-01", "end": "2022-06-30"}).status_code == 200
+    body = {
+        "ticker": "JOBS.SA",
+        "start_date": "2022-01-01",
+        "end_date": "2022-06-30",
+        "initial_cash": 100000,
+        "commission": 0.0005,
+        "sma_fast": 5,
+        "sma_slow": 20,
+        "atr_window": 14,
+        "atr_k": 2.0,
+        "risk_perc": 0.01,
+        "strategy_type": "sma_cross",
+    }
+    r = client.post("/backtests/jobs", json=body)
+    assert r.status_code == 202, r.text
+    bt_id = r.json()["backtest_id"]
+    assert r.json()["status"] == "queued"
+    assert job_queue.wait(bt_id, timeout=60)
+
+    st = client.get(f"/backtests/{bt_id}/status").json()
+    assert st["status"] == "finished", st
+    assert st["metrics"]["final_value"] > 0
+
+    # mesmo resultado do endpoint síncrono, gravado na linha criada pelo submit
+    res = client.get(f"/backtests/{bt_id}/results").json()
+    assert len(res["daily_positions"]) == 120
+    sync = client.post("/backtests/run", json=body).json()
+    assert sync["metrics"]["final_value"] == st["metrics"]["final_value"]
+
+    # período sem preços -> failed com mensagem
+    r = client.post("/backtests/jobs", json=body | {"start_date": "2019-01-01", "end_date": "2019-02-01"})
+    bad_id = r.json()["backtest_id"]
+    assert job_queue.wait(bad_id, timeout=60)
+    st = client.get(f"/backtests/{bad_id}/status").json()
+    assert st["status"] == "failed" and "Sem dados" in st["error"]
+
+    listed = client.get("/backtests", params={"status": "failed"}).json()
+    assert bad_id in [b["id"] for b in listed]
+    assert client.get("/backtests/jobs/stats").json()["failed"] >= 1
+    assert client.get("/backtests/999999/status").status_code == 404
+
+
+def test_job_status_write_failure_is_logged(caplog):
+    from app.services.job_service import BacktestJobQueue
+
+    q = BacktestJobQueue(workers=1, use_processes=False)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("banco fora")
+
+    q._set_status = broken
+    with caplog.at_level("ERROR", logger="app.services.job_service"):
+        q._run(42, {})
+    assert q.failed == 1
+    assert "status do job 42" in caplog.text and "banco fora" in caplog.text
+
+
+def _die(*args):
+    import os
+    os._exit(1)  # worker morto no meio do cálculo (OOM, segfault)
+
+
+def _ok(*args):
+    return {"metrics": {}, "timings": {}}
+
+
+def test_job_pool_recovers_from_dead_worker_and_shuts_down(monkeypatch):
+    from concurrent.futures.process import BrokenProcessPool
+    from app.services import job_service as job_service_mod
+
+    q = job_service_mod.BacktestJobQueue(workers=1, use_processes=True)
+    monkeypatch.setattr(job_service_mod, "_execute_timed", _die)
+    with pytest.raises(BrokenProcessPool):
+        q._compute()
+    assert q._procs is None  # descartado: o próximo job sobe um pool novo
+
+    monkeypatch.setattr(job_service_mod, "_execute_timed", _ok)
+    assert q._compute() == {"metrics": {}, "timings": {}}
+    threads, procs = q._pools()
+
+    q.shutdown()
+    assert q._procs is None and q._threads is None
+    with pytest.raises(RuntimeError):
+        procs.submit(_ok)
+    with pytest.raises(RuntimeError):
+        threads.submit(_ok)
+
+
+def test_lifespan_shuts_down_job_queue(monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.api.main import app
+    from app.services.job_service import job_queue
+
+    calls = []
+    monkeypatch.setattr(job_queue, "shutdown", lambda: calls.append(1))
+    with TestClient(app):
+        assert not calls
+    assert calls == [1]
+
+
+def test_job_wait_timeout():
+    from concurrent.futures import Future
+    from app.services.job_service import BacktestJobQueue
+
+    q = BacktestJobQueue(workers=1, use_processes=False)
+    q._futures[7] = Future()
+    assert q.wait(7, timeout=0.01) is False
+    q._futures[7].set_result(None)
+    assert q.wait(7, timeout=0.01) is True
+
+
+def test_results_stream_ndjson(client):
+    import json
+
+    upd = {"ticker": "STREAM.SA", "start": "2022-01-01", "end": "2022-12-31",
+           "sma_fast": 3, "sma_slow": 5, "atr_window": 3}
+    assert client.post("/data/update", json=upd).status_code == 200
+    body = {"ticker": "STREAM.SA", "start_date": "2022-01-01", "end_date": "2022-12-31",
+            "sma_fast": 3, "sma_slow": 5, "atr_window": 3, "commission": 0.0005}
+    bt_id = client.post("/backtests/run", json=body).json()["backtest_id"]
+    full = client.get(f"/backtests/{bt_id}/results").json()
+
+    r = client.get(f"/backtests/{bt_id}/results/stream")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(x) for x in r.text.splitlines()]
+    assert lines[0]["type"] == "backtest" and lines[0]["metrics"] == full["metrics"]
+    assert lines[-1] == {"type": "end", "trades": len(full["trades"]), "daily": 120}
+    daily = [{k: v for k, v in x.items() if k != "type"} for x in lines if x["type"] == "daily"]
+    assert daily == full["daily_positions"]
+
+    r = client.get(f"/backtests/{bt_id}/results/stream", params={
+        "sections": "daily", "fields": "equity", "start": "2022-02-01", "end": "2022-02-28",
+        "limit": 5, "offset": 2,
+    })
+    page = [json.loads(x) for x in r.text.splitlines()][1:-1]
+    feb = [d for d in full["daily_positions"] if "2022-02-01" <= d["date"] <= "2022-02-28"]
+    assert page == [{"type": "daily", "date": d["date"], "equity": d["equity"]} for d in feb[2:7]]
+
+    assert client.get(f"/backtests/{bt_id}/results/stream", params={"fields": "foo"}).status_code == 400
+    assert client.get("/backtests/999999/results/stream").status_code == 404
+
+
+def test_export_results_columnar(client):
+    import io
+    import pandas as pd
+    import pyarrow as pa
+
+    upd = {"ticker": "EXPORT.SA", "start": "2022-01-01", "end": "2022-12-31",
+           "sma_fast": 3, "sma_slow": 5, "atr_window": 3}
+    assert client.post("/data/update", json=upd).status_code == 200
+    body = {"ticker": "EXPORT.SA", "start_date": "2022-01-01", "end_date": "2022-12-31",
+            "sma_fast": 3, "sma_slow": 5, "atr_window": 3, "commission": 0.0005}
+    ids = [client.post("/backtests/run", json=body | {"atr_k": k}).json()["backtest_id"] for k in (1.5, 2.5)]
+    full = client.get(f"/backtests/{ids[0]}/results").json()
+
+    r = client.get(f"/backtests/{ids[0]}/export", params={"format": "parquet"})
+    assert r.status_code == 200 and r.headers["x-row-count"] == "120"
+    df = pd.read_parquet(io.BytesIO(r.content))
+    assert list(df.columns) == ["backtest_id", "date", "position", "cash", "equity"]
+    assert df["equity"].tolist() == [d["equity"] for d in full["daily_positions"]]
+
+    r = client.get("/backtests/export", params={"ids": f"{ids[0]},{ids[1]}", "format": "arrow", "table": "daily"})
+    tbl = pa.ipc.open_stream(r.content).read_all()
+    assert tbl.num_rows == 240 and set(tbl.column("backtest_id").to_pylist()) == set(ids)
+
+    r = client.get("/backtests/export", params={"ids": ",".join(map(str, ids)), "format": "csv", "table": "trades",
+                                                "start": "2022-03-01"})
+    trades = pd.read_csv(io.StringIO(r.text))
+    assert (trades["date"] >= "2022-03-01").all()
+
+    r = client.get("/backtests/export", params={"ids": ",".join(map(str, ids)), "table": "backtests"})
+    meta = pd.read_parquet(io.BytesIO(r.content))
+    assert meta["backtest_id"].tolist() == ids and "final_value" in meta.columns
+
+    assert client.get("/backtests/export", params={"ids": "999999"}).status_code == 400
+    assert client.get(f"/backtests/{ids[0]}/export", params={"format": "xlsx"}).status_code == 400
+
+
+def test_results_etag_and_cache_invalidation(client):
+    from app.services.results_cache import results_cache
+
+    upd = {"ticker": "ETAG.SA", "start": "2022-01-01", "end": "2022-12-31",
+           "sma_fast": 3, "sma_slow": 5, "atr_window": 3}
+    assert client.post("/data/update", json=upd).status_code == 200
+    body = {"ticker": "ETAG.SA", "start_date": "2022-01-01", "end_date": "2022-12-31",
+            "sma_fast": 3, "sma_slow": 5, "atr_window": 3, "commission": 0.0005}
+    bt_id = client.post("/backtests/run", json=body).json()["backtest_id"]
+
+    r1 = client.get(f"/backtests/{bt_id}/results")
+    etag = r1.headers["etag"]
+    hits = results_cache.stats()["hits"]
+    r2 = client.get(f"/backtests/{bt_id}/results")
+    assert r2.content == r1.content and r2.headers["etag"] == etag
+    assert results_cache.stats()["hits"] == hits + 1
+
+    r3 = client.get(f"/backtests/{bt_id}/results", headers={"If-None-Match": f'"x", W/{etag}'})
+    assert r3.status_code == 304 and r3.content == b""
+    assert client.get(f"/backtests/{bt_id}/results", headers={"If-None-Match": '"x"'}).status_code == 200
+
+    assert client.delete(f"/backtests/{bt_id}").status_code == 204
+    assert client.get(f"/backtests/{bt_id}/results").status_code == 404
+    assert client.delete(f"/backtests/{bt_id}").status_code == 404
+
+
+def test_results_cache_revalidates_against_db(client, TestSessionLocal, monkeypatch):
+    """Outro worker apaga o backtest (sem limpar o cache deste processo): a entrada não é servida."""
+    from app.db.models import Backtest
+    from app.services.backtest_service import delete_backtest
+    from app.services.results_cache import results_cache
+
+    upd = {"ticker": "STALE.SA", "start": "2022-01-01", "end": "2022-06-30",
+           "sma_fast": 3, "sma_slow": 5, "atr_window": 3}
+    assert client.post("/data/update", json=upd).status_code == 200
+    body = {"ticker": "STALE.SA", "start_date": "2022-01-01", "end_date": "2022-06-30",
+            "sma_fast": 3, "sma_slow": 5, "atr_window": 3}
+    bt_id = client.post("/backtests/run", json=body).json()["backtest_id"]
+    assert client.get(f"/backtests/{bt_id}/results").status_code == 200
+
+    with TestSessionLocal() as db:
+        bt = db.get(Backtest, bt_id)
+        bt.fingerprint = "regravado-por-outro-worker"
+        db.commit()
+    stale = results_cache.stats()["stale"]
+    assert client.get(f"/backtests/{bt_id}/results").status_code == 200
+    assert results_cache.stats()["stale"] == stale + 1
+
+    # o DELETE do outro worker só limpa o cache dele
+    with monkeypatch.context() as m:
+        m.setattr(results_cache, "invalidate", lambda _id: None)
+        assert delete_backtest(bt_id)
+    assert results_cache.stats()["entries"] and client.get(f"/backtests/{bt_id}/results").status_code == 404
+
+
+
+def test_identical_runs_are_deduplicated(client):
+    upd = {"ticker": "DEDUP.SA", "start": "2022-01-01", "end": "2022-03-31",
+           "sma_fast": 3, "sma_slow": 5, "atr_window": 3}
+    assert client.post("/data/update", json=upd).status_code == 200
+    body = {"ticker": "DEDUP.SA", "start_date": "2022-01-01", "end_date": "2022-12-31",
+            "sma_fast": 3, "sma_slow": 5, "atr_window": 3, "commission": 0.0005}
+
+    a = client.post("/backtests/run", json=body).json()
+    b = client.post("/backtests/run", json=body | {"atr_k": 2}).json()  # 2 == 2.0 (padrão)
+    assert b["backtest_id"] == a["backtest_id"] and b["reused"] is True
+    assert b["metrics"] == a["metrics"]
+
+    forced = client.post("/backtests/run", json=body | {"force": True}).json()
+    assert forced["backtest_id"] != a["backtest_id"] and forced["reused"] is False
+
+    # dados novos no período -> outra impressão digital
+    assert client.post("/data/update", json=upd | {"end": "2022-12-31"}).status_code == 200
+    c = client.post("/backtests/run", json=body).json()
+    assert c["backtest_id"] not in (a["backtest_id"], forced["backtest_id"]) and not c["reused"]
+
+    sweep = {"ticker": "DEDUP.SA", "start_date": "2022-01-01", "end_date": "2022-12-31",
+             "atr_window": 3, "grid": {"sma_fast": [3, 5], "sma_slow": [10]}, "max_workers": 1}
+    first = client.post("/backtests/sweep", json=sweep).json()["results"]
+    again = client.post("/backtests/sweep", json=sweep | {"grid": {"sma_fast": [3, 5, 7], "sma_slow": [10]}}).json()
+    reused = {r["params"]["sma_fast"]: r for r in again["results"]}
+    assert reused[3]["reused"] and reused[5]["reused"] and not reused[7]["reused"]
+    assert {reused[3]["backtest_id"], reused[5]["backtest_id"]} == {r["backtest_id"] for r in first}
+
+
+def test_portfolio_backtest_shares_one_broker(client, ohlcv, test_engine):
+    import pandas as pd
+    import pytest
+    from sqlalchemy import event
+    from app.services.data_service import ensure_symbol, upsert_prices
+    from app.services.backtest_service import _load_panel
+    from datetime import date
+
+    a = ohlcv("2022-01-03", 120)
+    b = ohlcv("2022-02-01", 100)
+    b[["open", "high", "low", "close"]] *= 2
+    b = b.drop(index=[10, 11])  # pregões faltando em B: repetem o fechamento anterior
+    upsert_prices(ensure_symbol("PA.SA"), a)
+    upsert_prices(ensure_symbol("PB.SA"), b)
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(test_engine, "before_cursor_execute", listener)
+    try:
+        frames = _load_panel(["PA.SA", "PB.SA"], date(2022, 1, 1), date(2022, 12, 31))
+    finally:
+        event.remove(test_engine, "before_cursor_execute", listener)
+    assert len(statements) == 3  # symbols, prices e indicators, cada um com IN (...)
+    assert frames["PA.SA"].index.equals(frames["PB.SA"].index)
+    assert frames["PA.SA"].index[0] == pd.Timestamp("2022-02-01")
+    gap = b["date"].iloc[9]
+    assert frames["PB.SA"].shift(-1).loc[gap, "close"] == frames["PB.SA"].loc[gap, "close"]
+
+    body = {"tickers": ["PA.SA", "PB.SA"], "start_date": "2022-01-01", "end_date": "2022-12-31",
+            "sma_fast": 3, "sma_slow": 5, "atr_window": 3, "commission": 0.0005}
+    r = client.post("/backtests/portfolio", json=body)
+    assert r.status_code == 200, r.text
+    j = r.json()
+    assert set(j["per_symbol"]) == {"PA.SA", "PB.SA"}
+
+    res = client.get(f"/backtests/{j['backtest_id']}/results").json()
+    assert res["ticker"] == "PORTFOLIO"
+    assert {t["ticker"] for t in res["trades"]} == {"PA.SA", "PB.SA"}
+    assert res["daily_positions"][-1]["equity"] == pytest.approx(j["metrics"]["final_value"])
+    # position da carteira = tickers com posição aberta, não ações somadas entre ativos
+    assert {d["position"] for d in res["daily_positions"]} <= {0, 1, 2}
+    assert any(d["position"] for d in res["daily_positions"])
+    assert sum(s["trades"] for s in j["per_symbol"].values()) == len(res["trades"])
+
+    again = client.post("/backtests/portfolio", json=body).json()
+    assert again["reused"] and again["backtest_id"] == j["backtest_id"] and again["per_symbol"] == j["per_symbol"]
+
+    # carteira de um ativo == backtest simples
+    one = client.post("/backtests/portfolio", json=body | {"tickers": ["PA.SA"]}).json()
+    single = client.post("/backtests/run", json={k: v for k, v in body.items() if k != "tickers"} | {"ticker": "PA.SA"}).json()
+    assert one["metrics"]["final_value"] == pytest.approx(single["metrics"]["final_value"], rel=1e-12)
+
+    bad = client.post("/backtests/portfolio", json=body | {"tickers": ["PA.SA", "NOPE.SA"]})
+    assert bad.status_code == 400 and "NOPE.SA" in bad.json()["detail"]
+
+
+def test_walk_forward_stitches_test_windows(client):
+    upd = {"ticker": "WF.SA", "start": "2022-01-01", "end": "2022-12-31",
+           "sma_fast": 3, "sma_slow": 5, "atr_window": 3}
+    assert client.post("/data/update", json=upd).status_code == 200
+    body = {"ticker": "WF.SA", "start_date": "2022-01-01", "end_date": "2022-12-31",
+            "atr_window": 3, "commission": 0.0005, "strategy_type": "sma_cross",
+            "grid": {"sma_fast": [3, 5], "sma_slow": [10, 15]},
+            "train_bars": 60, "test_bars": 25, "engine": "vectorized", "max_workers": 2}
+
+    r = client.post("/backtests/walkforward", json=body)
+    assert r.status_code == 200, r.text
+    j = r.json()
+    wins = j["windows"]
+    assert [(w["train_start"], w["test_start"]) for w in wins][0] == ("2022-01-03", "2022-03-28")
+    assert len(wins) == 3 and wins[-1]["test_end"] == "2022-06-17"  # 60 + 25 + 25 + 10 barras
+    assert all(wins[i]["test_end"] < wins[i + 1]["test_start"] for i in range(len(wins) - 1))
+    assert all({"sma_fast", "sma_slow"} <= set(w["params"]) for w in wins)
+
+    res = client.get(f"/backtests/{j['backtest_id']}/results").json()
+    assert len(res["daily_positions"]) == 60
+    assert res["daily_positions"][0]["date"] == "2022-03-28"
+    assert res["daily_positions"][-1]["equity"] == pytest.approx(j["metrics"]["final_value"])
+    assert client.get(f"/backtests/{j['backtest_id']}/windows").json() == wins
+
+    # as janelas escaladas continuam coerentes: equity = caixa + posição × fechamento
+    from datetime import date
+    from app.services.backtest_service import _load_df
+    close = _load_df("WF.SA", date(2022, 1, 1), date(2022, 12, 31), [])["close"]
+    for row in res["daily_positions"]:
+        px = close[pd.Timestamp(row["date"])]
+        assert row["equity"] == pytest.approx(row["cash"] + row["position"] * px, rel=1e-9)
+    assert any(row["position"] for row in res["daily_positions"][25:])  # há posição depois da 1ª janela
+
+    # pool com memória compartilhada == execução na própria thread
+    inline = client.post("/backtests/walkforward", json=body | {"max_workers": 1, "force": True}).json()
+    assert inline["metrics"] == pytest.approx(j["metrics"])
+    assert client.post("/backtests/walkforward", json=body).json()["reused"] is True
+    bt = client.post("/backtests/walkforward", json=body | {"engine": "backtrader"}).json()
+    assert bt["metrics"]["final_value"] == pytest.approx(j["metrics"]["final_value"], rel=1e-9)
+
+    bad = client.post("/backtests/walkforward", json=body | {"train_bars": 500})
+    assert bad.status_code == 400
+
+
+def test_backtest_loads_only_indicators_it_reads(client):
+    from datetime import date
+    from app.services.backtest_service import _load_df
+
+    upd = {"ticker": "ONLY.SA", "start": "2022-01-01", "end": "2022-12-31", "sma_fast": 3, "sma_slow": 5,
+           "atr_window": 3}
+    assert client.post("/data/update", json=upd | {"indicators": ["ema_4", "rsi_6"]}).status_code == 200
+    df = _load_df("ONLY.SA", date(2022, 1, 1), date(2022, 12, 31), ["sma_3", "sma_5", "wilder_atr_3"])
+    assert list(df.columns) == ["open", "high", "low", "close", "volume", "sma_3", "sma_5"]
+    assert {"ema_4", "rsi_6", "atr_3"} <= set(_load_df("ONLY.SA", date(2022, 1, 1), date(2022, 12, 31)).columns)
+
+    body = {"ticker": "ONLY.SA", "start_date": "2022-01-01", "end_date": "2022-12-31",
+            "sma_fast": 3, "sma_slow": 5, "atr_window": 3}
+    a = client.post("/backtests/run", json=body).json()
+    # gravar mais indicadores (catálogo maior) não muda o que o backtest lê nem a impressão digital
+    assert client.post("/data/update", json=upd | {"indicators": ["ema_9", "sma_30"]}).status_code == 200
+    b = client.post("/backtests/run", json=body).json()
+    assert b["reused"] and b["backtest_id"] == a["backtest_id"]
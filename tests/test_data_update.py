@@ -14,3 +14,119 @@ def test_data_update_minimal(client):
     assert j["inserted_prices"] > 0
     assert j["inserted_indicators"] > 0
     assert j["symbol_id"] >= 1
+
+
+def test_upsert_prices_bulk_batches_and_updates(TestSessionLocal, ohlcv):
+    from sqlalchemy import select, func
+    from app.db.models import Price
+    from app.services.data_service import ensure_symbol, upsert_prices
+
+    sid = ensure_symbol("BULK1.SA")
+    df = ohlcv("2021-01-04", 50)
+    assert upsert_prices(sid, df, batch_size=7) == 50
+
+    # reenvio com close alterado: atualiza em vez de duplicar
+    df["close"] = df["close"] + 1.0
+    assert upsert_prices(sid, df, batch_size=1000) == 50
+
+    with TestSessionLocal() as db:
+        n = db.execute(select(func.count()).select_from(Price).where(Price.symbol_id == sid)).scalar_one()
+        last = db.execute(
+            select(Price.close).where(Price.symbol_id == sid).order_by(Price.date.desc()).limit(1)
+        ).scalar_one()
+    assert n == 50
+    assert abs(last - float(df["close"].iloc[-1])) < 1e-9
+
+
+def test_upsert_indicator_frame_merges_changed_values(TestSessionLocal):
+    import pandas as pd
+    from sqlalchemy import select
+    from app.db.models import Indicator
+    from app.services.data_service import ensure_symbol, upsert_indicator_frame
+
+    sid = ensure_symbol("IND1.SA")
+    idx = pd.bdate_range("2022-01-03", periods=4)
+    ind = pd.DataFrame({"sma_2": [None, 1.0, 2.0, 3.0], "atr_2": [None, 0.5, 0.5, 0.5]}, index=idx)
+    assert upsert_indicator_frame(sid, ind) == 6
+
+    ind.loc[idx[-1], "sma_2"] = 9.0
+    assert upsert_indicator_frame(sid, ind, batch_size=2) == 6
+
+    with TestSessionLocal() as db:
+        rows = db.execute(
+            select(Indicator.name, Indicator.value)
+            .where(Indicator.symbol_id == sid)
+            .order_by(Indicator.name, Indicator.date)
+        ).all()
+    assert len(rows) == 6
+    assert [v for n, v in rows if n == "sma_2"] == [1.0, 2.0, 9.0]
+
+
+def test_data_update_incremental_fetches_only_tail(client, TestSessionLocal):
+    from sqlalchemy import select
+    from app.db.models import Indicator
+
+    base = {"ticker": "INCR3.SA", "sma_fast": 3, "sma_slow": 5, "atr_window": 3}
+    r = client.post("/data/update", json=base | {"start": "2022-01-01", "end": "2022-02-01"})
+    assert r.status_code == 200
+
+    r = client.post("/data/update", json=base | {"start": "2022-01-01", "end": "2022-03-01", "incremental": True})
+    j = r.json()
+    assert r.status_code == 200
+    assert j["inserted_prices"] == 20  # só os dias úteis de fevereiro
+    # 3 indicadores por barra nova, todos já aquecidos pelo histórico gravado
+    assert j["inserted_indicators"] == 3 * j["inserted_prices"]
+
+    r = client.post("/data/update", json=base | {"start": "2022-01-01", "end": "2022-03-01", "incremental": True})
+    assert r.json()["inserted_prices"] == 0
+
+    # valores incrementais == recálculo completo
+    with TestSessionLocal() as db:
+        inc = dict(db.execute(
+            select(Indicator.date, Indicator.value)
+            .where(Indicator.symbol_id == j["symbol_id"], Indicator.name == "atr_3")
+        ).all())
+    r = client.post("/data/update", json=base | {"ticker": "FULL3.SA", "start": "2022-01-01", "end": "2022-03-01"})
+    with TestSessionLocal() as db:
+        full = dict(db.execute(
+            select(Indicator.date, Indicator.value)
+            .where(Indicator.symbol_id == r.json()["symbol_id"], Indicator.name == "atr_3")
+        ).all())
+    assert inc.keys() == full.keys()
+    assert all(abs(inc[d] - full[d]) < 1e-9 for d in full)
+
+
+def test_data_update_batch_reports_per_ticker(client, monkeypatch):
+    from app.services import data_service
+
+    real_fetch = data_service.fetch_ohlcv
+
+    def flaky_fetch(ticker, start, end):
+        if ticker == "FAIL.SA":
+            raise RuntimeError("sem dados")
+        return real_fetch(ticker, start, end)
+
+    monkeypatch.setattr(data_service, "fetch_ohlcv", flaky_fetch)
+
+    body = {
+        "tickers": ["BAT1.SA", "BAT2.SA", "FAIL.SA", "BAT1.SA"],
+        "start": "2022-01-01",
+        "end": "2022-03-01",
+        "sma_fast": 3,
+        "sma_slow": 5,
+        "atr_window": 3,
+        "max_workers": 3,
+    }
+    r = client.post("/data/update/batch", json=body)
+    assert r.status_code == 200
+    j = r.json()
+    assert [x["ticker"] for x in j["results"]] == ["BAT1.SA", "BAT2.SA", "FAIL.SA"]
+    assert j["ok"] == 2 and j["failed"] == 1
+
+    by = {x["ticker"]: x for x in j["results"]}
+    assert by["BAT1.SA"]["inserted_prices"] > 0 and by["BAT1.SA"]["error"] is None
+    assert by["FAIL.SA"]["error"] == "sem dados"
+    # o símbolo foi criado antes do download falhar: o id vem no resultado
+    from app.services.data_service import ensure_symbol
+    assert by["FAIL.SA"]["symbol_id"] == ensure_symbol("FAIL.SA")
+    assert all(x["elapsed_s"] >= 0 for x in j["results"])
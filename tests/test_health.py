@@ -4,3 +4,16 @@ def test_health_ok(client):
     j = r.json()
     assert j["status"] == "ok"
     assert isinstance(j["db"], bool)
+
+
+def test_health_logs_db_failure(client, monkeypatch, caplog):
+    from app.db import session as session_mod
+
+    def broken():
+        raise RuntimeError("banco fora")
+
+    monkeypatch.setattr(session_mod, "get_engine", broken)
+    with caplog.at_level("ERROR", logger="app.db.session"):
+        j = client.get("/health").json()
+    assert j["db"] is False
+    assert "Health check" in caplog.text and "banco fora" in caplog.text
@@ -0,0 +1,71 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app.core import indicators as ind
+from app.services.indicator_catalog import expand, indicator_catalog
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    path = tmp_path / "indicators.json"
+    monkeypatch.setattr(indicator_catalog, "path", path)
+    monkeypatch.setattr(indicator_catalog, "_mtime", None)
+
+    def write(raw: dict, mtime: float):
+        path.write_text(json.dumps(raw))
+        os.utime(path, (mtime, mtime))  # o catálogo relê pelo mtime
+    return write
+
+
+def test_expand_specs():
+    assert expand("rsi_14") == ["rsi_14"]
+    assert expand("sma_10:50:10") == ["sma_10", "sma_20", "sma_30", "sma_40", "sma_50"]
+    assert expand("bb_upper_5:7") == ["bb_upper_5", "bb_upper_6", "bb_upper_7"]
+    for bad in ("sma_10:5", "sma_10:x", "sma_10:20:0", "foo_3", "sma_1:2:3:4"):
+        with pytest.raises(ValueError):
+            expand(bad)
+
+
+def test_catalog_materialized_on_ingest_and_read_as_matrix(client, catalog, ohlcv):
+    catalog({"global": ["sma_10:50:10"], "symbols": {"CAT3.SA": ["rsi_14"]}}, 1_000)
+    assert client.get("/data/catalog").json()["symbols"] == {"CAT3.SA": ["rsi_14"]}
+
+    upd = {"ticker": "CAT3.SA", "start": "2022-01-01", "end": "2022-12-31", "sma_fast": 5, "sma_slow": 10,
+           "atr_window": 5}
+    assert client.post("/data/update", json=upd).status_code == 200
+
+    r = client.get("/data/indicators/CAT3.SA", params={"start": "2022-03-01", "end": "2022-03-31"})
+    assert r.status_code == 200
+    m = r.json()
+    assert m["columns"] == ["atr_5", "rsi_14", "sma_10", "sma_20", "sma_30", "sma_40", "sma_5", "sma_50"]
+    assert m["dates"][0] == "2022-03-01" and len(m["dates"]) == 23
+
+    full = ind.compute(ohlcv("2022-01-03", 120).set_index("date"), m["columns"])
+    march = full.loc["2022-03-01":"2022-03-31"]
+    for name in m["columns"]:
+        np.testing.assert_allclose(np.array(m["values"][name], dtype=float), march[name].to_numpy(), rtol=1e-12)
+
+    # sem os indicadores do símbolo em outro ticker; nomes filtrados na ordem pedida
+    client.post("/data/update", json=upd | {"ticker": "CAT4.SA"})
+    m4 = client.get("/data/indicators/CAT4.SA", params={"names": "sma_50,rsi_14,sma_20"}).json()
+    assert m4["columns"] == ["sma_50", "rsi_14", "sma_20"]
+    assert all(v is None for v in m4["values"]["rsi_14"])
+    # as datas começam no primeiro valor gravado de qualquer coluna pedida (sma_20, barra 19)
+    assert m4["dates"][0] == str(ohlcv("2022-01-03", 120)["date"].iloc[19].date())
+    assert m4["values"]["sma_50"][:30] == [None] * 30 and m4["values"]["sma_50"][30] is not None
+
+    # catálogo ganha ema_5:7 -> backfill do histórico já gravado
+    catalog({"global": ["sma_10:50:10", "ema_5:7"], "symbols": {}}, 2_000)
+    r = client.post("/data/indicators/materialize", json={"ticker": "CAT4.SA"})
+    assert r.status_code == 200
+    assert r.json()["names"] == ["sma_10", "sma_20", "sma_30", "sma_40", "sma_50", "ema_5", "ema_6", "ema_7"]
+    assert r.json()["bars"] == 120
+    m4 = client.get("/data/indicators/CAT4.SA", params={"names": "ema_6"}).json()
+    np.testing.assert_allclose(m4["values"]["ema_6"], ind.ema(ohlcv("2022-01-03", 120)["close"], 6)[5:], rtol=1e-12)
+
+    assert client.get("/data/indicators/NOPE.SA").status_code == 404
+    r = client.post("/data/indicators/materialize", json={"ticker": "NOPE.SA", "names": ["sma_5"]})
+    assert r.status_code == 400
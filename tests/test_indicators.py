@@ -0,0 +1,110 @@
+import backtrader as bt
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core import indicators as ind
+
+
+def _random_walk(n=600, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 50 * np.exp(np.cumsum(rng.normal(0, 0.015, n)))
+    open_ = close * (1 + rng.normal(0, 0.003, n))
+    return pd.DataFrame({
+        "open": open_,
+        "high": np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, n)),
+        "low": np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, n)),
+        "close": close,
+        "volume": 1e6,
+    }, index=pd.bdate_range("2015-01-02", periods=n, name="date"))
+
+
+def test_rolling_indicators_match_pandas():
+    df = _random_walk()
+    c = df["close"]
+    prev = c.shift(1)
+    tr = pd.concat([df["high"] - df["low"], (df["high"] - prev).abs(), (df["low"] - prev).abs()], axis=1).max(axis=1)
+
+    pd.testing.assert_series_equal(ind.sma(c, 20), c.rolling(20).mean(), check_names=False, rtol=1e-10)
+    pd.testing.assert_series_equal(ind.atr(df, 14), tr.rolling(14).mean(), check_names=False, rtol=1e-10)
+    pd.testing.assert_series_equal(ind.donchian_high(df["high"], 20), df["high"].rolling(20).max(), check_names=False)
+    pd.testing.assert_series_equal(ind.donchian_low(df["low"], 7), df["low"].rolling(7).min(), check_names=False)
+    pd.testing.assert_series_equal(ind.momentum(c, 60), c / c.shift(60) - 1, check_names=False)
+    pd.testing.assert_series_equal(ind.volatility(c, 20), c.pct_change().rolling(20).std(), check_names=False,
+                                   rtol=1e-8)
+
+    many = ind.sma_many(c, [5, 20, 700])
+    assert list(many.columns) == ["sma_5", "sma_20", "sma_700"]
+    np.testing.assert_allclose(many["sma_5"], c.rolling(5).mean(), rtol=1e-10)
+    assert many["sma_700"].isna().all()
+
+    # NaN dentro da janela anula o valor, como rolling(min_periods=window)
+    gap = c.copy()
+    gap.iloc[100] = np.nan
+    pd.testing.assert_series_equal(ind.sma(gap, 10), gap.rolling(10).mean(), check_names=False, rtol=1e-10)
+    assert isinstance(ind.sma(c.to_numpy(), 10), np.ndarray)
+
+
+def test_recursive_indicators_match_backtrader():
+    df = _random_walk()
+
+    class Probe(bt.Strategy):
+        def __init__(self):
+            self.ema = bt.ind.EMA(self.data.close, period=20)
+            self.atr = bt.ind.ATR(self.data, period=14)
+            self.rsi = bt.ind.RSI(self.data.close, period=14)
+            self.bb = bt.ind.BollingerBands(self.data.close, period=20)
+            self.rows = []
+
+        def next(self):
+            self.rows.append((self.ema[0], self.atr[0], self.rsi[0], self.bb.top[0], self.bb.bot[0]))
+
+    cerebro = bt.Cerebro()
+    cerebro.adddata(bt.feeds.PandasData(dataname=df))
+    cerebro.addstrategy(Probe)
+    rows = np.array(cerebro.run()[0].rows)
+    n = len(rows)
+
+    _, upper, lower = ind.bollinger(df["close"], 20)
+    ours = [ind.ema(df["close"], 20), ind.wilder_atr(df, 14), ind.rsi(df["close"], 14), upper, lower]
+    for i, series in enumerate(ours):
+        np.testing.assert_allclose(series.to_numpy()[-n:], rows[:, i], rtol=1e-9)
+    assert ind.ema(df["close"], 20).first_valid_index() == df.index[19]
+    assert ind.wilder_atr(df, 14).first_valid_index() == df.index[14]
+
+
+def test_compute_by_name():
+    df = _random_walk(200)
+    out = ind.compute(df, ["sma_10", "ema_5", "bb_upper_20", "bb_lower_20", "donchian_high_15", "rsi_14", "sma_10"])
+    assert list(out.columns) == ["sma_10", "ema_5", "bb_upper_20", "bb_lower_20", "donchian_high_15", "rsi_14"]
+    assert out.index.equals(df.index)
+    np.testing.assert_allclose(out["sma_10"], ind.sma(df["close"], 10), rtol=0)
+    assert (out["bb_upper_20"].dropna() > out["bb_lower_20"].dropna()).all()
+
+    assert ind.parse_name("wilder_atr_14") == ("wilder_atr", 14)
+    assert ind.warmup("atr_14") == 15 and ind.warmup("ema_20") is None
+    for bad in ("macd_12", "sma_0", "sma", "sma_x"):
+        with pytest.raises(ValueError):
+            ind.parse_name(bad)
+
+
+def test_update_with_named_indicators_incremental_matches_full(client, ohlcv):
+    from datetime import date
+    from app.services.backtest_service import _load_df
+
+    base = {"ticker": "NAMED3.SA", "start": "2022-01-01", "end": "2022-04-01",
+            "sma_fast": 5, "sma_slow": 10, "atr_window": 5, "indicators": ["ema_10", "rsi_14", "mom_20"]}
+    assert client.post("/data/update", json=base).status_code == 200
+    r = client.post("/data/update", json=base | {"end": "2022-07-01", "incremental": True})
+    assert r.status_code == 200 and r.json()["inserted_prices"] > 0
+
+    df = _load_df("NAMED3.SA", date(2022, 1, 1), date(2022, 7, 1))
+    full = ind.compute(ohlcv("2022-01-03", 120).set_index("date"), ["ema_10", "rsi_14", "mom_20"])
+    for name in ("ema_10", "rsi_14", "mom_20"):
+        np.testing.assert_allclose(df[name].to_numpy(), full[name].reindex(df.index).to_numpy(), rtol=1e-12)
+
+    r = client.post("/data/update", json=base | {"indicators": ["macd_12"]})
+    assert r.status_code == 400 and "macd_12" in r.json()["detail"]
+    r = client.post("/data/update/batch", json={"tickers": ["NAMED3.SA"], "start": "2022-01-01",
+                                                "end": "2022-02-01", "indicators": ["rsi"]})
+    assert r.status_code == 400
@@ -0,0 +1,112 @@
+import backtrader as bt
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.adapters.market_data import FileAdapter
+from app.core.timeframes import can_resample, resample_ohlcv
+from app.services import data_service as data_service_mod
+from app.services.backtest_service import make_feed
+from app.services.intraday_store import IntradayStore, intraday_store
+
+
+def make_intraday(start: str, days: int, minutes: int = 420) -> pd.DataFrame:
+    """Barras de 1 minuto, pregão das 13:00 às 20:00 UTC em dias úteis, com tendência + ciclo."""
+    ts = pd.DatetimeIndex(np.concatenate([
+        pd.date_range(d + pd.Timedelta(hours=13), periods=minutes, freq="1min").to_numpy()
+        for d in pd.bdate_range(start, periods=days)
+    ]))
+    i = np.arange(len(ts))
+    close = 30.0 + 0.002 * i + 0.8 * np.sin(i / 40.0)
+    open_ = close - 0.01 * np.cos(i / 7.0)
+    return pd.DataFrame({
+        "ts": ts,
+        "open": open_,
+        "high": np.maximum(open_, close) + 0.02,
+        "low": np.minimum(open_, close) - 0.02,
+        "close": close,
+        "volume": 1000.0 + (i % 13),
+    })
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(intraday_store, "root", tmp_path / "intraday")
+    return intraday_store
+
+
+def test_store_partitions_by_month_and_merges(tmp_path):
+    s = IntradayStore(tmp_path)
+    bars = make_intraday("2024-01-30", 4, minutes=3)  # 30/01, 31/01, 01/02, 02/02
+    assert s.write("PETR4.SA", "1m", bars) == 12
+    assert s.stats()["1m"]["PETR4.SA"]["months"] == ["2024-01", "2024-02"]
+
+    # regravar substitui a barra de mesmo timestamp
+    fix = bars.iloc[[4]].assign(close=99.0)
+    s.write("PETR4.SA", "1m", fix)
+    got = s.read("PETR4.SA", "1m", "2024-01-31", "2024-02-02")
+    assert len(got) == 6 and got.index.is_monotonic_increasing
+    assert got.loc[fix["ts"].iloc[0], "close"] == 99.0
+    assert s.stats()["1m"]["PETR4.SA"]["bars"] == 12
+    assert s.read("PETR4.SA", "5m", "2024-01-01", "2024-03-01").empty
+
+
+def test_resample_and_feed_timeframe():
+    df = make_intraday("2024-01-02", 2).set_index("ts")
+    five = resample_ohlcv(df, "5m")
+    assert len(five) == 2 * 84
+    first = df.iloc[:5]
+    assert five.iloc[0].tolist() == [first["open"].iloc[0], first["high"].max(), first["low"].min(),
+                                     first["close"].iloc[-1], first["volume"].sum()]
+    daily = resample_ohlcv(df, "1d")
+    assert list(daily.index) == [pd.Timestamp("2024-01-02"), pd.Timestamp("2024-01-03")]
+
+    assert can_resample("1m", "15m") and can_resample("5m", "1d") and not can_resample("15m", "5m")
+    feed = make_feed(five, "5m")
+    assert (feed.p.timeframe, feed.p.compression) == (bt.TimeFrame.Minutes, 5)
+    assert make_feed(daily).p.timeframe == bt.TimeFrame.Days
+
+
+def test_file_adapter_intraday(tmp_path):
+    (tmp_path / "5m").mkdir()
+    bars = make_intraday("2024-01-02", 2, minutes=5)
+    bars.assign(ts=bars["ts"].dt.tz_localize("UTC").dt.tz_convert("America/Sao_Paulo")).rename(
+        columns={"ts": "Datetime"}).to_csv(tmp_path / "5m" / "VALE3.SA.csv", index=False)
+    got = FileAdapter(tmp_path).fetch_intraday("VALE3.SA", "2024-01-03", "2024-01-04", "5m")
+    assert list(got.columns) == ["ts", "open", "high", "low", "close", "volume"]
+    assert got["ts"].tolist() == bars["ts"].iloc[5:].tolist()  # volta para UTC sem fuso
+
+
+def test_intraday_update_and_backtest(client, store, monkeypatch):
+    bars = make_intraday("2024-03-04", 10)
+    monkeypatch.setattr(data_service_mod, "fetch_intraday",
+                        lambda ticker, start, end, interval: bars[(bars["ts"] >= start) & (bars["ts"] < end)])
+
+    r = client.post("/data/intraday/update",
+                    json={"ticker": "MIN3.SA", "start": "2024-03-01", "end": "2024-03-31", "interval": "1m"})
+    assert r.status_code == 200
+    assert r.json()["bars"] == len(bars)
+    assert client.get("/data/intraday/stats").json()["1m"]["MIN3.SA"]["bars"] == len(bars)
+
+    body = {"ticker": "MIN3.SA", "start_date": "2024-03-01", "end_date": "2024-03-31",
+            "sma_fast": 5, "sma_slow": 20, "atr_window": 14, "risk_perc": 0.001,
+            "interval": "1m", "timeframe": "5m"}
+    runs = {}
+    for engine in ("backtrader", "vectorized"):
+        r = client.post("/backtests/run", json=body | {"engine": engine})
+        assert r.status_code == 200, r.text
+        runs[engine] = r.json()
+    ref, vec = runs["backtrader"]["metrics"], runs["vectorized"]["metrics"]
+    assert ref["total_trades"] > 0
+    assert vec["total_trades"] == ref["total_trades"]
+    assert vec["final_value"] == pytest.approx(ref["final_value"], rel=1e-9)
+
+    res = client.get(f"/backtests/{runs['backtrader']['backtest_id']}/results").json()
+    days = [d.date().isoformat() for d in pd.bdate_range("2024-03-04", periods=10)]
+    assert [d["date"] for d in res["daily_positions"]] == days  # uma linha por dia, não por barra
+
+    # intervalo não armazenado e reamostragem para intervalo menor
+    r = client.post("/backtests/run", json=body | {"interval": "5m", "timeframe": None})
+    assert r.status_code == 400 and "intraday/update" in r.json()["detail"]
+    r = client.post("/backtests/run", json=body | {"timeframe": "1m", "interval": "5m"})
+    assert r.status_code == 400
@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+from app.adapters.market_data import CachedAdapter, FileAdapter, MarketDataAdapter, UnsupportedDataError
+
+
+class CountingAdapter(MarketDataAdapter):
+    def __init__(self, inner):
+        self.inner = inner
+        self.calls = []
+
+    def fetch(self, ticker, start, end):
+        self.calls.append((start, end))
+        return self.inner.fetch(ticker, start, end)
+
+
+def test_file_adapter_reads_csv_range(tmp_path, ohlcv):
+    ohlcv("2022-01-03", 30).to_csv(tmp_path / "LOCAL3.SA.csv", index=False)
+
+    df = FileAdapter(tmp_path).fetch("LOCAL3.SA", "2022-01-10", "2022-01-17")
+    assert list(df.columns) == ["date", "open", "high", "low", "close", "volume"]
+    assert [d.isoformat() for d in df["date"]] == [
+        "2022-01-10", "2022-01-11", "2022-01-12", "2022-01-13", "2022-01-14",
+    ]
+    assert FileAdapter(tmp_path).fetch("NOPE", "2022-01-01", "2023-01-01").empty
+
+
+def test_cached_adapter_fetches_only_missing_segments(tmp_path, ohlcv):
+    ohlcv("2022-01-03", 60).to_csv(tmp_path / "CACHE3.SA.csv", index=False)
+    src = CountingAdapter(FileAdapter(tmp_path))
+    cache = CachedAdapter(src, tmp_path / "cache")
+
+    a = cache.fetch("CACHE3.SA", "2022-01-10", "2022-02-01")
+    assert src.calls == [("2022-01-10", "2022-02-01")]
+
+    # repetição: só cache
+    assert cache.fetch("CACHE3.SA", "2022-01-10", "2022-02-01").equals(a)
+    assert len(src.calls) == 1
+
+    # sobreposição: busca só as duas pontas
+    b = cache.fetch("CACHE3.SA", "2022-01-03", "2022-02-15")
+    assert src.calls[1:] == [("2022-01-03", "2022-01-10"), ("2022-02-01", "2022-02-15")]
+
+    direct = FileAdapter(tmp_path).fetch("CACHE3.SA", "2022-01-03", "2022-02-15")
+    pd.testing.assert_frame_equal(b, direct, check_dtype=False)
+
+
+def test_adapter_interface(tmp_path, client, monkeypatch):
+    with pytest.raises(TypeError):
+        MarketDataAdapter()  # fetch é abstrato
+
+    # adapter sem intraday: erro próprio (ValueError), que a rota devolve como 400
+    src = CountingAdapter(FileAdapter(tmp_path))
+    with pytest.raises(UnsupportedDataError, match="intraday"):
+        src.fetch_intraday("X.SA", "2024-01-02", "2024-01-03", "1m")
+
+    from app.adapters import market_data as market_data_mod
+    monkeypatch.setattr(market_data_mod, "get_adapter", lambda: src)
+    r = client.post("/data/intraday/update",
+                    json={"ticker": "X.SA", "start": "2024-01-02", "end": "2024-01-03", "interval": "1m"})
+    assert r.status_code == 400 and "intraday" in r.json()["detail"]
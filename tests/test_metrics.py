@@ -0,0 +1,84 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+
+from app.core.metrics import (
+    _Metric, Histogram, INGEST_ROWS, BACKTEST_SECONDS, DB_POOL_IN_USE, DB_POOL_CHECKOUTS, DB_POOL_CHECKOUT_WAIT,
+)
+from app.db.session import timed_pool_class, instrument_engine
+
+
+def _sample(body: str, prefix: str) -> float:
+    for line in body.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"série ausente: {prefix}")
+
+
+def test_histogram_text_format():
+    h = Histogram("t_seconds", "teste", ("route",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.1, 0.5, 3.0):
+        h.observe(v, route='/a"b')
+    lines = h.render().splitlines()
+    assert lines[:2] == ["# HELP t_seconds teste", "# TYPE t_seconds histogram"]
+    assert lines[2:] == [
+        't_seconds_bucket{route="/a\\"b",le="0.1"} 2',
+        't_seconds_bucket{route="/a\\"b",le="1"} 3',
+        't_seconds_bucket{route="/a\\"b",le="+Inf"} 4',
+        't_seconds_sum{route="/a\\"b"} 3.65',
+        't_seconds_count{route="/a\\"b"} 4',
+    ]
+
+
+def test_metric_types_must_render_samples():
+    class Incomplete(_Metric):
+        kind = "gauge"
+
+    with pytest.raises(TypeError):
+        Incomplete("x", "sem _samples")
+
+
+def test_metrics_endpoint_reports_requests_ingest_and_backtests(client):
+    rows0 = INGEST_ROWS.value(table="prices")
+    runs0 = BACKTEST_SECONDS.count(kind="run", strategy_type="sma_cross", engine="backtrader")
+
+    upd = {"ticker": "METRICS.SA", "start": "2022-01-01", "end": "2022-12-31",
+           "sma_fast": 3, "sma_slow": 5, "atr_window": 3}
+    assert client.post("/data/update", json=upd).status_code == 200
+    body = {"ticker": "METRICS.SA", "start_date": "2022-01-01", "end_date": "2022-12-31",
+            "sma_fast": 3, "sma_slow": 5, "atr_window": 3}
+    bt_id = client.post("/backtests/run", json=body).json()["backtest_id"]
+    assert client.get(f"/backtests/{bt_id}/results").status_code == 200
+
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    m = r.text
+    # rota pelo template, não pelo caminho com o id
+    assert _sample(m, 'http_request_duration_seconds_count{method="GET",route="/backtests/{bt_id}/results",status="200"}') >= 1
+    assert _sample(m, 'http_request_duration_seconds_count{method="POST",route="/backtests/run",status="200"}') >= 1
+    assert f"/backtests/{bt_id}/results" not in m
+
+    assert INGEST_ROWS.value(table="prices") - rows0 == 120
+    assert _sample(m, 'ingest_rows_total{table="indicators"}') > 0
+    assert _sample(m, 'ingest_last_rows_per_second{table="prices"}') > 0
+    assert BACKTEST_SECONDS.count(kind="run", strategy_type="sma_cross", engine="backtrader") == runs0 + 1
+    assert _sample(m, 'backtest_phase_duration_seconds_count{kind="run",phase="engine"}') >= 1
+
+
+def test_pool_checkout_metrics(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=timed_pool_class(QueuePool))
+    instrument_engine(engine)
+    instrument_engine(engine)  # idempotente: não duplica os eventos
+    in_use0 = DB_POOL_IN_USE.value(db="sqlite")
+    checkouts0 = DB_POOL_CHECKOUTS.value(db="sqlite")
+    waits0 = DB_POOL_CHECKOUT_WAIT.count(db="sqlite")
+
+    with engine.connect() as c1, engine.connect() as c2:
+        c1.execute(text("SELECT 1"))
+        c2.execute(text("SELECT 1"))
+        assert DB_POOL_IN_USE.value(db="sqlite") == in_use0 + 2
+    assert DB_POOL_IN_USE.value(db="sqlite") == in_use0
+    assert DB_POOL_CHECKOUTS.value(db="sqlite") == checkouts0 + 2
+    assert DB_POOL_CHECKOUT_WAIT.count(db="sqlite") == waits0 + 2
+    engine.dispose()
@@ -0,0 +1,87 @@
+from datetime import date
+
+import pandas as pd
+
+from app.services.price_cache import PriceFrameCache, price_cache
+
+
+def _frame(start, n):
+    idx = pd.bdate_range(start, periods=n, name="date")
+    return pd.DataFrame({"close": range(n)}, index=idx, dtype=float)
+
+
+def test_cache_serves_subrange_and_evicts_by_size():
+    df = _frame("2022-01-03", 100)
+    size = int(df.memory_usage(deep=True).sum())
+    cache = PriceFrameCache(max_bytes=int(size * 1.5))
+
+    assert cache.get("A", date(2022, 1, 3), date(2022, 5, 20)) is None
+    cache.put("A", 1, date(2022, 1, 3), date(2022, 5, 20), df)
+
+    sub = cache.get("A", date(2022, 2, 1), date(2022, 2, 28))
+    assert sub.index.min() == pd.Timestamp("2022-02-01")
+    assert sub.index.max() == pd.Timestamp("2022-02-28")
+    assert cache.get("A", date(2021, 12, 1), date(2022, 2, 28)) is None  # fora do superconjunto
+
+    cache.put("B", 2, date(2022, 1, 3), date(2022, 5, 20), df)  # estoura o orçamento -> sai "A"
+    st = cache.stats()
+    assert st["entries"] == 1 and st["evictions"] == 1
+    assert st["hits"] == 1 and st["misses"] == 2
+
+    cache.invalidate_symbol(2)
+    assert cache.stats()["entries"] == 0
+
+
+def test_load_df_cached_and_invalidated_by_upsert(client, ohlcv):
+    from app.services.backtest_service import _load_df
+    from app.services.data_service import ensure_symbol, upsert_prices
+
+    price_cache.clear()
+    sid = ensure_symbol("CACHE6.SA")
+    upsert_prices(sid, ohlcv("2022-01-03", 40))
+
+    a = _load_df("CACHE6.SA", date(2022, 1, 1), date(2022, 3, 31))
+    hits = price_cache.stats()["hits"]
+    b = _load_df("CACHE6.SA", date(2022, 1, 10), date(2022, 1, 31))
+    assert price_cache.stats()["hits"] == hits + 1
+    pd.testing.assert_frame_equal(b, a.loc["2022-01-10":"2022-01-31"])
+
+    upsert_prices(sid, ohlcv("2022-01-03", 60))
+    assert price_cache.stats()["entries"] == 0
+    assert len(_load_df("CACHE6.SA", date(2022, 1, 1), date(2022, 3, 31))) == 60
+
+    r = client.get("/data/cache/stats")
+    assert r.status_code == 200 and r.json()["misses"] >= 2
+
+
+def test_indicator_upsert_refreshes_superset_entries(client, ohlcv, monkeypatch):
+    from app.services import backtest_service
+    from app.services.backtest_service import _load_df
+    from app.services.data_service import ensure_symbol, upsert_prices, upsert_indicator_frame
+
+    price_cache.clear()
+    sid = ensure_symbol("CACHE7.SA")
+    bars = ohlcv("2022-01-03", 40)
+    upsert_prices(sid, bars)
+    d = bars.set_index("date")
+    start, end = date(2022, 1, 1), date(2022, 3, 31)
+
+    assert "sma_7" not in _load_df("CACHE7.SA", start, end).columns  # entrada com todos os gravados
+    upsert_indicator_frame(sid, pd.DataFrame({"sma_7": d["close"].rolling(7).mean()}))
+    assert "sma_7" in _load_df("CACHE7.SA", start, end, ["sma_7"]).columns
+    assert "sma_7" in _load_df("CACHE7.SA", start, end).columns
+
+    # indicador gravado enquanto outro _load_df lia o banco: o frame antigo não entra no cache
+    stored = backtest_service._stored_indicators
+
+    def racing(*args, **kwargs):
+        out = stored(*args, **kwargs)
+        upsert_indicator_frame(sid, pd.DataFrame({"sma_9": d["close"].rolling(9).mean()}))
+        return out
+
+    price_cache.clear()
+    monkeypatch.setattr(backtest_service, "_stored_indicators", racing)
+    assert "sma_9" not in _load_df("CACHE7.SA", start, end).columns
+    monkeypatch.setattr(backtest_service, "_stored_indicators", stored)
+    assert price_cache.stats()["entries"] == 0
+    assert "sma_9" in _load_df("CACHE7.SA", start, end, ["sma_9"]).columns
@@ -0,0 +1,139 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services import price_mirror as price_mirror_mod
+from app.services.price_mirror import PriceMirror
+
+
+@pytest.fixture
+def mirror(tmp_path, monkeypatch):
+    m = PriceMirror(tmp_path / "mirror")
+    monkeypatch.setattr(price_mirror_mod, "price_mirror", m)
+    return m
+
+
+def test_load_df_from_mirror_matches_db_and_follows_upserts(client, ohlcv, mirror, monkeypatch):
+    from app.services.backtest_service import _load_df
+    from app.services.data_service import ensure_symbol, upsert_prices, upsert_indicator_frame
+
+    sid = ensure_symbol("MMAP3.SA")
+    bars = ohlcv("2022-01-03", 60)
+    upsert_prices(sid, bars)
+    d = bars.set_index("date")
+    upsert_indicator_frame(sid, pd.DataFrame({"sma_5": d["close"].rolling(5).mean()}))
+
+    start, end = date(2022, 1, 10), date(2022, 3, 4)
+    monkeypatch.setattr(price_mirror_mod, "price_mirror", None)
+    ref = _load_df("MMAP3.SA", start, end)
+    monkeypatch.setattr(price_mirror_mod, "price_mirror", mirror)
+
+    # primeira leitura reconstrói do banco; as seguintes só mapeiam o arquivo
+    got = _load_df("MMAP3.SA", start, end)
+    assert client.get("/data/mirror/stats").json()["symbols"] == 1
+    assert got.index.equals(ref.index) and got.index.name == "date"
+    pd.testing.assert_frame_equal(got.reset_index(drop=True), ref.reset_index(drop=True))
+
+    # vista somente leitura sobre o mmap, sem cópia
+    arr = mirror._open[sid][1]
+    assert np.shares_memory(got.to_numpy(), arr)
+    assert not got.to_numpy().flags.writeable
+
+    # upsert mescla no espelho: corrige uma barra e acrescenta dias novos
+    fix = bars.iloc[[20]].assign(close=123.0)
+    more = ohlcv("2022-03-28", 5)
+    upsert_prices(sid, pd.concat([fix, more]))
+    got = _load_df("MMAP3.SA", date(2022, 1, 1), date(2022, 12, 31))
+    assert len(got) == 65
+    assert got.loc[pd.Timestamp(fix["date"].iloc[0]), "close"] == 123.0
+    # sma_5 ficou com buraco nos dias novos -> descartada, como no caminho do banco
+    assert "sma_5" not in got.columns
+    assert "sma_5" in _load_df("MMAP3.SA", start, end).columns
+
+    assert _load_df("MMAP3.SA", date(2023, 1, 1), date(2023, 2, 1)).empty
+    assert _load_df("NOPE3.SA", start, end) is None
+
+
+def test_mirror_rebuilds_when_behind_db(client, ohlcv, mirror):
+    """Queda entre o commit no banco e o merge no espelho: a próxima leitura reconstrói."""
+    from app.services.backtest_service import _load_df
+    from app.services.data_service import ensure_symbol, upsert_prices
+
+    sid = ensure_symbol("STALE3.SA")
+    upsert_prices(sid, ohlcv("2022-01-03", 30))
+    assert len(_load_df("STALE3.SA", date(2022, 1, 1), date(2022, 12, 31))) == 30
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("processo caiu")
+
+    mirror.merge_prices = crash
+    with pytest.raises(RuntimeError):
+        upsert_prices(sid, ohlcv("2022-02-14", 10))
+    del mirror.merge_prices
+
+    got = _load_df("STALE3.SA", date(2022, 1, 1), date(2022, 12, 31))
+    assert len(got) == 40 and mirror.stats()["stale"] == 1
+    assert _load_df("STALE3.SA", date(2022, 1, 1), date(2022, 12, 31)) is not None
+    assert mirror.stats()["stale"] == 1
+
+
+def test_mirror_rebuilds_after_value_only_rewrite(client, ohlcv, mirror):
+    """Mesmas datas e mesma contagem, só valores novos: a versão do símbolo denuncia o espelho atrasado."""
+    from app.services.backtest_service import _load_df
+    from app.services.data_service import ensure_symbol, upsert_prices, upsert_indicator_frame
+
+    sid = ensure_symbol("REVAL3.SA")
+    bars = ohlcv("2022-01-03", 30)
+    upsert_prices(sid, bars)
+    d = bars.set_index("date")
+    upsert_indicator_frame(sid, pd.DataFrame({"sma_5": d["close"].rolling(5).mean()}))
+    start, end = date(2022, 1, 1), date(2022, 12, 31)
+    assert _load_df("REVAL3.SA", start, end)["close"].iloc[10] == bars["close"].iloc[10]
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("processo caiu")
+
+    mirror.merge_prices = crash
+    with pytest.raises(RuntimeError):
+        upsert_prices(sid, bars.assign(close=bars["close"] + 1.0))
+    del mirror.merge_prices
+    got = _load_df("REVAL3.SA", start, end)
+    assert mirror.stats()["stale"] == 1
+    np.testing.assert_allclose(got["close"].to_numpy(), bars["close"].to_numpy() + 1.0)
+
+    mirror.merge_indicators = crash
+    with pytest.raises(RuntimeError):
+        upsert_indicator_frame(sid, pd.DataFrame({"sma_5": d["close"].rolling(5).mean() * 2}))
+    del mirror.merge_indicators
+    got = _load_df("REVAL3.SA", start, end, ["sma_5"])
+    assert mirror.stats()["stale"] == 2
+    np.testing.assert_allclose(got["sma_5"].to_numpy(), d["close"].rolling(5).mean().to_numpy() * 2)
+
+
+def test_publish_survives_locked_old_version(tmp_path, ohlcv, monkeypatch):
+    """No Windows a versão antiga ainda mapeada não pode ser apagada: fica para a próxima escrita."""
+    m = PriceMirror(tmp_path / "mirror")
+    bars = ohlcv("2022-01-03", 20)
+    m.replace(1, bars)
+    view = m.read(1, date(2022, 1, 1), date(2022, 12, 31))
+    first = m._open[1][0]
+
+    real_unlink = price_mirror_mod.Path.unlink
+
+    def locked(self, missing_ok=False):
+        if self.name == first:
+            raise PermissionError(13, "arquivo em uso", str(self))
+        return real_unlink(self, missing_ok=missing_ok)
+
+    monkeypatch.setattr(price_mirror_mod.Path, "unlink", locked)
+    m.replace(1, bars.assign(close=1.0))
+    assert 1 not in m._open  # o mmap antigo deste processo foi solto
+    assert (m.root / first).exists() and len(list(m.root.glob("1-*.npy"))) == 2
+    assert (m.read(1, date(2022, 1, 1), date(2022, 12, 31))["close"] == 1.0).all()
+    assert view["close"].iloc[0] == bars["close"].iloc[0]  # a vista antiga segue válida
+
+    monkeypatch.setattr(price_mirror_mod.Path, "unlink", real_unlink)
+    m.replace(1, bars)
+    assert len(list(m.root.glob("1-*.npy"))) == 1
@@ -0,0 +1,67 @@
+import threading
+
+from app.services.results_cache import ResultsCache, etag_matches
+
+
+def test_results_cache_lru_and_disk(tmp_path):
+    c = ResultsCache(max_bytes=16, disk_dir=str(tmp_path))
+    etag, _ = c.put(1, b'{"a": 1}', "v1")
+    c.put(2, b'{"b": 22}', "v1")  # estoura a memória: o 1 sai do LRU, mas fica no disco
+    assert c.stats()["entries"] == 1 and c.stats()["evictions"] == 1
+
+    # outro processo / restart lê do disco, com o mesmo ETag
+    other = ResultsCache(max_bytes=1024, disk_dir=str(tmp_path))
+    assert other.get(1, "v1") == (etag, b'{"a": 1}')
+    assert other.stats()["disk_hits"] == 1
+
+    other.invalidate(1)
+    assert not list(tmp_path.glob("1.*.json"))
+    assert other.get(1, "v1") is None and c.get(1, "v1") is None
+
+
+def test_results_cache_checks_version(tmp_path):
+    # o processo `a` não vê o DELETE feito em `b`: a versão da linha no banco decide
+    a = ResultsCache(max_bytes=1024, disk_dir=str(tmp_path))
+    b = ResultsCache(max_bytes=1024, disk_dir=str(tmp_path))
+    a.put(7, b'{"old": 1}', "v1")
+    assert a.get(7, "v1") == b.get(7, "v1")
+
+    b.invalidate(7)
+    b.put(7, b'{"new": 2}', "v2")  # id reaproveitado por outro backtest
+    # a entrada em memória de `a` é de outra versão: descartada, e o disco tem a nova
+    assert a.get(7, "v2")[1] == b'{"new": 2}'
+    assert a.stats()["stale"] == 1 and a.stats()["disk_hits"] == 1
+    assert len(list(tmp_path.glob("7.*.json"))) == 1
+    assert a.get(7, "v3") is None
+
+
+def test_etag_matches():
+    assert etag_matches('"a", "b"', '"b"')
+    assert etag_matches('W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
+
+
+def test_results_route_reads_disk_tier_off_event_loop(client, tmp_path, monkeypatch):
+    from app.services.results_cache import results_cache
+
+    upd = {"ticker": "DISK3.SA", "start": "2022-01-01", "end": "2022-06-30"}
+    assert client.post("/data/update", json=upd).status_code == 200
+    bt_id = client.post("/backtests/run", json={"ticker": "DISK3.SA", "start_date": "2022-01-01",
+                                                "end_date": "2022-06-30"}).json()["backtest_id"]
+
+    monkeypatch.setattr(results_cache, "disk_dir", tmp_path)
+    results_cache.invalidate(bt_id)
+    seen = {}
+    for name in ("get_memory", "get_disk", "put"):
+        def spy(*args, _name=name, _fn=getattr(results_cache, name)):
+            seen[_name] = threading.current_thread()
+            return _fn(*args)
+        monkeypatch.setattr(results_cache, name, spy)
+
+    first = client.get(f"/backtests/{bt_id}/results")
+    assert first.status_code == 200 and list(tmp_path.glob(f"{bt_id}.*.json"))
+    # a memória é consultada no event loop; disco (leitura e escrita) em outra thread
+    assert seen["get_disk"] is not seen["get_memory"] and seen["put"] is not seen["get_memory"]
+    results_cache.invalidate(bt_id)